@@ -4,10 +4,13 @@
 # TODO: add checking if check after moving suggested move later
 
 # General chess piece
+import sys
 from enums import Player
+from board_geometry import get_geometry
 import constants
 
 DIMENSION_ROW = constants.DIMENSION_ROW
+GEOMETRY = get_geometry(constants.DIMENSION_ROW, constants.DIMENSION_COL)
 
 class Piece:
     # Initialize the piece
@@ -17,6 +20,12 @@ class Piece:
         self.col_number = col_number
         self._player = player
 
+    # Unpickled strings are new objects and the heuristics compare names with is
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._name = sys.intern(self._name)
+        self._player = sys.intern(self._player)
+
     # Get the x value
     def get_row_number(self):
         return self.row_number
@@ -57,6 +66,21 @@ class Piece:
     def get_valid_piece_moves(self, board):
         pass
 
+    # Walk each ray until the first piece, which can be taken if it is an opponent's
+    def slide(self, game_state, rays):
+        _peaceful_moves = []
+        _piece_takes = []
+        for ray in rays:
+            for square in ray:
+                evaluating_square = game_state.board[square[0]][square[1]]
+                if evaluating_square == Player.EMPTY:
+                    _peaceful_moves.append(square)
+                    continue
+                if not evaluating_square.is_player(self.get_player()):
+                    _piece_takes.append(square)
+                break
+        return (_peaceful_moves, _piece_takes)
+
 
 # Rook (R)
 class Rook(Piece):
@@ -76,75 +100,9 @@ class Rook(Piece):
     def get_valid_piece_moves(self, game_state):
         return self.get_valid_peaceful_moves(game_state) + self.get_valid_piece_takes(game_state)
 
+    # left, right, below and above the Rook
     def traverse(self, game_state):
-        _peaceful_moves = []
-        _piece_takes = []
-
-        self._up = 1
-        self._down = 1
-        self._left = 1
-        self._right = 1
-
-        # Left of the Rook
-        self._breaking_point = False
-        while self.get_col_number() - self._left >= 0 and not self._breaking_point:
-            # when the square to the left is empty
-            if game_state.get_piece(self.get_row_number(), self.get_col_number() - self._left) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number(), self.get_col_number() - self._left))
-                self._left += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number(), self.get_col_number() - self._left) and \
-                    not game_state.get_piece(self.get_row_number(), self.get_col_number() - self._left).is_player(self.get_player()):
-                _piece_takes.append((self.get_row_number(), self.get_col_number() - self._left))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-
-        # Right of the Rook
-        self._breaking_point = False
-        while self.get_col_number() + self._right < 8 and not self._breaking_point:
-            # when the square to the left is empty
-            if game_state.get_piece(self.get_row_number(), self.get_col_number() + self._right) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number(), self.get_col_number() + self._right))
-                self._right += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number(), self.get_col_number() + self._right) and \
-                    not game_state.get_piece(self.get_row_number(), self.get_col_number() + self._right).is_player(self.get_player()):
-                _piece_takes.append((self.get_row_number(), self.get_col_number() + self._right))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-
-        # Below the Rook
-        self._breaking_point = False
-        while self.get_row_number() + self._down < 8 and not self._breaking_point:
-            # when the square to the left is empty
-            if game_state.get_piece(self.get_row_number() + self._down, self.get_col_number()) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number() + self._down, self.get_col_number()))
-                self._down += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number() + self._down, self.get_col_number()) and \
-                    not game_state.get_piece(self.get_row_number() + self._down, self.get_col_number()).is_player(self.get_player()):
-                _piece_takes.append((self.get_row_number() + self._down, self.get_col_number()))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-
-        # Above the Rook
-        self._breaking_point = False
-        while self.get_row_number() - self._up >= 0 and not self._breaking_point:
-            # when the square to the left is empty
-            if game_state.get_piece(self.get_row_number() - self._up, self.get_col_number()) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number() - self._up, self.get_col_number()))
-                self._up += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number() - self._up, self.get_col_number()) and \
-                    not game_state.get_piece(self.get_row_number() - self._up, self.get_col_number()).is_player(self.get_player()):
-                _piece_takes.append((self.get_row_number() - self._up, self.get_col_number()))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-        return (_peaceful_moves, _piece_takes)
+        return self.slide(game_state, GEOMETRY.rook_rays[self.get_row_number()][self.get_col_number()])
 
 
 # Knight (N)
@@ -154,29 +112,18 @@ class Knight(Piece):
 
     def get_valid_peaceful_moves(self, game_state):
         _moves = []
-        row_change = [-2, -2, -1, -1, +1, +1, +2, +2]
-        col_change = [-1, +1, -2, +2, -2, +2, +1, -1]
-
-        for i in range(0, 8):
-            new_row = self.get_row_number() + row_change[i]
-            new_col = self.get_col_number() + col_change[i]
-            evaluating_square = game_state.get_piece(new_row, new_col)
+        for new_row, new_col in GEOMETRY.knight[self.get_row_number()][self.get_col_number()]:
             # when the square with new_row and new_col is empty
-            if evaluating_square == Player.EMPTY:
+            if game_state.board[new_row][new_col] == Player.EMPTY:
                 _moves.append((new_row, new_col))
         return _moves
 
     def get_valid_piece_takes(self, game_state):
         _moves = []
-        row_change = [-2, -2, -1, -1, +1, +1, +2, +2]
-        col_change = [-1, +1, -2, +2, -2, +2, +1, -1]
-
-        for i in range(0, 8):
-            new_row = self.get_row_number() + row_change[i]
-            new_col = self.get_col_number() + col_change[i]
-            evaluating_square = game_state.get_piece(new_row, new_col)
+        for new_row, new_col in GEOMETRY.knight[self.get_row_number()][self.get_col_number()]:
+            evaluating_square = game_state.board[new_row][new_col]
             # when the square with new_row and new_col contains a valid piece and the player is different
-            if game_state.is_valid_piece(new_row, new_col) and self.get_player() is not evaluating_square.get_player():
+            if evaluating_square != Player.EMPTY and self.get_player() is not evaluating_square.get_player():
                 _moves.append((new_row, new_col))
         return _moves
 
@@ -222,91 +169,9 @@ class Bishop(Piece):
     def get_valid_piece_moves(self, game_state):
         return self.get_valid_piece_takes(game_state) + self.get_valid_peaceful_moves(game_state)
 
+    # left up, right up, left down and right down of the bishop
     def traverse(self, game_state):
-        _peaceful_moves = []
-        _piece_takes = []
-
-        self._breaking_point = False
-        self._up = 1
-        self._down = 1
-        self._left = 1
-        self._right = 1
-        while self.get_col_number() - self._left >= 0 and self.get_row_number() - self._up >= 0 and not self._breaking_point:
-            # when the square is empty
-            if game_state.get_piece(self.get_row_number() - self._up, self.get_col_number() - self._left) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number() - self._up, self.get_col_number() - self._left))
-                self._left += 1
-                self._up += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number() - self._up, self.get_col_number() - self._left) and \
-                    not game_state.get_piece(self.get_row_number() - self._up, self.get_col_number() - self._left).is_player(self.get_player()):
-                _piece_takes.append((self.get_row_number() - self._up, self.get_col_number() - self._left))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-
-        # Right up of the bishop
-        self._breaking_point = False
-        self._up = 1
-        self._down = 1
-        self._left = 1
-        self._right = 1
-        while self.get_col_number() + self._right < 8 and self.get_row_number() - self._up >= 0 and not self._breaking_point:
-            # when the square is empty
-            if game_state.get_piece(self.get_row_number() - self._up, self.get_col_number() + self._right) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number() - self._up, self.get_col_number() + self._right))
-                self._right += 1
-                self._up += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number() - self._up, self.get_col_number() + self._right) and \
-                    not game_state.get_piece(self.get_row_number() - self._up, self.get_col_number() + self._right).is_player(self.get_player()):
-                _piece_takes.append((self.get_row_number() - self._up, self.get_col_number() + self._right))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-
-        # Down left of the bishop
-        self._breaking_point = False
-        self._up = 1
-        self._down = 1
-        self._left = 1
-        self._right = 1
-        while self.get_col_number() - self._left >= 0 and self.get_row_number() + self._down < 8 and not self._breaking_point:
-            # when the square is empty
-            if game_state.get_piece(self.get_row_number() + self._down, self.get_col_number() - self._left) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number() + self._down, self.get_col_number() - self._left))
-                self._down += 1
-                self._left += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number() + self._down, self.get_col_number() - self._left) and \
-                    not game_state.get_piece(self.get_row_number() + self._down, self.get_col_number() - self._left).is_player(self.get_player()):
-                _piece_takes.append((self.get_row_number() + self._down, self.get_col_number() - self._left))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-
-        # Down right of the bishop
-        self._breaking_point = False
-        self._up = 1
-        self._down = 1
-        self._left = 1
-        self._right = 1
-        while self.get_col_number() + self._right < 8 and self.get_row_number() + self._down < 8 and not self._breaking_point:
-            # when the square is empty
-            if game_state.get_piece(self.get_row_number() + self._down, self.get_col_number() + self._right) is Player.EMPTY:
-                _peaceful_moves.append((self.get_row_number() + self._down, self.get_col_number() + self._right))
-                self._down += 1
-                self._right += 1
-            # when the square contains an opposing piece
-            elif game_state.is_valid_piece(self.get_row_number() + self._down, self.get_col_number() + self._right) and \
-                    not game_state.get_piece(self.get_row_number() + self._down, self.get_col_number() + self._right).is_player(
-                        self.get_player()):
-                _piece_takes.append((self.get_row_number() + self._down, self.get_col_number() + self._right))
-                self._breaking_point = True
-            else:
-                self._breaking_point = True
-        return (_peaceful_moves, _piece_takes)
-
+        return self.slide(game_state, GEOMETRY.bishop_rays[self.get_row_number()][self.get_col_number()])
 
 
 # Pawn
@@ -316,28 +181,15 @@ class Pawn(Piece):
 
     def get_valid_piece_takes(self, game_state):
         _moves = []
-        if self.is_player(Player.PLAYER_2):
-            # when the square to the bottom left of the starting_square has a black piece
-            if game_state.is_valid_piece(self.get_row_number() + 1, self.get_col_number() - 1) and \
-                    game_state.get_piece(self.get_row_number() + 1, self.get_col_number() - 1).is_player(Player.PLAYER_1):
-                _moves.append((self.get_row_number() + 1, self.get_col_number() - 1))
-            # when the square to the bottom right of the starting_square has a black piece
-            if game_state.is_valid_piece(self.get_row_number() + 1, self.get_col_number() + 1) and \
-                    game_state.get_piece(self.get_row_number() + 1, self.get_col_number() + 1).is_player(Player.PLAYER_1):
-                _moves.append((self.get_row_number() + 1, self.get_col_number() + 1))
-            if game_state.can_en_passant(self.get_row_number(), self.get_col_number()):
+        # the two squares diagonally in front of the pawn
+        for new_row, new_col in GEOMETRY.pawn_attacks[self.get_player()][self.get_row_number()][self.get_col_number()]:
+            evaluating_square = game_state.board[new_row][new_col]
+            if evaluating_square != Player.EMPTY and not evaluating_square.is_player(self.get_player()):
+                _moves.append((new_row, new_col))
+        if game_state.can_en_passant(self.get_row_number(), self.get_col_number()):
+            if self.is_player(Player.PLAYER_2):
                 _moves.append((self.get_row_number() + 1, game_state.previous_piece_en_passant()[1]))
-        # when the pawn is a black piece
-        elif self.is_player(Player.PLAYER_1):
-            # when the square to the top left of the starting_square has a white piece
-            if game_state.is_valid_piece(self.get_row_number() - 1, self.get_col_number() - 1) and \
-                    game_state.get_piece(self.get_row_number() - 1, self.get_col_number() - 1).is_player(Player.PLAYER_2):
-                _moves.append((self.get_row_number() - 1, self.get_col_number() - 1))
-            # when the square to the top right of the starting_square has a white piece
-            if game_state.is_valid_piece(self.get_row_number() - 1, self.get_col_number() + 1) and \
-                    game_state.get_piece(self.get_row_number() - 1, self.get_col_number() + 1).is_player(Player.PLAYER_2):
-                _moves.append((self.get_row_number() - 1, self.get_col_number() + 1))
-            if game_state.can_en_passant(self.get_row_number(), self.get_col_number()):
+            else:
                 _moves.append((self.get_row_number() - 1, game_state.previous_piece_en_passant()[1]))
         return _moves
 
@@ -425,17 +277,17 @@ class Queen(Rook, Bishop):
     def __str__(self):
         return self._player[0] + "q"
 
+    # the rook rays followed by the bishop rays, walked from the queen itself
     def get_valid_peaceful_moves(self, game_state):
-        return (Rook.get_valid_peaceful_moves(Rook(self.get_name(), self.get_row_number(), self.get_col_number(), self.get_player()), game_state) +
-                Bishop.get_valid_peaceful_moves(Bishop(self.get_name(), self.get_row_number(), self.get_col_number(), self.get_player()), game_state))
+        return Rook.traverse(self, game_state)[0] + Bishop.traverse(self, game_state)[0]
 
     def get_valid_piece_takes(self, game_state):
-        return (Rook.get_valid_piece_takes( Rook(self.get_name(), self.get_row_number(), self.get_col_number(), self.get_player()), game_state) +
-                Bishop.get_valid_piece_takes(Bishop(self.get_name(), self.get_row_number(), self.get_col_number(), self.get_player()), game_state))
+        return Rook.traverse(self, game_state)[1] + Bishop.traverse(self, game_state)[1]
 
     def get_valid_piece_moves(self, game_state):
-        return (Rook.get_valid_piece_moves(Rook(self.get_name(), self.get_row_number(), self.get_col_number(), self.get_player()), game_state) +
-                Bishop.get_valid_piece_moves(Bishop(self.get_name(), self.get_row_number(), self.get_col_number(), self.get_player()), game_state))
+        rook_peaceful_moves, rook_piece_takes = Rook.traverse(self, game_state)
+        bishop_peaceful_moves, bishop_piece_takes = Bishop.traverse(self, game_state)
+        return rook_peaceful_moves + rook_piece_takes + bishop_piece_takes + bishop_peaceful_moves
 
 # King
 class King(Piece):
@@ -444,46 +296,30 @@ class King(Piece):
 
     def get_valid_piece_takes(self, game_state):
         _moves = []
-        row_change = [-1, +0, +1, -1, +1, -1, +0, +1]
-        col_change = [-1, -1, -1, +0, +0, +1, +1, +1]
-
-        for i in range(0, 8):
-            new_row = self.get_row_number() + row_change[i]
-            new_col = self.get_col_number() + col_change[i]
-            evaluating_square = game_state.get_piece(new_row, new_col)
-            # when the square with new_row and new_col contains a valid piece
-            if game_state.is_valid_piece(new_row, new_col):
-                # when the king is white and the piece near the king is black
-                if self.is_player(Player.PLAYER_2) and evaluating_square.is_player(Player.PLAYER_1):
-                    _moves.append((new_row, new_col))
-                # when the king is black and the piece near the king is white
-                elif self.is_player(Player.PLAYER_1) and evaluating_square.is_player(Player.PLAYER_2):
-                    _moves.append((new_row, new_col))
+        for new_row, new_col in GEOMETRY.king[self.get_row_number()][self.get_col_number()]:
+            evaluating_square = game_state.board[new_row][new_col]
+            # when the square with new_row and new_col contains a piece of the other player
+            if evaluating_square != Player.EMPTY and not evaluating_square.is_player(self.get_player()):
+                _moves.append((new_row, new_col))
         return _moves
 
     def get_valid_peaceful_moves(self, game_state):
         _moves = []
-        row_change = [-1, +0, +1, -1, +1, -1, +0, +1]
-        col_change = [-1, -1, -1, +0, +0, +1, +1, +1]
-
-        for i in range(0, 8):
-            new_row = self.get_row_number() + row_change[i]
-            new_col = self.get_col_number() + col_change[i]
-            evaluating_square = game_state.get_piece(new_row, new_col)
+        for new_row, new_col in GEOMETRY.king[self.get_row_number()][self.get_col_number()]:
             # when the square with new_row and new_col is empty
-            if evaluating_square == Player.EMPTY:
+            if game_state.board[new_row][new_col] == Player.EMPTY:
                 _moves.append((new_row, new_col))
 
         if game_state.king_can_castle_left(self.get_player()):
             if self.is_player(Player.PLAYER_2):
                 _moves.append((0, 1))
             elif self.is_player(Player.PLAYER_1):
-                _moves.append((7, 1))
+                _moves.append((DIMENSION_ROW - 1, 1))
         if game_state.king_can_castle_right(self.get_player()):
             if self.is_player(Player.PLAYER_2):
                 _moves.append((0, 5))
             elif self.is_player(Player.PLAYER_1):
-                _moves.append((7, 5))
+                _moves.append((DIMENSION_ROW - 1, 5))
         return _moves
 
     def get_valid_piece_moves(self, game_state):
@@ -12,4 +12,7 @@ AI1 = custom_ai_engines.minimax_alpha_beta_agent(depth=3, heuristic=custom_ai_en
 # black ai
 #AI2 = custom_ai_engines.q_agent(explore_rate = 0.5,learn_rate = 0.5,file="agent2.2")
 AI2 = custom_ai_engines.expectimax_agent(depth=3, heuristic=custom_ai_engines.piece_value_heuristic())
-#AI2 = custom_ai_engines.suicide_minimax_alpha_beta_agent(depth=3, heuristic=custom_ai_engines.suicide_heuristic())
\ No newline at end of file
+#AI2 = custom_ai_engines.suicide_minimax_alpha_beta_agent(depth=3, heuristic=custom_ai_engines.suicide_heuristic())
+
+# seconds each ai may think per move, None searches to the fixed depth of the agent
+TIME_LIMIT = None
@@ -7,147 +7,46 @@
 # from enums import Player
 # TODO: switch undo moves to stack data structure
 import chess_engine
+import custom_ai_engines
 from enums import Player
 
 
-class chess_ai:
+class chess_ai_heuristic(custom_ai_engines.heuristic):
+    '''
+    evaluate_board of chess_ai takes the opponent of the side it scores for
+    '''
+    def __init__(self, ai):
+        self.ai = ai
+
+    def evaluate_board(self, game_state, max_color):
+        if max_color == Player.PLAYER_2:
+            return self.ai.evaluate_board(game_state, Player.PLAYER_1)
+        return self.ai.evaluate_board(game_state, Player.PLAYER_2)
+
+
+class chess_ai(custom_ai_engines.negamax_agent):
     '''
     call minimax with alpha beta pruning
     evaluate board
     get the value of each piece
     '''
-    def __init__(self, depth=3, alpha=-100000, beta=100000):
-        self.depth = depth
-        self.alpha = alpha
-        self.beta = beta
+    def __init__(self, depth=3, alpha=-10000000, beta=10000000):
+        super().__init__(depth, alpha, beta, heuristic=chess_ai_heuristic(self))
     
-    def get_move(self, game_state, color, max_color):
-        if max_color == "black":
-            return self.minimax_white(game_state, self.depth, self.alpha, self.beta, True, Player.PLAYER_2)
-        else:
-            return self.minimax_black(game_state, self.depth, self.alpha, self.beta, True, Player.PLAYER_1)
-    
-    def minimax_white(self, game_state, depth, alpha, beta, maximizing_player, player_color):
-        csc = game_state.checkmate_stalemate_checker()
-        if maximizing_player:
-            if csc == 0:
-                return 5000000
-            elif csc == 1:
-                return -5000000
-            elif csc == 2:
-                return 100
-        elif not maximizing_player:
-            if csc == 1:
-                return 5000000
-            elif csc == 0:
-                return -5000000
-            elif csc == 2:
-                return 100
-
-        if depth <= 0 or csc != 3:
-            return self.evaluate_board(game_state, Player.PLAYER_1)
-
-        if maximizing_player:
-            max_evaluation = -10000000
-            all_possible_moves = game_state.get_all_legal_moves("black")
-            for move_pair in all_possible_moves:
-                game_state.move_piece(move_pair[0], move_pair[1], True)
-                evaluation = self.minimax_white(game_state, depth - 1, alpha, beta, False, "white")
-                game_state.undo_move()
-
-                if max_evaluation < evaluation:
-                    max_evaluation = evaluation
-                    best_possible_move = move_pair
-                alpha = max(alpha, evaluation)
-                if beta <= alpha:
-                    break
-            if depth == 3:
-                return best_possible_move
-            else:
-                return max_evaluation
-        else:
-            min_evaluation = 10000000
-            all_possible_moves = game_state.get_all_legal_moves("white")
-            for move_pair in all_possible_moves:
-                game_state.move_piece(move_pair[0], move_pair[1], True)
-                evaluation = self.minimax_white(game_state, depth - 1, alpha, beta, True, "black")
-                game_state.undo_move()
-
-                if min_evaluation > evaluation:
-                    min_evaluation = evaluation
-                    best_possible_move = move_pair
-                beta = min(beta, evaluation)
-                if beta <= alpha:
-                    break
-            if depth == 3:
-                return best_possible_move
-            else:
-                return min_evaluation
-
-    def minimax_black(self, game_state, depth, alpha, beta, maximizing_player, player_color):
-        csc = game_state.checkmate_stalemate_checker()
-        if maximizing_player:
-            if csc == 1:
-                return 5000000
-            elif csc == 0:
-                return -5000000
-            elif csc == 2:
-                return 100
-        elif not maximizing_player:
-            if csc == 0:
-                return 5000000
-            elif csc == 1:
-                return -5000000
-            elif csc == 2:
-                return 100
-
-        if depth <= 0 or csc != 3:
-            return self.evaluate_board(game_state, Player.PLAYER_2)
-
-        if maximizing_player:
-            max_evaluation = -10000000
-            all_possible_moves = game_state.get_all_legal_moves("white")
-            for move_pair in all_possible_moves:
-                game_state.move_piece(move_pair[0], move_pair[1], True)
-                evaluation = self.minimax_black(game_state, depth - 1, alpha, beta, False, "black")
-                game_state.undo_move()
-
-                if max_evaluation < evaluation:
-                    max_evaluation = evaluation
-                    best_possible_move = move_pair
-                alpha = max(alpha, evaluation)
-                if beta <= alpha:
-                    break
-            if depth == 3:
-                return best_possible_move
-            else:
-                return max_evaluation
-        else:
-            min_evaluation = 10000000
-            all_possible_moves = game_state.get_all_legal_moves("black")
-            for move_pair in all_possible_moves:
-                game_state.move_piece(move_pair[0], move_pair[1], True)
-                evaluation = self.minimax_black(game_state, depth - 1, alpha, beta, True, "white")
-                game_state.undo_move()
-
-                if min_evaluation > evaluation:
-                    min_evaluation = evaluation
-                    best_possible_move = move_pair
-                beta = min(beta, evaluation)
-                if beta <= alpha:
-                    break
-            if depth == 3:
-                return best_possible_move
-            else:
-                return min_evaluation
+    def get_move(self, game_state, color, time_limit=None, node_limit=None, *, max_color=None):
+        '''
+        returns the best move for max_color, the searching side, which is color unless it is given by keyword
+        time_limit and node_limit are in the same place as in every other agent's get_move
+        '''
+        if max_color is None:
+            max_color = color
+        return super().get_move(game_state, max_color, time_limit, node_limit)
 
     def evaluate_board(self, game_state, player):
         evaluation_score = 0
-        for row in range(0, 8):
-            for col in range(0, 8):
-                if game_state.is_valid_piece(row, col):
-                    evaluated_piece = game_state.get_piece(row, col)
-                    evaluation_score += self.get_piece_value(evaluated_piece, player)
+        for color in (Player.PLAYER_1, Player.PLAYER_2):
+            for _, _, evaluated_piece in game_state.player_pieces(color):
+                evaluation_score += self.get_piece_value(evaluated_piece, player)
         return evaluation_score
 
     def get_piece_value(self, piece, player):
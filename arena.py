@@ -0,0 +1,171 @@
+#
+# Headless arena, plays ai against ai games without pygame or a frame rate limit
+# python arena.py "minimax_alpha_beta_agent(depth=3)" "random_agent()" --games 10 --output results.jsonl
+# Agent specs are python expressions over custom_ai_engines, parallel_mcts_agent and lazy_smp_agent (AI1 / AI2 are the
+# agents in ai_constants).
+# Every game is written as one json line with the result, the number of plies and the time of every move.
+#
+import argparse
+import json
+import time
+
+import constants
+
+# games still going after this many plies are draws, same as the autoplay loop of chess_gui
+MAX_PLIES = 200
+
+RESULTS = {0: "0-1", 1: "1-0", 2: "1/2-1/2"}
+REASONS = {0: "checkmate", 1: "checkmate", 2: "stalemate"}
+
+
+def configure_board(rows, cols):
+    '''
+    has to be called before chess_engine is imported, the engine modules copy the board size on import
+    '''
+    constants.DIMENSION_ROW = rows
+    constants.DIMENSION_COL = cols
+
+
+def make_agent(spec):
+    '''
+    builds an agent from a spec such as "minimax_alpha_beta_agent(depth=2, bitboard=True)"
+    '''
+    import custom_ai_engines
+    import ai_engine
+    import parallel_mcts
+    import lazy_smp
+    if spec in ("AI1", "AI2"):
+        import ai_constants
+        return getattr(ai_constants, spec)
+    namespace = dict(vars(custom_ai_engines))
+    namespace["ai_engine"] = ai_engine
+    namespace["parallel_mcts_agent"] = parallel_mcts.parallel_mcts_agent
+    namespace["lazy_smp_agent"] = lazy_smp.lazy_smp_agent
+    return eval(spec, namespace)
+
+
+def play_game(white, black, max_plies=MAX_PLIES, time_limit=None, node_limit=None):
+    '''
+    plays one game from the start position, white and black are agents
+    returns {"result", "reason", "plies", "moves", "move_times"}, move_times[i] is the seconds spent on ply i
+    '''
+    from chess_engine import game_state
+    from enums import Player
+
+    state = game_state()
+    moves = []
+    move_times = []
+    result = RESULTS[2]
+    reason = "max plies"
+    while len(moves) < max_plies:
+        status = state.terminal_status()
+        if status != 3:
+            result = RESULTS[status]
+            reason = REASONS[status]
+            break
+        if state.whose_turn():
+            player, ai = Player.PLAYER_1, white
+        else:
+            player, ai = Player.PLAYER_2, black
+        start = time.perf_counter()
+        move = ai.get_move(state, player, time_limit, node_limit)
+        move_times.append(time.perf_counter() - start)
+
+        position = state.hash()
+        if move is not None:
+            state.move_piece(move[0], move[1], True)
+        if move is None or state.hash() == position:
+            # move_piece ignores illegal moves, the side that played one loses instead of the game hanging
+            result = RESULTS[0] if player == Player.PLAYER_1 else RESULTS[1]
+            reason = "illegal move " + str(move)
+            break
+        moves.append(move)
+    else:
+        status = state.terminal_status()
+        if status != 3:
+            result = RESULTS[status]
+            reason = REASONS[status]
+    return {"result": result, "reason": reason, "plies": len(moves), "moves": moves, "move_times": move_times}
+
+
+def play_match(white_spec, black_spec, games, max_plies=MAX_PLIES, time_limit=None, node_limit=None, output=None):
+    '''
+    plays games between the same two agents, restarted after every game like the gui does
+    returns the game records and appends them to output as json lines if it is given
+    '''
+    white = make_agent(white_spec)
+    black = make_agent(black_spec)
+    records = []
+    out = open(output, "a") if output else None
+    try:
+        for number in range(games):
+            record = play_game(white, black, max_plies, time_limit, node_limit)
+            record = dict({"game": number, "white": white_spec, "black": black_spec}, **record)
+            records.append(record)
+            if out is not None:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            print("game", number, record["result"], record["reason"], "in", record["plies"], "plies")
+            if record["result"] != RESULTS[2]:
+                white.save_in_file()
+                black.save_in_file()
+            white.restart()
+            black.restart()
+    finally:
+        if out is not None:
+            out.close()
+    return records
+
+
+def summarize(records):
+    '''
+    returns {"games", "white_wins", "black_wins", "draws", "plies", "white_move_time", "black_move_time"}
+    plies is the average game length, the move times are the average seconds per move
+    '''
+    summary = {"games": len(records), "white_wins": 0, "black_wins": 0, "draws": 0}
+    white_times = []
+    black_times = []
+    for record in records:
+        if record["result"] == RESULTS[1]:
+            summary["white_wins"] += 1
+        elif record["result"] == RESULTS[0]:
+            summary["black_wins"] += 1
+        else:
+            summary["draws"] += 1
+        # white plays the even plies
+        white_times.extend(record["move_times"][0::2])
+        black_times.extend(record["move_times"][1::2])
+    summary["plies"] = sum(record["plies"] for record in records) / len(records) if records else 0.0
+    summary["white_move_time"] = sum(white_times) / len(white_times) if white_times else 0.0
+    summary["black_move_time"] = sum(black_times) / len(black_times) if black_times else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="play ai against ai games without the gui")
+    parser.add_argument("white", help='agent spec, e.g. "minimax_alpha_beta_agent(depth=3)" or AI1')
+    parser.add_argument("black", help='agent spec, e.g. "random_agent()" or AI2')
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--time-limit", type=float, help="seconds per move")
+    parser.add_argument("--node-limit", type=int, help="search nodes per move")
+    parser.add_argument("--board", help="rows x cols, e.g. 8x8, the size in constants if left out")
+    parser.add_argument("--output", help="json lines file the game records are appended to")
+    args = parser.parse_args()
+
+    if args.board:
+        rows, cols = args.board.lower().split("x")
+        configure_board(int(rows), int(cols))
+    start = time.perf_counter()
+    records = play_match(args.white, args.black, args.games, args.max_plies, args.time_limit, args.node_limit,
+                         args.output)
+    elapsed = time.perf_counter() - start
+    summary = summarize(records)
+    print("%d games in %.1fs: white %d, black %d, draws %d, %.1f plies per game" % (
+        summary["games"], elapsed, summary["white_wins"], summary["black_wins"], summary["draws"],
+        summary["plies"]))
+    print("seconds per move: white %.4f, black %.4f" % (summary["white_move_time"], summary["black_move_time"]))
+
+
+if __name__ == "__main__":
+    main()
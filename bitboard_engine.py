@@ -0,0 +1,783 @@
+#
+# Bitboard backed version of the chess board
+# Keeps one integer mask per (color, piece type) next to the regular 2D board of Piece objects, so move generation
+# and attack detection are done with bit operations instead of walking rays square by square.
+#
+# Squares are indexed as row * DIMENSION_COL + col, so bit 0 is (r=0, c=0) and the highest bit is the bottom right.
+#
+from Piece import Rook, Knight, Bishop, Queen, King, Pawn
+from chess_engine import game_state, ZOBRIST, EVALUATION
+from board_geometry import get_geometry
+from enums import Player
+import constants
+
+DIMENSION_ROW = constants.DIMENSION_ROW
+DIMENSION_COL = constants.DIMENSION_COL
+
+WHITE = 0
+BLACK = 1
+COLORS = [Player.PLAYER_1, Player.PLAYER_2]
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_NAMES = ["p", "n", "b", "r", "q", "k"]
+PIECE_INDEX = {"p": PAWN, "n": KNIGHT, "b": BISHOP, "r": ROOK, "q": QUEEN, "k": KING}
+PIECE_CLASSES = [Pawn, Knight, Bishop, Rook, Queen, King]
+EMPTY = -1
+
+# (row change, col change); the first four directions walk towards higher square indexes
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1), (0, -1), (-1, 0), (-1, -1), (-1, 1)]
+ROOK_DIRECTIONS = (0, 1, 4, 5)
+BISHOP_DIRECTIONS = (2, 3, 6, 7)
+
+# packed moves: from square | to square << 7 | (promotion piece type + 1) << 14 | flags
+SQUARE_MASK = 0x7F
+CAPTURE = 1 << 17
+CASTLE = 1 << 18
+DOUBLE_STEP = 1 << 19
+
+# the undo stack is made (and grown) this many entries at a time
+UNDO_PLIES = 256
+
+# zobrist keys indexed by piece code (color * 6 + piece type) and square
+ZOBRIST_CODES = [ZOBRIST.pieces[(COLORS[code // 6], PIECE_NAMES[code % 6])] for code in range(12)]
+# material and piece-square values by piece code (and square)
+VALUE_CODES = EVALUATION.values
+SQUARE_VALUE_CODES = EVALUATION.tables
+
+
+class bitboard_tables:
+    '''
+    attack masks for every square of a rows x cols board, built once per board size
+    '''
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.coords = [(sq // cols, sq % cols) for sq in range(self.size)]
+
+        geometry = get_geometry(rows, cols)
+        self.knight = [self._squares_mask(geometry.knight, sq) for sq in range(self.size)]
+        self.king = [self._squares_mask(geometry.king, sq) for sq in range(self.size)]
+        # squares a pawn of the given color standing on sq attacks
+        self.pawn_attacks = [[self._squares_mask(geometry.pawn_attacks[color], sq) for sq in range(self.size)]
+                             for color in COLORS]
+
+        # rays[direction][sq] holds every square from sq to the edge of the board in that direction
+        self.rays = [[0] * self.size for _ in DIRECTIONS]
+        # between[a][b] holds the squares strictly between two squares on the same line, 0 otherwise
+        self.between = [[0] * self.size for _ in range(self.size)]
+        for sq in range(self.size):
+            row, col = self.coords[sq]
+            for d, (row_change, col_change) in enumerate(DIRECTIONS):
+                passed = 0
+                r = row + row_change
+                c = col + col_change
+                while 0 <= r < rows and 0 <= c < cols:
+                    target = r * cols + c
+                    self.between[sq][target] = passed
+                    passed |= 1 << target
+                    r += row_change
+                    c += col_change
+                self.rays[d][sq] = passed
+
+    def _squares_mask(self, table, sq):
+        row, col = self.coords[sq]
+        mask = 0
+        for r, c in table[row][col]:
+            mask |= 1 << (r * self.cols + c)
+        return mask
+
+
+_tables = {}
+
+
+def get_tables(rows=DIMENSION_ROW, cols=DIMENSION_COL):
+    if (rows, cols) not in _tables:
+        _tables[(rows, cols)] = bitboard_tables(rows, cols)
+    return _tables[(rows, cols)]
+
+
+def pack_move(from_sq, to_sq, promotion=None, flags=0):
+    return from_sq | to_sq << 7 | (0 if promotion is None else (promotion + 1) << 14) | flags
+
+
+def unpack_move(move):
+    '''
+    returns (from square, to square, promotion piece type or None)
+    '''
+    promotion = (move >> 14) & 0x7
+    return move & SQUARE_MASK, (move >> 7) & SQUARE_MASK, promotion - 1 if promotion else None
+
+
+class undo_entry:
+    '''
+    what make_move can not take back from the move alone, the entries are reused from ply to ply
+    '''
+    __slots__ = ("move", "captured", "moving_piece", "captured_piece", "castling", "en_passant", "hash",
+                 "white_material", "black_material", "white_positional", "black_positional")
+
+
+def lowest_square(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+def iterate_squares(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class bitboard_game_state(game_state):
+    '''
+    drop in replacement for game_state used by the ai agents
+    get_all_legal_moves / get_valid_moves / move_piece / undo_move / terminal_status keep the same
+    arguments and return values, but are computed from the bitboards. self.board is kept in sync so heuristics
+    that call get_piece() keep working.
+    '''
+    def __init__(self):
+        super().__init__()
+        self.tables = get_tables(DIMENSION_ROW, DIMENSION_COL)
+        self.undo_stack = [undo_entry() for _ in range(UNDO_PLIES)]
+        self.ply = 0
+        self.load_bitboards()
+
+    def __getstate__(self):
+        # the entries above ply are left over from moves already taken back
+        state = dict(self.__dict__)
+        state["undo_stack"] = self.undo_stack[:self.ply]
+        return state
+
+    @classmethod
+    def from_game_state(cls, other):
+        '''
+        copy the position of a regular game_state, the pieces are copied so searching never touches other
+        '''
+        position = cls()
+        position.board = [[Player.EMPTY] * DIMENSION_COL for _ in range(DIMENSION_ROW)]
+        for row in range(DIMENSION_ROW):
+            for col in range(DIMENSION_COL):
+                if other.is_valid_piece(row, col):
+                    piece = other.get_piece(row, col)
+                    position.board[row][col] = PIECE_CLASSES[PIECE_INDEX[piece.get_name()]](
+                        piece.get_name(), row, col, piece.get_player())
+        position.white_turn = other.white_turn
+        position.white_king_can_castle = list(other.white_king_can_castle)
+        position.black_king_can_castle = list(other.black_king_can_castle)
+        position.load_bitboards()
+        return position
+
+    def load_bitboards(self):
+        self.pieces = [[0] * 6, [0] * 6]
+        self.occupancy = [0, 0]
+        self.squares = [EMPTY] * self.tables.size
+        for row in range(DIMENSION_ROW):
+            for col in range(DIMENSION_COL):
+                if self.is_valid_piece(row, col):
+                    piece = self.board[row][col]
+                    color = WHITE if piece.is_player(Player.PLAYER_1) else BLACK
+                    piece_type = PIECE_INDEX[piece.get_name()]
+                    sq = row * DIMENSION_COL + col
+                    self.pieces[color][piece_type] |= 1 << sq
+                    self.occupancy[color] |= 1 << sq
+                    self.squares[sq] = color * 6 + piece_type
+                    if piece_type == KING:
+                        if color == WHITE:
+                            self._white_king_location = (row, col)
+                        else:
+                            self._black_king_location = (row, col)
+        # en passant is not part of the rules here, the square behind a double step is only kept for the undo stack
+        self.en_passant = EMPTY
+        self._hash = self.compute_hash()
+        self.evaluate_squares()
+
+    def compute_piece_squares(self):
+        # the occupancy masks are the piece sets here, make_move and undo_move keep them up to date
+        pass
+
+    def player_pieces(self, player):
+        board = self.board
+        coords = self.tables.coords
+        for sq in iterate_squares(self.occupancy[WHITE if player == Player.PLAYER_1 else BLACK]):
+            row, col = coords[sq]
+            yield row, col, board[row][col]
+
+    def evaluate_squares(self):
+        '''
+        compute_evaluation from the piece codes on the squares, one indexed sum per color
+        '''
+        self._material = [0, 0]
+        self._positional = [0, 0]
+        for sq, code in enumerate(self.squares):
+            if code != EMPTY:
+                self._material[code // 6] += VALUE_CODES[code]
+                self._positional[code // 6] += SQUARE_VALUE_CODES[code][sq]
+
+    def set_bitboards(self, placements, white_turn):
+        '''
+        sets up a position from (color, piece type, square) triples on the bitboards only, self.board and the hash
+        are not touched, for running legal_move_squares over many positions when building a tablebase
+        '''
+        self.pieces = [[0] * 6, [0] * 6]
+        self.occupancy = [0, 0]
+        self.squares = [EMPTY] * self.tables.size
+        for color, piece_type, sq in placements:
+            self.pieces[color][piece_type] |= 1 << sq
+            self.occupancy[color] |= 1 << sq
+            self.squares[sq] = color * 6 + piece_type
+        self.white_turn = white_turn
+
+    # attack detection
+    def slider_attacks(self, sq, occupied, directions):
+        rays = self.tables.rays
+        attacks = 0
+        for d in directions:
+            ray = rays[d][sq]
+            blockers = ray & occupied
+            if blockers:
+                # the first blocker is the lowest bit for the first four directions, the highest for the rest
+                if d < 4:
+                    blocker = (blockers & -blockers).bit_length() - 1
+                else:
+                    blocker = blockers.bit_length() - 1
+                ray ^= rays[d][blocker]
+            attacks |= ray
+        return attacks
+
+    def attackers_to(self, sq, by_color, occupied):
+        t = self.tables
+        them = self.pieces[by_color]
+        attackers = (t.knight[sq] & them[KNIGHT]) | (t.king[sq] & them[KING]) | \
+                    (t.pawn_attacks[1 - by_color][sq] & them[PAWN])
+        straight = them[ROOK] | them[QUEEN]
+        if straight:
+            attackers |= self.slider_attacks(sq, occupied, ROOK_DIRECTIONS) & straight
+        diagonal = them[BISHOP] | them[QUEEN]
+        if diagonal:
+            attackers |= self.slider_attacks(sq, occupied, BISHOP_DIRECTIONS) & diagonal
+        return attackers
+
+    def is_square_attacked(self, sq, by_color, occupied):
+        return self.attackers_to(sq, by_color, occupied) != 0
+
+    def king_square(self, color):
+        return lowest_square(self.pieces[color][KING])
+
+    def is_in_check(self, color):
+        king = self.pieces[color][KING]
+        if not king:
+            return False
+        return self.is_square_attacked(lowest_square(king), 1 - color, self.occupancy[0] | self.occupancy[1])
+
+    def in_check(self, player):
+        return self.is_in_check(WHITE if player == Player.PLAYER_1 else BLACK)
+
+    def pinned_pieces(self, color, king_sq, occupied):
+        '''
+        returns {pinned square: mask of squares it may still move to}
+        '''
+        rays = self.tables.rays
+        between = self.tables.between
+        them = self.pieces[1 - color]
+        own = self.occupancy[color]
+        pins = {}
+        for d in range(8):
+            sliders = them[QUEEN] | (them[ROOK] if d in ROOK_DIRECTIONS else them[BISHOP])
+            ray = rays[d][king_sq]
+            if not sliders & ray:
+                continue
+            blockers = ray & occupied
+            if not blockers:
+                continue
+            first = (blockers & -blockers).bit_length() - 1 if d < 4 else blockers.bit_length() - 1
+            if not (own >> first) & 1:
+                continue
+            blockers &= rays[d][first]
+            if not blockers:
+                continue
+            second = (blockers & -blockers).bit_length() - 1 if d < 4 else blockers.bit_length() - 1
+            if (sliders >> second) & 1:
+                pins[first] = between[king_sq][second] | (1 << second)
+        return pins
+
+    # move generation
+    def move_context(self, color):
+        '''
+        returns (king square, checking pieces, the squares a piece other than the king has to move to, pins)
+        or None if color has no king
+        '''
+        king = self.pieces[color][KING]
+        if not king:
+            return None
+        king_sq = (king & -king).bit_length() - 1
+        occupied = self.occupancy[0] | self.occupancy[1]
+        checkers = self.attackers_to(king_sq, 1 - color, occupied)
+        if checkers and not checkers & (checkers - 1):
+            checker_sq = (checkers & -checkers).bit_length() - 1
+            target_mask = checkers | self.tables.between[king_sq][checker_sq]
+        else:
+            target_mask = -1
+        return king_sq, checkers, target_mask, self.pinned_pieces(color, king_sq, occupied)
+
+    def piece_targets(self, color, from_sq, own, enemy):
+        '''
+        squares the piece on from_sq (not a king) attacks or can push to, before checks and pins
+        '''
+        t = self.tables
+        occupied = own | enemy
+        piece_type = self.squares[from_sq] % 6
+        if piece_type == PAWN:
+            forward = -DIMENSION_COL if color == WHITE else DIMENSION_COL
+            targets = t.pawn_attacks[color][from_sq] & enemy
+            one_step = from_sq + forward
+            if 0 <= one_step < t.size and not (occupied >> one_step) & 1:
+                targets |= 1 << one_step
+                two_step = one_step + forward
+                start_row = DIMENSION_ROW - 2 if color == WHITE else 1
+                if t.coords[from_sq][0] == start_row and 0 <= two_step < t.size and not (occupied >> two_step) & 1:
+                    targets |= 1 << two_step
+            return targets
+        if piece_type == KNIGHT:
+            return t.knight[from_sq] & ~own
+        if piece_type == BISHOP:
+            return self.slider_attacks(from_sq, occupied, BISHOP_DIRECTIONS) & ~own
+        if piece_type == ROOK:
+            return self.slider_attacks(from_sq, occupied, ROOK_DIRECTIONS) & ~own
+        return self.slider_attacks(from_sq, occupied, range(8)) & ~own
+
+    def legal_targets(self, color, from_mask=-1, wanted=-1):
+        '''
+        yields (from square, mask of its legal target squares) for the pieces of color in from_mask, the king first
+        with its castling squares as a second entry, targets are limited to wanted
+        nothing is yielded for pieces that can not move into a check or out of a pin, no list of moves is built
+        '''
+        t = self.tables
+        own = self.occupancy[color]
+        enemy = self.occupancy[1 - color]
+        occupied = own | enemy
+
+        context = self.move_context(color)
+        if context is None:
+            return
+        king_sq, checkers, target_mask, pins = context
+
+        # king moves, the king itself is taken off the board so it can not hide behind its own square
+        if (from_mask >> king_sq) & 1:
+            without_king = occupied ^ (1 << king_sq)
+            targets = 0
+            for to_sq in iterate_squares(t.king[king_sq] & ~own & wanted):
+                if not self.is_square_attacked(to_sq, 1 - color, without_king):
+                    targets |= 1 << to_sq
+            yield king_sq, targets
+            if not checkers:
+                targets = 0
+                for to_sq in self.castling_squares(color, king_sq, occupied):
+                    targets |= 1 << to_sq
+                yield king_sq, targets & wanted
+
+        if checkers & (checkers - 1):
+            # double check, only the king can move
+            return
+
+        for from_sq in iterate_squares(own & ~(1 << king_sq) & from_mask):
+            targets = self.piece_targets(color, from_sq, own, enemy) & target_mask & wanted
+            if from_sq in pins:
+                targets &= pins[from_sq]
+            yield from_sq, targets
+
+    def legal_move_squares(self, color, from_mask=-1, wanted=-1):
+        '''
+        returns legal (from square, to square) index pairs for color, limited to the pieces in from_mask and to
+        the squares in wanted
+        '''
+        moves = []
+        for from_sq, targets in self.legal_targets(color, from_mask, wanted):
+            for to_sq in iterate_squares(targets):
+                moves.append((from_sq, to_sq))
+        return moves
+
+    def count_legal_moves(self, player):
+        count = 0
+        for _, targets in self.legal_targets(WHITE if player == Player.PLAYER_1 else BLACK):
+            count += bin(targets).count("1")
+        return count
+
+    def staged_legal_moves(self, player, hash_move=None, capture_key=None, quiet_key=None, quiets=True):
+        '''
+        yields the legal moves of player in stages: hash_move if it is legal here, the captures and promotions sorted
+        by capture_key, then the quiet moves sorted by quiet_key (left out if quiets is False)
+        a stage is only generated when the one before it is used up, so a search that cuts off early never pays for
+        the later ones
+        the moves are packed ints for make_move, which plays them without checking them again
+        '''
+        color = WHITE if player == Player.PLAYER_1 else BLACK
+        if hash_move is not None:
+            from_sq = hash_move & SQUARE_MASK
+            to_sq = (hash_move >> 7) & SQUARE_MASK
+            # a move of another position with the same hash is packed differently or is not legal here
+            if self.squares[from_sq] // 6 == color and self.search_move(from_sq, to_sq) == hash_move and \
+                    self.legal_move_squares(color, 1 << from_sq, 1 << to_sq):
+                yield hash_move
+            else:
+                hash_move = None
+
+        enemy = self.occupancy[1 - color]
+        promotion_row = (1 << DIMENSION_COL) - 1
+        if color == BLACK:
+            promotion_row <<= (DIMENSION_ROW - 1) * DIMENSION_COL
+        pawns = self.pieces[color][PAWN]
+        captures = [self.search_move(from_sq, to_sq)
+                    for from_sq, targets in self.legal_targets(color, -1, enemy | promotion_row)
+                    for to_sq in iterate_squares(targets)
+                    if (enemy >> to_sq) & 1 or (pawns >> from_sq) & 1]
+        if capture_key is not None:
+            captures.sort(key=capture_key)
+        for move in captures:
+            if move != hash_move:
+                yield move
+        if not quiets:
+            return
+
+        quiet_squares = ~(enemy | self.occupancy[color])
+        moves = [self.search_move(from_sq, to_sq)
+                 for from_sq, targets in self.legal_targets(color, -1, quiet_squares)
+                 for to_sq in iterate_squares(targets)
+                 if not ((pawns >> from_sq) & 1 and (promotion_row >> to_sq) & 1)]
+        if quiet_key is not None:
+            moves.sort(key=quiet_key)
+        for move in moves:
+            if move != hash_move:
+                yield move
+
+    def search_move(self, from_sq, to_sq):
+        '''
+        packs a move of this position the way the search plays it, a pawn reaching the last row becomes a queen
+        '''
+        promotion = None
+        if self.squares[from_sq] % 6 == PAWN and \
+                (to_sq < DIMENSION_COL or to_sq >= (DIMENSION_ROW - 1) * DIMENSION_COL):
+            promotion = QUEEN
+        return self.encode_move(from_sq, to_sq, promotion)
+
+    def pack_action(self, action):
+        start, end = action
+        return self.search_move(start[0] * DIMENSION_COL + start[1], end[0] * DIMENSION_COL + end[1])
+
+    def unpack_action(self, move):
+        from_sq, to_sq, _ = unpack_move(move)
+        coords = self.tables.coords
+        return coords[from_sq], coords[to_sq]
+
+    def is_capture(self, move):
+        return move & CAPTURE != 0
+
+    def castling_squares(self, color, king_sq, occupied):
+        '''
+        castling only exists on the 8 column board, the king starts on column 3 and moves two squares
+        same rule as game_state.king_can_castle
+        '''
+        if DIMENSION_COL != 8:
+            return []
+        rights = self.white_king_can_castle if color == WHITE else self.black_king_can_castle
+        row = DIMENSION_ROW - 1 if color == WHITE else 0
+        base = row * DIMENSION_COL
+        if not rights[0] or king_sq != base + 3:
+            return []
+        rooks = self.pieces[color][ROOK]
+        squares = []
+        if rights[1] and (rooks >> base) & 1 and not occupied & (0b110 << base) and \
+                not self.is_square_attacked(base + 2, 1 - color, occupied) and \
+                not self.is_square_attacked(base + 1, 1 - color, occupied):
+            squares.append(base + 1)
+        if rights[2] and (rooks >> (base + 7)) & 1 and not occupied & (0b1110000 << base) and \
+                not self.is_square_attacked(base + 4, 1 - color, occupied) and \
+                not self.is_square_attacked(base + 5, 1 - color, occupied):
+            squares.append(base + 5)
+        return squares
+
+    def get_all_legal_moves(self, player):
+        color = WHITE if player == Player.PLAYER_1 else BLACK
+        coords = self.tables.coords
+        return [(coords[from_sq], coords[to_sq]) for from_sq, to_sq in self.legal_move_squares(color)]
+
+    def get_valid_moves(self, starting_square):
+        row, col = starting_square
+        if not self.is_valid_piece(row, col):
+            return None
+        sq = row * DIMENSION_COL + col
+        color = self.squares[sq] // 6
+        coords = self.tables.coords
+        return [coords[to_sq] for _, to_sq in self.legal_move_squares(color, 1 << sq)]
+
+    def king_can_castle_left(self, player):
+        color = WHITE if player == Player.PLAYER_1 else BLACK
+        occupied = self.occupancy[0] | self.occupancy[1]
+        king_sq = self.king_square(color)
+        return not self.is_in_check(color) and \
+            (king_sq - 2) in self.castling_squares(color, king_sq, occupied)
+
+    def king_can_castle_right(self, player):
+        color = WHITE if player == Player.PLAYER_1 else BLACK
+        occupied = self.occupancy[0] | self.occupancy[1]
+        king_sq = self.king_square(color)
+        return not self.is_in_check(color) and \
+            (king_sq + 2) in self.castling_squares(color, king_sq, occupied)
+
+    # 0 if white lost, 1 if black lost, 2 if stalemate, 3 if not game over
+    def find_terminal_status(self):
+        color = WHITE if self.white_turn else BLACK
+        if self.has_legal_move(COLORS[color]):
+            return 3
+        if self.is_in_check(color):
+            return 0 if color == WHITE else 1
+        return 2
+
+    def has_legal_move(self, player, context=None):
+        '''
+        stops at the first piece with a legal target, the king, whose squares all need an attack test, is tried last
+        '''
+        color = WHITE if player == Player.PLAYER_1 else BLACK
+        king = self.pieces[color][KING]
+        for from_mask in (~king, king):
+            for _, targets in self.legal_targets(color, from_mask):
+                if targets:
+                    return True
+        return False
+
+    # making and unmaking moves
+    def move_piece(self, starting_square, ending_square, is_ai):
+        row, col = starting_square
+        if not self.is_valid_piece(row, col):
+            return
+        from_sq = row * DIMENSION_COL + col
+        to_sq = ending_square[0] * DIMENSION_COL + ending_square[1]
+        color = self.squares[from_sq] // 6
+        if color != (WHITE if self.white_turn else BLACK):
+            return
+        if (from_sq, to_sq) not in self.legal_move_squares(color, 1 << from_sq):
+            return
+        promotion = None
+        if self.squares[from_sq] % 6 == PAWN and ending_square[0] in (0, DIMENSION_ROW - 1):
+            promotion = QUEEN if is_ai else self.ask_promotion()
+        self.make_move(self.encode_move(from_sq, to_sq, promotion))
+
+    def ask_promotion(self):
+        while True:
+            new_piece_name = input("Change pawn to (r, n, b, q):\n")
+            if new_piece_name in ("r", "n", "b", "q"):
+                return PIECE_INDEX[new_piece_name]
+            print("Please choose from these four: r, n, b, q.\n")
+
+    def encode_move(self, from_sq, to_sq, promotion=None):
+        '''
+        packs a move of this position, the flags are read off the board
+        '''
+        flags = 0
+        if self.squares[to_sq] != EMPTY:
+            flags |= CAPTURE
+        piece_type = self.squares[from_sq] % 6
+        if piece_type == KING and abs(to_sq - from_sq) == 2:
+            flags |= CASTLE
+        elif piece_type == PAWN and abs(to_sq - from_sq) == 2 * DIMENSION_COL:
+            flags |= DOUBLE_STEP
+        return pack_move(from_sq, to_sq, promotion, flags)
+
+    def castling_bits(self):
+        white = self.white_king_can_castle
+        black = self.black_king_can_castle
+        return white[0] | white[1] << 1 | white[2] << 2 | black[0] << 3 | black[1] << 4 | black[2] << 5
+
+    def restore_castling(self, bits):
+        white = self.white_king_can_castle
+        black = self.black_king_can_castle
+        white[0] = bits & 1 != 0
+        white[1] = bits & 2 != 0
+        white[2] = bits & 4 != 0
+        black[0] = bits & 8 != 0
+        black[1] = bits & 16 != 0
+        black[2] = bits & 32 != 0
+
+    def make_move(self, move):
+        '''
+        play a packed move that is already known to be legal
+        everything the move destroys goes into the next entry of the undo stack, no new containers are made
+        '''
+        from_sq = move & SQUARE_MASK
+        to_sq = (move >> 7) & SQUARE_MASK
+        promotion = (move >> 14) & 0x7
+        coords = self.tables.coords
+        from_row, from_col = coords[from_sq]
+        to_row, to_col = coords[to_sq]
+        code = self.squares[from_sq]
+        color = code // 6
+        piece_type = code % 6
+        captured = self.squares[to_sq]
+        moving_piece = self.board[from_row][from_col]
+
+        if self.ply == len(self.undo_stack):
+            self.undo_stack.extend(undo_entry() for _ in range(UNDO_PLIES))
+        entry = self.undo_stack[self.ply]
+        self.ply += 1
+        entry.move = move
+        entry.captured = captured
+        entry.moving_piece = moving_piece
+        entry.captured_piece = self.board[to_row][to_col]
+        entry.en_passant = self.en_passant
+        entry.hash = self._hash
+        entry.white_material, entry.black_material = self._material
+        entry.white_positional, entry.black_positional = self._positional
+
+        h = self._hash ^ ZOBRIST.black_to_move ^ ZOBRIST_CODES[code][from_sq]
+        # only king and rook moves and rook captures can take castling rights away
+        castling = -1
+        if piece_type == KING or piece_type == ROOK or captured % 6 == ROOK:
+            castling = self.castling_bits()
+            h ^= self.castling_hash()
+        entry.castling = castling
+
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        own = self.pieces[color]
+        if captured != EMPTY:
+            self.pieces[1 - color][captured % 6] ^= to_bit
+            self.occupancy[1 - color] ^= to_bit
+            h ^= ZOBRIST_CODES[captured][to_sq]
+            self._material[1 - color] -= VALUE_CODES[captured]
+            self._positional[1 - color] -= SQUARE_VALUE_CODES[captured][to_sq]
+        self.occupancy[color] ^= from_bit | to_bit
+        self.squares[from_sq] = EMPTY
+        self.board[from_row][from_col] = Player.EMPTY
+        if not promotion:
+            own[piece_type] ^= from_bit | to_bit
+            self.squares[to_sq] = code
+            moving_piece.change_row_number(to_row)
+            moving_piece.change_col_number(to_col)
+            self.board[to_row][to_col] = moving_piece
+        else:
+            promotion -= 1
+            own[PAWN] ^= from_bit
+            own[promotion] ^= to_bit
+            self.squares[to_sq] = color * 6 + promotion
+            self.board[to_row][to_col] = PIECE_CLASSES[promotion](PIECE_NAMES[promotion], to_row, to_col,
+                                                                  COLORS[color])
+        self.en_passant = (from_sq + to_sq) // 2 if move & DOUBLE_STEP else EMPTY
+
+        rights = self.white_king_can_castle if color == WHITE else self.black_king_can_castle
+        if piece_type == KING:
+            if color == WHITE:
+                self._white_king_location = coords[to_sq]
+            else:
+                self._black_king_location = coords[to_sq]
+            rights[0] = False
+        elif piece_type == ROOK and DIMENSION_COL == 8:
+            if from_col == 0:
+                rights[1] = False
+            elif from_col == 7:
+                rights[2] = False
+        if captured % 6 == ROOK and DIMENSION_COL == 8:
+            enemy_rights = self.black_king_can_castle if color == WHITE else self.white_king_can_castle
+            if to_col == 0:
+                enemy_rights[1] = False
+            elif to_col == 7:
+                enemy_rights[2] = False
+
+        h ^= ZOBRIST_CODES[self.squares[to_sq]][to_sq]
+        self._material[color] += VALUE_CODES[self.squares[to_sq]] - VALUE_CODES[code]
+        self._positional[color] += SQUARE_VALUE_CODES[self.squares[to_sq]][to_sq] - SQUARE_VALUE_CODES[code][from_sq]
+        if move & CASTLE:
+            rook = color * 6 + ROOK
+            # the rook of the side castled to loses its flag too, like game_state.move_piece
+            if to_sq < from_sq:
+                rook_from, rook_to = from_sq - 3, from_sq - 1
+                rights[1] = False
+            else:
+                rook_from, rook_to = from_sq + 4, from_sq + 1
+                rights[2] = False
+            self.shift_piece(rook_from, rook_to)
+            h ^= ZOBRIST_CODES[rook][rook_from] ^ ZOBRIST_CODES[rook][rook_to]
+            self._positional[color] += SQUARE_VALUE_CODES[rook][rook_to] - SQUARE_VALUE_CODES[rook][rook_from]
+
+        if castling >= 0:
+            h ^= self.castling_hash()
+        self.white_turn = not self.white_turn
+        self._hash = h
+
+    def shift_piece(self, from_sq, to_sq):
+        '''
+        move a piece to an empty square without any bookkeeping, used for the rook when castling
+        '''
+        coords = self.tables.coords
+        code = self.squares[from_sq]
+        bits = (1 << from_sq) | (1 << to_sq)
+        self.pieces[code // 6][code % 6] ^= bits
+        self.occupancy[code // 6] ^= bits
+        self.squares[to_sq] = code
+        self.squares[from_sq] = EMPTY
+        piece = self.board[coords[from_sq][0]][coords[from_sq][1]]
+        piece.change_row_number(coords[to_sq][0])
+        piece.change_col_number(coords[to_sq][1])
+        self.board[coords[to_sq][0]][coords[to_sq][1]] = piece
+        self.board[coords[from_sq][0]][coords[from_sq][1]] = Player.EMPTY
+
+    def undo_move(self):
+        '''
+        takes back the last make_move from the undo stack, returns its packed move or None if there is none
+        '''
+        if not self.ply:
+            return None
+        self.ply -= 1
+        entry = self.undo_stack[self.ply]
+        move = entry.move
+        captured = entry.captured
+        moving_piece = entry.moving_piece
+        from_sq = move & SQUARE_MASK
+        to_sq = (move >> 7) & SQUARE_MASK
+        promotion = (move >> 14) & 0x7
+        coords = self.tables.coords
+        from_row, from_col = coords[from_sq]
+        to_row, to_col = coords[to_sq]
+        code = self.squares[to_sq]
+        color = code // 6
+
+        if move & CASTLE:
+            if to_sq < from_sq:
+                self.shift_piece(from_sq - 1, from_sq - 3)
+            else:
+                self.shift_piece(from_sq + 1, from_sq + 4)
+
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        own = self.pieces[color]
+        if not promotion:
+            own[code % 6] ^= from_bit | to_bit
+        else:
+            own[promotion - 1] ^= to_bit
+            own[PAWN] ^= from_bit
+            code = color * 6 + PAWN
+        self.occupancy[color] ^= from_bit | to_bit
+        self.squares[from_sq] = code
+        self.squares[to_sq] = captured
+        if captured != EMPTY:
+            self.pieces[1 - color][captured % 6] ^= to_bit
+            self.occupancy[1 - color] ^= to_bit
+
+        moving_piece.change_row_number(from_row)
+        moving_piece.change_col_number(from_col)
+        self.board[from_row][from_col] = moving_piece
+        self.board[to_row][to_col] = entry.captured_piece
+
+        if code % 6 == KING:
+            if color == WHITE:
+                self._white_king_location = coords[from_sq]
+            else:
+                self._black_king_location = coords[from_sq]
+        if entry.castling >= 0:
+            self.restore_castling(entry.castling)
+        self.en_passant = entry.en_passant
+        self._hash = entry.hash
+        self._material[WHITE] = entry.white_material
+        self._material[BLACK] = entry.black_material
+        self._positional[WHITE] = entry.white_positional
+        self._positional[BLACK] = entry.black_positional
+        self.white_turn = not self.white_turn
+        return move
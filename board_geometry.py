@@ -0,0 +1,60 @@
+#
+# Move geometry of the board, built once per board size
+# For every square: the knight and king targets, the squares a pawn of each color attacks and the squares in each of
+# the 8 directions up to the edge, nearest first. The Piece classes and check_for_check walk these lists instead of
+# adding offsets and testing the bounds of the board on every call.
+#
+from enums import Player
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, 1), (2, -1)]
+KING_OFFSETS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+PAWN_ATTACK_OFFSETS = {Player.PLAYER_1: [(-1, -1), (-1, 1)], Player.PLAYER_2: [(1, -1), (1, 1)]}
+
+# (row change, col change) of the rays: left, right, down, up, then left up, right up, left down, right down
+ROOK_DIRECTIONS = [(0, -1), (0, 1), (1, 0), (-1, 0)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+class board_geometry:
+    '''
+    the tables are indexed [row][col] and hold lists of (row, col) squares
+    '''
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.knight = self.step_table(KNIGHT_OFFSETS)
+        self.king = self.step_table(KING_OFFSETS)
+        self.pawn_attacks = {player: self.step_table(offsets) for player, offsets in PAWN_ATTACK_OFFSETS.items()}
+        # rays[row][col][direction], in the order of DIRECTIONS
+        self.rays = [[[self.ray(row, col, direction) for direction in DIRECTIONS] for col in range(cols)]
+                     for row in range(rows)]
+        self.rook_rays = [[squares[:4] for squares in row] for row in self.rays]
+        self.bishop_rays = [[squares[4:] for squares in row] for row in self.rays]
+
+    def on_board(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def step_table(self, offsets):
+        return [[[(row + row_change, col + col_change) for row_change, col_change in offsets
+                  if self.on_board(row + row_change, col + col_change)]
+                 for col in range(self.cols)] for row in range(self.rows)]
+
+    def ray(self, row, col, direction):
+        squares = []
+        row += direction[0]
+        col += direction[1]
+        while self.on_board(row, col):
+            squares.append((row, col))
+            row += direction[0]
+            col += direction[1]
+        return squares
+
+
+_geometries = {}
+
+
+def get_geometry(rows, cols):
+    if (rows, cols) not in _geometries:
+        _geometries[(rows, cols)] = board_geometry(rows, cols)
+    return _geometries[(rows, cols)]
@@ -5,12 +5,21 @@
 # Note: move log class inspired by Eddie Sharick
 #
 from Piece import Rook, Knight, Bishop, Queen, King, Pawn
+from board_geometry import get_geometry
 from enums import Player
+from piece_square_tables import PIECE_VALUES, PIECE_NAMES, PIECE_CODES, compile_tables
 import constants
 import copy
+import random
 
 DIMENSION_ROW = constants.DIMENSION_ROW
 DIMENSION_COL = constants.DIMENSION_COL
+GEOMETRY = get_geometry(DIMENSION_ROW, DIMENSION_COL)
+
+# fixed seed so a position hashes to the same number in every run (q_agent saves hashes to disk)
+ZOBRIST_SEED = 4100
+# terminal_status results kept per game_state before the cache is emptied
+STATUS_CACHE_SIZE = 1 << 16
 
 '''
 r \ c     0           1           2           3           4           5           6           7 
@@ -25,6 +34,46 @@ r \ c     0           1           2           3           4           5
 '''
 
 
+class zobrist_keys:
+    '''
+    random 64 bit keys for every (piece, square), black to move and each castling flag
+    '''
+    def __init__(self, rows, cols, seed=ZOBRIST_SEED):
+        generator = random.Random(seed)
+        self.pieces = {}
+        for player in (Player.PLAYER_1, Player.PLAYER_2):
+            for name in ("p", "n", "b", "r", "q", "k"):
+                self.pieces[(player, name)] = [generator.getrandbits(64) for _ in range(rows * cols)]
+        self.black_to_move = generator.getrandbits(64)
+        self.white_castle = [generator.getrandbits(64) for _ in range(3)]
+        self.black_castle = [generator.getrandbits(64) for _ in range(3)]
+
+    def piece_key(self, piece, row, col):
+        return self.pieces[(piece.get_player(), piece.get_name())][row * DIMENSION_COL + col]
+
+
+ZOBRIST = zobrist_keys(DIMENSION_ROW, DIMENSION_COL)
+
+
+class evaluation_values:
+    '''
+    material and piece-square table value of every piece code and square, from the side of the piece's owner
+    game_state keeps the sums of both per color up to date the same way as the hash
+    '''
+    def __init__(self, rows, cols):
+        self.values = [PIECE_VALUES[PIECE_NAMES[code % 6]] for code in range(12)]
+        self.tables = compile_tables(rows, cols)
+
+    def piece_code(self, piece):
+        return PIECE_CODES[(piece.get_player(), piece.get_name())]
+
+    def square_value(self, piece, row, col):
+        return self.tables[self.piece_code(piece)][row * DIMENSION_COL + col]
+
+
+EVALUATION = evaluation_values(DIMENSION_ROW, DIMENSION_COL)
+
+
 # TODO: Flip the board according to the player
 # TODO: Pawns are usually indicated by no letters
 # TODO: stalemate
@@ -51,6 +100,7 @@ class game_state:
         self.pgns = []
 
         self._is_check = False
+        self._status_cache = {}
         if DIMENSION_COL == 4:
             self.init_4x4()
         elif DIMENSION_COL == 6:
@@ -59,6 +109,9 @@ class game_state:
             self.init_8x8()
         else:
             print("error")
+        self._hash = self.compute_hash()
+        self.compute_evaluation()
+        self.compute_piece_squares()
         
     def init_4x4(self):
         self._black_king_location = [0, 2]
@@ -278,6 +331,146 @@ class game_state:
                 out = out + str(piece) + ","
         return out
 
+    def hash(self):
+        '''
+        64 bit zobrist hash of the position, side to move and castling rights
+        kept up to date by move_piece, promote_pawn(_ai) and undo_move
+        '''
+        return self._hash
+
+    def compute_hash(self):
+        h = 0
+        for row in range(DIMENSION_ROW):
+            for col in range(DIMENSION_COL):
+                if self.is_valid_piece(row, col):
+                    h ^= ZOBRIST.piece_key(self.board[row][col], row, col)
+        if not self.white_turn:
+            h ^= ZOBRIST.black_to_move
+        return h ^ self.castling_hash()
+
+    def castling_hash(self):
+        # castling only exists on the 8 column board, elsewhere the flags do not change the position
+        h = 0
+        if DIMENSION_COL == 8:
+            for i in range(3):
+                if self.white_king_can_castle[i]:
+                    h ^= ZOBRIST.white_castle[i]
+                if self.black_king_can_castle[i]:
+                    h ^= ZOBRIST.black_castle[i]
+        return h
+
+    def update_hash(self, move, castling_hash_before):
+        '''
+        xor the squares touched by move into the hash, the promoted piece is handled by promote_pawn(_ai)
+        '''
+        h = self._hash ^ ZOBRIST.black_to_move ^ castling_hash_before ^ self.castling_hash()
+        h ^= ZOBRIST.piece_key(move.moving_piece, move.starting_square_row, move.starting_square_col)
+        h ^= ZOBRIST.piece_key(move.moving_piece, move.ending_square_row, move.ending_square_col)
+        if move.removed_piece != Player.EMPTY:
+            h ^= ZOBRIST.piece_key(move.removed_piece, move.ending_square_row, move.ending_square_col)
+        if move.castled:
+            h ^= ZOBRIST.piece_key(move.moving_rook, move.rook_starting_square[0], move.rook_starting_square[1])
+            h ^= ZOBRIST.piece_key(move.moving_rook, move.rook_ending_square[0], move.rook_ending_square[1])
+        if move.en_passaned:
+            h ^= ZOBRIST.piece_key(move.en_passant_eaten_piece, move.en_passant_eaten_square[0],
+                                   move.en_passant_eaten_square[1])
+        self._hash = h
+
+    def material(self, player):
+        '''
+        sum of the piece values of player's pieces, kept up to date like the hash
+        '''
+        return self._material[0 if player == Player.PLAYER_1 else 1]
+
+    def positional(self, player):
+        '''
+        sum of the piece-square table values of player's pieces, read from player's side of the board
+        '''
+        return self._positional[0 if player == Player.PLAYER_1 else 1]
+
+    def evaluation_totals(self):
+        return self._material[0], self._material[1], self._positional[0], self._positional[1]
+
+    def restore_evaluation(self, totals):
+        self._material = [totals[0], totals[1]]
+        self._positional = [totals[2], totals[3]]
+
+    def compute_evaluation(self):
+        self._material = [0, 0]
+        self._positional = [0, 0]
+        for row in range(DIMENSION_ROW):
+            for col in range(DIMENSION_COL):
+                if self.is_valid_piece(row, col):
+                    self.add_value(self.board[row][col], row, col, 1)
+
+    def add_value(self, piece, row, col, sign):
+        code = EVALUATION.piece_code(piece)
+        self._material[code // 6] += sign * EVALUATION.values[code]
+        self._positional[code // 6] += sign * EVALUATION.tables[code][row * DIMENSION_COL + col]
+
+    def compute_piece_squares(self):
+        # square indexes (row * DIMENSION_COL + col) of the white and of the black pieces
+        self._piece_squares = [set(), set()]
+        for row in range(DIMENSION_ROW):
+            for col in range(DIMENSION_COL):
+                if self.is_valid_piece(row, col):
+                    self._piece_squares[0 if self.board[row][col].is_player(Player.PLAYER_1) else 1].add(
+                        row * DIMENSION_COL + col)
+
+    def player_pieces(self, player):
+        '''
+        yields (row, col, piece) for each of player's pieces, without visiting the empty squares
+        the order is the set's, not board order, but the same for the same moves as int hashes are not randomized
+        '''
+        board = self.board
+        for square in self._piece_squares[0 if player == Player.PLAYER_1 else 1]:
+            row, col = divmod(square, DIMENSION_COL)
+            yield row, col, board[row][col]
+
+    def update_piece_squares(self, move, undo=False):
+        '''
+        moves the squares touched by move between the piece sets, or back again when the move is undone
+        '''
+        own, enemy = self._piece_squares
+        if not move.moving_piece.is_player(Player.PLAYER_1):
+            own, enemy = enemy, own
+        start = move.starting_square_row * DIMENSION_COL + move.starting_square_col
+        end = move.ending_square_row * DIMENSION_COL + move.ending_square_col
+        changes = [(own, start, end)]
+        if move.castled:
+            changes.append((own, move.rook_starting_square[0] * DIMENSION_COL + move.rook_starting_square[1],
+                            move.rook_ending_square[0] * DIMENSION_COL + move.rook_ending_square[1]))
+        for squares, moved_from, moved_to in changes:
+            if undo:
+                moved_from, moved_to = moved_to, moved_from
+            squares.discard(moved_from)
+            squares.add(moved_to)
+        taken = []
+        if move.removed_piece != Player.EMPTY:
+            taken.append(end)
+        if move.en_passaned:
+            taken.append(move.en_passant_eaten_square[0] * DIMENSION_COL + move.en_passant_eaten_square[1])
+        for square in taken:
+            if undo:
+                enemy.add(square)
+            else:
+                enemy.discard(square)
+
+    def update_evaluation(self, move):
+        '''
+        moves the values of the squares touched by move, the promoted piece is handled by promote_pawn(_ai)
+        '''
+        self.add_value(move.moving_piece, move.starting_square_row, move.starting_square_col, -1)
+        self.add_value(move.moving_piece, move.ending_square_row, move.ending_square_col, 1)
+        if move.removed_piece != Player.EMPTY:
+            self.add_value(move.removed_piece, move.ending_square_row, move.ending_square_col, -1)
+        if move.castled:
+            self.add_value(move.moving_rook, move.rook_starting_square[0], move.rook_starting_square[1], -1)
+            self.add_value(move.moving_rook, move.rook_ending_square[0], move.rook_ending_square[1], 1)
+        if move.en_passaned:
+            self.add_value(move.en_passant_eaten_piece, move.en_passant_eaten_square[0],
+                           move.en_passant_eaten_square[1], -1)
+
     def get_piece(self, row, col):
         if (0 <= row < DIMENSION_ROW) and (0 <= col < DIMENSION_COL):
             return self.board[row][col]
@@ -286,11 +479,47 @@ class game_state:
         evaluated_piece = self.get_piece(row, col)
         return (evaluated_piece is not None) and (evaluated_piece != Player.EMPTY)
 
-    def get_valid_moves(self, starting_square):
+    def squares_between(self, start, end):
+        '''
+        squares strictly between start and end on a rank, file or diagonal, empty if they are not lined up
+        '''
+        row_change = end[0] - start[0]
+        col_change = end[1] - start[1]
+        if row_change != 0 and col_change != 0 and abs(row_change) != abs(col_change):
+            return []
+        distance = max(abs(row_change), abs(col_change))
+        if distance == 0:
+            return []
+        row_step = row_change // distance
+        col_step = col_change // distance
+        return [(start[0] + row_step * i, start[1] + col_step * i) for i in range(1, distance)]
+
+    def legality_context(self, player):
+        '''
+        checks and pins against player's king, found with one check_for_check call for all of player's pieces
+        returns (checking pieces, {pinned square: squares it can move to}, squares that stop a single check)
+        '''
+        if player == Player.PLAYER_2:
+            king_location = self._black_king_location
+        else:
+            king_location = self._white_king_location
+        checking_pieces, pinned_pieces, pinned_checks = self.check_for_check(king_location, player)
+        # a pinned piece can only move along the line between the king and the piece pinning it
+        pin_rays = {}
+        for pinned, pinning in zip(pinned_pieces, pinned_checks):
+            pin_rays[pinned] = set(self.squares_between(king_location, pinning)) | {pinning}
+        # a single check is stopped by taking the checking piece or stepping in front of a sliding one
+        stop_squares = set()
+        if len(checking_pieces) == 1:
+            stop_squares = set(self.squares_between(king_location, checking_pieces[0])) | {checking_pieces[0]}
+        return checking_pieces, pin_rays, stop_squares
+
+    def get_valid_moves(self, starting_square, context=None):
         '''
         remove pins from valid moves (unless the pinned piece move can get rid of a check and checks is empty
         remove move from valid moves if the move falls within a check piece's valid move
         if the moving piece is a king, the ending square cannot be in a check
+        context is legality_context of the moving player, get_all_legal_moves passes it so it is found once
         '''
 
         current_row = starting_square[0]
@@ -299,75 +528,33 @@ class game_state:
         if self.is_valid_piece(current_row, current_col):
             valid_moves = []
             moving_piece = self.get_piece(current_row, current_col)
-            if self.get_piece(current_row, current_col).is_player(Player.PLAYER_2):
-                king_location = self._black_king_location
-            else:
-                king_location = self._white_king_location
-            group = self.check_for_check(king_location, moving_piece.get_player())
-            checking_pieces = group[0]
-            pinned_pieces = group[1]
-            pinned_checks = group[2]
+            if context is None:
+                context = self.legality_context(moving_piece.get_player())
+            checking_pieces, pin_rays, stop_squares = context
             initial_valid_piece_moves = moving_piece.get_valid_piece_moves(self)
 
             # immediate check
             if checking_pieces:
-                for move in initial_valid_piece_moves:
-                    can_move = True
-                    for piece in checking_pieces:
-                        if moving_piece.get_name() is "k":
-                            temp = self.board[current_row][current_col]
-                            self.board[current_row][current_col] = Player.EMPTY
-                            temp2 = self.board[move[0]][move[1]]
-                            self.board[move[0]][move[1]] = temp
-                            if not self.check_for_check(move, moving_piece.get_player())[0]:
-                                pass
-                            else:
-                                can_move = False
-                            self.board[current_row][current_col] = temp
-                            self.board[move[0]][move[1]] = temp2
-                        elif move == piece and len(checking_pieces) == 1 and moving_piece.get_name() is not "k" and \
-                                (current_row, current_col) not in pinned_pieces:
-                            pass
-                        elif move != piece and len(checking_pieces) == 1 and moving_piece.get_name() is not "k" and \
-                                (current_row, current_col) not in pinned_pieces:
-                            temp = self.board[move[0]][move[1]]
-                            self.board[move[0]][move[1]] = moving_piece
-                            self.board[current_row][current_col] = Player.EMPTY
-                            if self.check_for_check(king_location, moving_piece.get_player())[0]:
-                                can_move = False
-                            self.board[current_row][current_col] = moving_piece
-                            self.board[move[0]][move[1]] = temp
-                        else:
-                            can_move = False
-                    if can_move:
-                        valid_moves.append(move)
-                self._is_check = True
-            # pinned checks
-            elif pinned_pieces and moving_piece.get_name() is not "k":
-                if starting_square not in pinned_pieces:
+                if moving_piece.get_name() is "k":
                     for move in initial_valid_piece_moves:
-                        valid_moves.append(move)
-                elif starting_square in pinned_pieces:
+                        if self.king_move_is_safe(starting_square, move, moving_piece.get_player()):
+                            valid_moves.append(move)
+                # a pinned piece cannot stop a check, and nothing but the king can answer a double check
+                elif (current_row, current_col) not in pin_rays:
                     for move in initial_valid_piece_moves:
-
-                        temp = self.board[move[0]][move[1]]
-                        self.board[move[0]][move[1]] = moving_piece
-                        self.board[current_row][current_col] = Player.EMPTY
-                        if not self.check_for_check(king_location, moving_piece.get_player())[0]:
+                        if move in stop_squares:
                             valid_moves.append(move)
-                        self.board[current_row][current_col] = moving_piece
-                        self.board[move[0]][move[1]] = temp
+                self._is_check = True
+            # pinned checks
+            elif (current_row, current_col) in pin_rays and moving_piece.get_name() is not "k":
+                for move in initial_valid_piece_moves:
+                    if move in pin_rays[(current_row, current_col)]:
+                        valid_moves.append(move)
             else:
                 if moving_piece.get_name() is "k":
                     for move in initial_valid_piece_moves:
-                        temp = self.board[current_row][current_col]
-                        temp2 = self.board[move[0]][move[1]]
-                        self.board[current_row][current_col] = Player.EMPTY
-                        self.board[move[0]][move[1]] = temp
-                        if not self.check_for_check(move, moving_piece.get_player())[0]:
+                        if self.king_move_is_safe(starting_square, move, moving_piece.get_player()):
                             valid_moves.append(move)
-                        self.board[current_row][current_col] = temp
-                        self.board[move[0]][move[1]] = temp2
                 else:
                     for move in initial_valid_piece_moves:
                         valid_moves.append(move)
@@ -385,18 +572,142 @@ class game_state:
 
     # 0 if white lost, 1 if black lost, 2 if stalemate, 3 if not game over
     def checkmate_stalemate_checker(self):
-        all_black_moves = self.get_all_legal_moves(Player.PLAYER_2)
-        all_white_moves = self.get_all_legal_moves(Player.PLAYER_1)
-        if self._is_check and self.whose_turn() and not all_white_moves:
-            #print("white lost")
-            return 0
-        elif self._is_check and not self.whose_turn() and not all_black_moves:
-            #print("black lost")
-            return 1
-        elif not all_white_moves and not all_black_moves:
-            return 2
-        else:
+        return self.terminal_status()
+
+    def terminal_status(self):
+        '''
+        same codes as checkmate_stalemate_checker, only the side to move is looked at and the search for its moves
+        stops at the first legal one, results are cached by position hash
+        '''
+        status = self._status_cache.get(self._hash)
+        if status is None:
+            status = self.find_terminal_status()
+            if len(self._status_cache) >= STATUS_CACHE_SIZE:
+                self._status_cache.clear()
+            self._status_cache[self._hash] = status
+        return status
+
+    def find_terminal_status(self):
+        player = Player.PLAYER_1 if self.whose_turn() else Player.PLAYER_2
+        context = self.legality_context(player)
+        if self.has_legal_move(player, context):
             return 3
+        if context[0]:
+            return 0 if player == Player.PLAYER_1 else 1
+        return 2
+
+    def has_legal_move(self, player, context=None):
+        '''
+        stops at the first legal move, the king, whose squares all need an attack test, is tried last
+        '''
+        for count in self.legal_move_counts(player, context):
+            if count:
+                return True
+        return False
+
+    def count_legal_moves(self, player):
+        return sum(self.legal_move_counts(player))
+
+    def legal_move_counts(self, player, context=None):
+        '''
+        yields the number of legal moves of each of player's pieces, the king last
+        the same rules as get_valid_moves, but the targets of a piece are only counted, never collected in a list
+        '''
+        if context is None:
+            context = self.legality_context(player)
+        checking_pieces, pin_rays, stop_squares = context
+        king = None
+        for row, col, piece in self.player_pieces(player):
+            if piece.get_name() == "k":
+                king = (row, col), piece
+            elif checking_pieces:
+                # a pinned piece cannot stop a check, and nothing but the king can answer a double check
+                if (row, col) not in pin_rays and len(checking_pieces) == 1:
+                    yield sum(1 for move in self.piece_targets(row, col, piece) if move in stop_squares)
+            elif (row, col) in pin_rays:
+                ray = pin_rays[(row, col)]
+                yield sum(1 for move in self.piece_targets(row, col, piece) if move in ray)
+            else:
+                yield sum(1 for _ in self.piece_targets(row, col, piece))
+        if king is not None:
+            (row, col), piece = king
+            yield sum(1 for move in self.piece_targets(row, col, piece) if self.king_move_is_safe((row, col), move, player))
+
+    def piece_targets(self, row, col, piece):
+        '''
+        yields the squares of get_valid_piece_moves one at a time, checks and pins are not looked at
+        pawns, with their double steps, en passant and promotions, still go through the Piece class
+        '''
+        name = piece.get_name()
+        if name == "p":
+            yield from piece.get_valid_piece_moves(self)
+            return
+        player = piece.get_player()
+        board = self.board
+        if name == "n" or name == "k":
+            for target_row, target_col in (GEOMETRY.knight if name == "n" else GEOMETRY.king)[row][col]:
+                target = board[target_row][target_col]
+                if target == Player.EMPTY or not target.is_player(player):
+                    yield target_row, target_col
+            if name == "k":
+                home_row = 0 if player == Player.PLAYER_2 else DIMENSION_ROW - 1
+                if self.king_can_castle_left(player):
+                    yield home_row, 1
+                if self.king_can_castle_right(player):
+                    yield home_row, 5
+            return
+        rays = GEOMETRY.rook_rays if name == "r" else GEOMETRY.bishop_rays if name == "b" else GEOMETRY.rays
+        for ray in rays[row][col]:
+            for target_row, target_col in ray:
+                target = board[target_row][target_col]
+                if target == Player.EMPTY:
+                    yield target_row, target_col
+                    continue
+                if not target.is_player(player):
+                    yield target_row, target_col
+                break
+
+    def king_move_is_safe(self, start, end, player):
+        '''
+        true if player's king on start is not attacked after moving to end
+        '''
+        board = self.board
+        king = board[start[0]][start[1]]
+        taken = board[end[0]][end[1]]
+        board[start[0]][start[1]] = Player.EMPTY
+        board[end[0]][end[1]] = king
+        try:
+            return not self.is_attacked(end, player)
+        finally:
+            board[start[0]][start[1]] = king
+            board[end[0]][end[1]] = taken
+
+    def perft(self, depth):
+        '''
+        counts the leaf nodes of the legal move tree depth plies below this position, checks and times move generation
+        '''
+        if depth == 0:
+            return 1
+        moves = self.get_all_legal_moves(Player.PLAYER_1 if self.whose_turn() else Player.PLAYER_2)
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.move_piece(move[0], move[1], True)
+            nodes += self.perft(depth - 1)
+            self.undo_move()
+        return nodes
+
+    def perft_divide(self, depth):
+        '''
+        returns {move: perft(depth - 1) after the move}, for finding the move where two move generators disagree
+        '''
+        counts = {}
+        for move in self.get_all_legal_moves(Player.PLAYER_1 if self.whose_turn() else Player.PLAYER_2):
+            self.move_piece(move[0], move[1], True)
+            counts[move] = self.perft(depth - 1)
+            self.undo_move()
+        return counts
 
     def get_all_legal_moves(self, player):
         # _all_valid_moves = [[], []]
@@ -408,33 +719,96 @@ class game_state:
         #                 _all_valid_moves[0].append((row, col))
         #                 _all_valid_moves[1].append(valid_moves)
         _all_valid_moves = []
-        for row in range(0, DIMENSION_ROW):
-            for col in range(0, DIMENSION_COL):
-                if self.is_valid_piece(row, col) and self.get_piece(row, col).is_player(player):
-                    valid_moves = self.get_valid_moves((row, col))
-                    for move in valid_moves:
-                        _all_valid_moves.append(((row, col), move))
+        context = self.legality_context(player)
+        for row, col, _ in self.player_pieces(player):
+            valid_moves = self.get_valid_moves((row, col), context)
+            for move in valid_moves:
+                _all_valid_moves.append(((row, col), move))
         return _all_valid_moves
 
+    def staged_legal_moves(self, player, hash_move=None, capture_key=None, quiet_key=None, quiets=True):
+        '''
+        yields the legal moves of player in stages: hash_move if it is legal here, the captures and promotions sorted
+        by capture_key, then the quiet moves sorted by quiet_key (left out if quiets is False)
+        the moves after the hash move are only generated once it has been searched, the pieces give their captures
+        and quiet moves together so those two stages are generated at once
+        '''
+        if hash_move is not None:
+            start, end = hash_move
+            if self.is_valid_piece(start[0], start[1]) and self.get_piece(start[0], start[1]).is_player(player) and \
+                    end in self.get_valid_moves(start):
+                yield hash_move
+            else:
+                hash_move = None
+
+        captures = []
+        quiet_moves = []
+        for move in self.get_all_legal_moves(player):
+            start, end = move
+            if self.is_valid_piece(end[0], end[1]) or \
+                    (self.get_piece(start[0], start[1]).get_name() == "p" and end[0] in (0, DIMENSION_ROW - 1)):
+                captures.append(move)
+            else:
+                quiet_moves.append(move)
+        if capture_key is not None:
+            captures.sort(key=capture_key)
+        for move in captures:
+            if move != hash_move:
+                yield move
+        if not quiets:
+            return
+        if quiet_key is not None:
+            quiet_moves.sort(key=quiet_key)
+        for move in quiet_moves:
+            if move != hash_move:
+                yield move
+
+    # the search plays moves in the form staged_legal_moves yields them, (start, end) tuples on this board
+    # pack_action turns a ((row, col), (row, col)) action into that form and unpack_action turns it back
+    def pack_action(self, action):
+        return action
+
+    def unpack_action(self, move):
+        return move
+
+    def is_capture(self, move):
+        return self.is_valid_piece(move[1][0], move[1][1])
+
+    def make_move(self, move):
+        '''
+        plays a move from staged_legal_moves, taken back with undo_move
+        the 2D board has no unchecked way to move, so this is move_piece with the ai promoting to a queen
+        '''
+        self.move_piece(move[0], move[1], True)
+
     def king_can_castle_left(self, player):
-        if DIMENSION_COL != 8:
-            return False
-        if player is Player.PLAYER_2:
-            return self.black_king_can_castle[0] and self.black_king_can_castle[1] and \
-                   self.get_piece(0, 1) is Player.EMPTY and self.get_piece(0, 2) is Player.EMPTY and not self._is_check
-        else:
-            return self.white_king_can_castle[0] and self.white_king_can_castle[1] and \
-                   self.get_piece(DIMENSION_ROW - 1, 1) is Player.EMPTY and self.get_piece(DIMENSION_ROW - 1, 2) is Player.EMPTY and not self._is_check
+        return self.king_can_castle(player, 1, 0, (1, 2), 2)
 
     def king_can_castle_right(self, player):
+        return self.king_can_castle(player, 2, 7, (4, 5, 6), 4)
+
+    def king_can_castle(self, player, side, rook_col, empty_cols, passing_col):
+        '''
+        side is the index of the rook's flag in the castling flags, the king starts on column 3 and moves two squares
+        the rook has to be on its square, the squares between king and rook empty and the square the king passes
+        not attacked, the same rule as bitboard_game_state.castling_squares
+        '''
         if DIMENSION_COL != 8:
             return False
         if player is Player.PLAYER_2:
-            return self.black_king_can_castle[0] and self.black_king_can_castle[2] and \
-                   self.get_piece(0, 6) is Player.EMPTY and self.get_piece(0, 5) is Player.EMPTY and not self._is_check
+            rights, row = self.black_king_can_castle, 0
         else:
-            return self.white_king_can_castle[0] and self.white_king_can_castle[2] and \
-                   self.get_piece(DIMENSION_ROW - 1, 6) is Player.EMPTY and self.get_piece(DIMENSION_ROW - 1, 5) is Player.EMPTY and not self._is_check
+            rights, row = self.white_king_can_castle, DIMENSION_ROW - 1
+        if not rights[0] or not rights[side]:
+            return False
+        rook = self.get_piece(row, rook_col)
+        if rook is Player.EMPTY or not rook.is_player(player) or rook.get_name() != "r":
+            return False
+        for col in empty_cols:
+            if self.get_piece(row, col) is not Player.EMPTY:
+                return False
+        # the king cannot castle out of check either, _is_check is only up to date after get_valid_moves
+        return not self.check_for_check((row, 3), player)[0] and not self.check_for_check((row, passing_col), player)[0]
 
     def promote_pawn(self, starting_square, moved_piece, ending_square):
         while True:
@@ -451,6 +825,11 @@ class game_state:
                 moved_piece.change_col_number(ending_square[1])
                 move.pawn_promotion_move(new_piece)
                 self.move_log.append(move)
+                # move_piece hashes the pawn onto the ending square, swap it for the new piece
+                self._hash ^= ZOBRIST.piece_key(moved_piece, ending_square[0], ending_square[1]) ^ \
+                    ZOBRIST.piece_key(new_piece, ending_square[0], ending_square[1])
+                self.add_value(moved_piece, ending_square[0], ending_square[1], -1)
+                self.add_value(new_piece, ending_square[0], ending_square[1], 1)
                 break
             else:
                 print("Please choose from these four: r, n, b, q.\n")
@@ -465,6 +844,11 @@ class game_state:
         moved_piece.change_col_number(ending_square[1])
         move.pawn_promotion_move(new_piece)
         self.move_log.append(move)
+        # move_piece hashes the pawn onto the ending square, swap it for the queen
+        self._hash ^= ZOBRIST.piece_key(moved_piece, ending_square[0], ending_square[1]) ^ \
+            ZOBRIST.piece_key(new_piece, ending_square[0], ending_square[1])
+        self.add_value(moved_piece, ending_square[0], ending_square[1], -1)
+        self.add_value(new_piece, ending_square[0], ending_square[1], 1)
 
     # have to fix en passant for ai
     def can_en_passant(self, current_square_row, current_square_col):
@@ -499,6 +883,7 @@ class game_state:
             temp = True
 
             if ending_square in valid_moves:
+                castling_hash_before = self.castling_hash()
                 moved_to_piece = self.get_piece(next_square_row, next_square_col)
                 if moving_piece.get_name() is "k":
                     if moving_piece.is_player(Player.PLAYER_2):
@@ -536,30 +921,31 @@ class game_state:
                             self.black_king_can_castle[0] = False
                         self._black_king_location = (next_square_row, next_square_col)
                     else:
+                        row = DIMENSION_ROW - 1
                         if moved_to_piece == Player.EMPTY and next_square_col == 1 and self.king_can_castle_left(
                                 moving_piece.get_player()):
                             move = chess_move(starting_square, ending_square, self, self._is_check)
-                            move.castling_move((7, 0), (7, 2), self)
+                            move.castling_move((row, 0), (row, 2), self)
                             self.move_log.append(move)
 
-                            self.get_piece(7, 0).change_col_number(2)
+                            self.get_piece(row, 0).change_col_number(2)
                             # move rook
-                            self.board[7][2] = self.board[7][0]
-                            self.board[7][0] = Player.EMPTY
+                            self.board[row][2] = self.board[row][0]
+                            self.board[row][0] = Player.EMPTY
 
                             self.white_king_can_castle[0] = False
                             self.white_king_can_castle[1] = False
                         elif moved_to_piece == Player.EMPTY and next_square_col == 5 and self.king_can_castle_right(
                                 moving_piece.get_player()):
                             move = chess_move(starting_square, ending_square, self, self._is_check)
-                            move.castling_move((7, 7), (7, 4), self)
+                            move.castling_move((row, 7), (row, 4), self)
                             self.move_log.append(move)
 
-                            self.get_piece(0, 7).change_col_number(4)
+                            self.get_piece(row, 7).change_col_number(4)
 
                             # move rook
-                            self.board[7][4] = self.board[7][7]
-                            self.board[7][7] = Player.EMPTY
+                            self.board[row][4] = self.board[row][7]
+                            self.board[row][7] = Player.EMPTY
 
                             self.white_king_can_castle[0] = False
                             self.white_king_can_castle[2] = False
@@ -570,15 +956,17 @@ class game_state:
                         self._white_king_location = (next_square_row, next_square_col)
                         # self.can_en_passant_bool = False  WHAT IS THIS
                 elif moving_piece.get_name() is "r":
+                    # record the move before the castling flags change so undo_move can restore them
+                    move = chess_move(starting_square, ending_square, self, self._is_check)
                     if moving_piece.is_player(Player.PLAYER_2) and current_square_col == 0:
                         self.black_king_can_castle[1] = False
                     elif moving_piece.is_player(Player.PLAYER_2) and current_square_col == 7:
                         self.black_king_can_castle[2] = False
                     elif moving_piece.is_player(Player.PLAYER_1) and current_square_col == 0:
-                        self.black_king_can_castle[1] = False
+                        self.white_king_can_castle[1] = False
                     elif moving_piece.is_player(Player.PLAYER_1) and current_square_col == 7:
-                        self.black_king_can_castle[2] = False
-                    self.move_log.append(chess_move(starting_square, ending_square, self, self._is_check))
+                        self.white_king_can_castle[2] = False
+                    self.move_log.append(move)
                     self.can_en_passant_bool = False
                 # Add move class here
                 elif moving_piece.get_name() is "p":
@@ -630,6 +1018,17 @@ class game_state:
                     self.move_log.append(chess_move(starting_square, ending_square, self, self._is_check))
                     self.can_en_passant_bool = False
 
+                # a captured rook cannot castle any more
+                if moved_to_piece != Player.EMPTY and moved_to_piece.get_name() == "r" and DIMENSION_COL == 8:
+                    if moved_to_piece.is_player(Player.PLAYER_2):
+                        captured_rights = self.black_king_can_castle
+                    else:
+                        captured_rights = self.white_king_can_castle
+                    if next_square_col == 0:
+                        captured_rights[1] = False
+                    elif next_square_col == 7:
+                        captured_rights[2] = False
+
                 if temp:
                     moving_piece.change_row_number(next_square_row)
                     moving_piece.change_col_number(next_square_col)
@@ -637,6 +1036,9 @@ class game_state:
                     self.board[current_square_row][current_square_col] = Player.EMPTY
 
                 self.white_turn = not self.white_turn
+                self.update_hash(self.move_log[-1], castling_hash_before)
+                self.update_evaluation(self.move_log[-1])
+                self.update_piece_squares(self.move_log[-1])
 
             else:
                 pass
@@ -658,20 +1060,6 @@ class game_state:
                 self.board[undoing_move.rook_ending_square[0]][undoing_move.rook_ending_square[1]] = Player.EMPTY
                 undoing_move.moving_rook.change_row_number(undoing_move.rook_starting_square[0])
                 undoing_move.moving_rook.change_col_number(undoing_move.rook_starting_square[1])
-                if undoing_move.moving_piece is Player.PLAYER_2:
-                    if undoing_move.rook_starting_square[1] == 0:
-                        self.black_king_can_castle[0] = True
-                        self.black_king_can_castle[1] = True
-                    elif undoing_move.rook_starting_square[1] == 7:
-                        self.black_king_can_castle[0] = True
-                        self.black_king_can_castle[2] = True
-                else:
-                    if undoing_move.rook_starting_square[1] == 0:
-                        self.white_king_can_castle[0] = True
-                        self.white_king_can_castle[1] = True
-                    elif undoing_move.rook_starting_square[1] == 7:
-                        self.white_king_can_castle[0] = True
-                        self.white_king_can_castle[2] = True
             elif undoing_move.pawn_promoted is True:
                 self.board[undoing_move.starting_square_row][
                     undoing_move.starting_square_col] = undoing_move.moving_piece
@@ -714,6 +1102,12 @@ class game_state:
                         undoing_move.ending_square_col)
 
             self.white_turn = not self.white_turn
+            # castling rights and the hash go back to what they were before the move
+            self.white_king_can_castle = list(undoing_move.white_king_can_castle)
+            self.black_king_can_castle = list(undoing_move.black_king_can_castle)
+            self._hash = undoing_move.previous_hash
+            self.restore_evaluation(undoing_move.previous_evaluation)
+            self.update_piece_squares(undoing_move, undo=True)
             # if undoing_move.in_check:
             #     self._is_check = True
             if undoing_move.moving_piece.get_name() is 'k' and undoing_move.moving_piece.get_player() is Player.PLAYER_2:
@@ -729,6 +1123,23 @@ class game_state:
     def whose_turn(self):
         return self.white_turn
 
+    def make_null_move(self):
+        '''
+        passes the turn without moving, only for the search (null move pruning), undone by undo_null_move
+        '''
+        self.white_turn = not self.white_turn
+        self._hash ^= ZOBRIST.black_to_move
+
+    def undo_null_move(self):
+        self.make_null_move()
+
+    def in_check(self, player):
+        if player == Player.PLAYER_2:
+            king_location = self._black_king_location
+        else:
+            king_location = self._white_king_location
+        return len(self.check_for_check(king_location, player)[0]) > 0
+
     '''
     check for immediate check
     - check 8 directions and 8 knight squares
@@ -740,8 +1151,38 @@ class game_state:
      - if there are no valid moves to prevent check, checkmate
     '''
 
+    def is_attacked(self, square, player):
+        '''
+        true if a piece of player's opponent attacks square, check_for_check without the pins that stops at the
+        first attacker
+        '''
+        board = self.board
+        square_row, square_col = square
+        for direction, ray in enumerate(GEOMETRY.rays[square_row][square_col]):
+            sliders = ("r", "q") if direction < 4 else ("b", "q")
+            for distance, (row, col) in enumerate(ray):
+                evaluating_square = board[row][col]
+                if evaluating_square == Player.EMPTY:
+                    continue
+                if evaluating_square.is_player(player):
+                    if evaluating_square.get_name() == "k":
+                        continue
+                    break
+                name = evaluating_square.get_name()
+                if name in sliders:
+                    return True
+                if distance == 0 and (name == "k" or (name == "p" and square in
+                                                      GEOMETRY.pawn_attacks[evaluating_square.get_player()][row][col])):
+                    return True
+                break
+        for row, col in GEOMETRY.knight[square_row][square_col]:
+            evaluating_square = board[row][col]
+            if evaluating_square != Player.EMPTY and not evaluating_square.is_player(player) and \
+                    evaluating_square.get_name() == "n":
+                return True
+        return False
+
     def check_for_check(self, king_location, player):
-        # self._is_check = False
         _checks = []
         _pins = []
         _pins_check = []
@@ -749,283 +1190,42 @@ class game_state:
         king_location_row = king_location[0]
         king_location_col = king_location[1]
 
-        _up = 1
-        _down = 1
-        _left = 1
-        _right = 1
-
-        # Left of the king
-        _possible_pin = ()
-        while king_location_col - _left >= 0 and self.get_piece(king_location_row,
-                                                                king_location_col - _left) is not None:
-            if self.is_valid_piece(king_location_row, king_location_col - _left) and \
-                    self.get_piece(king_location_row, king_location_col - _left).is_player(player) and \
-                    self.get_piece(king_location_row, king_location_col - _left).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row, king_location_col - _left)
-                else:
-                    break
-            elif self.is_valid_piece(king_location_row, king_location_col - _left) and \
-                    not self.get_piece(king_location_row, king_location_col - _left).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row,
-                                                                                king_location_col - _left).get_valid_piece_takes(
-                            self):
-                        _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row, king_location_col - _left))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row,
-                                                                                king_location_col - _left).get_valid_piece_takes(
-                            self):
-                        # self._is_check = True
-                        _checks.append((king_location_row, king_location_col - _left))
-                break
-            _left += 1
-
-        # right of the king
-        _possible_pin = ()
-        while king_location_col + _right < 8 and self.get_piece(king_location_row,
-                                                                king_location_col + _right) is not None:
-            if self.is_valid_piece(king_location_row, king_location_col + _right) and \
-                    self.get_piece(king_location_row, king_location_col + _right).is_player(player) and \
-                    self.get_piece(king_location_row, king_location_col + _right).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row, king_location_col + _right)
-                else:
-                    break
-            elif self.is_valid_piece(king_location_row, king_location_col + _right) and \
-                    not self.get_piece(king_location_row, king_location_col + _right).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row,
-                                                                                king_location_col + _right).get_valid_piece_takes(
-                            self):
-                        _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row, king_location_col + _right))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row,
-                                                                                king_location_col + _right).get_valid_piece_takes(
-                            self):
-                        # self._is_check = True
-                        _checks.append((king_location_row, king_location_col + _right))
-                break
-            _right += 1
-
-        # below the king
-        _possible_pin = ()
-        while king_location_row + _down < 8 and self.get_piece(king_location_row + _down,
-                                                               king_location_col) is not None:
-            if self.is_valid_piece(king_location_row + _down, king_location_col) and \
-                    self.get_piece(king_location_row + _down, king_location_col).is_player(player) and \
-                    self.get_piece(king_location_row + _down, king_location_col).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row + _down, king_location_col)
-                else:
-                    break
-            elif self.is_valid_piece(king_location_row + _down, king_location_col) and \
-                    not self.get_piece(king_location_row + _down, king_location_col).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row + _down,
-                                                                                king_location_col).get_valid_piece_takes(
-                            self):
-                        _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row + _down, king_location_col))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row + _down,
-                                                                                king_location_col).get_valid_piece_takes(
-                        self):
-                        # self._is_check = True
-                        _checks.append((king_location_row + _down, king_location_col))
-                break
-            _down += 1
-
-        # above the king
-        _possible_pin = ()
-        while king_location_row - _up >= 0 and self.get_piece(king_location_row - _up, king_location_col) is not None:
-            if self.is_valid_piece(king_location_row - _up, king_location_col) and \
-                    self.get_piece(king_location_row - _up, king_location_col).is_player(player) and \
-                    self.get_piece(king_location_row - _up, king_location_col).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row - _up, king_location_col)
-                else:
-                    break
-            elif self.is_valid_piece(king_location_row - _up, king_location_col) and \
-                    not self.get_piece(king_location_row - _up, king_location_col).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row - _up,
-                                                                                king_location_col).get_valid_piece_takes(
-                            self):
-                        _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row - _up, king_location_col))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row - _up,
-                                                                                king_location_col).get_valid_piece_takes(
-                            self):
-                        # self._is_check = True
-                        _checks.append((king_location_row - _up, king_location_col))
-                break
-            _up += 1
-
-        # left up
-        _up = 1
-        _left = 1
-        _possible_pin = ()
-        while king_location_col - _left >= 0 and king_location_row - _up >= 0 and \
-                self.get_piece(king_location_row - _up, king_location_col - _left) is not None:
-            if self.is_valid_piece(king_location_row - _up, king_location_col - _left) and \
-                    self.get_piece(king_location_row - _up, king_location_col - _left).is_player(player) and \
-                    self.get_piece(king_location_row - _up, king_location_col - _left).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row - _up, king_location_col - _left)
-                else:
-                    break
-            elif self.is_valid_piece(king_location_row - _up, king_location_col - _left) and \
-                    not self.get_piece(king_location_row - _up, king_location_col - _left).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row - _up,
-                                                                                king_location_col - _left).get_valid_piece_takes(
-                            self):
-                        _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row - _up, king_location_col - _left))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row - _up,
-                                                                                king_location_col - _left).get_valid_piece_takes(
-                        self):
-                        # self._is_check = True
-                        _checks.append((king_location_row - _up, king_location_col - _left))
-                break
-            _left += 1
-            _up += 1
-
-        # right up
-        _up = 1
-        _right = 1
-        _possible_pin = ()
-        while king_location_col + _right < 8 and king_location_row - _up >= 0 and \
-                self.get_piece(king_location_row - _up, king_location_col + _right) is not None:
-            if self.is_valid_piece(king_location_row - _up, king_location_col + _right) and \
-                    self.get_piece(king_location_row - _up, king_location_col + _right).is_player(player) and \
-                    self.get_piece(king_location_row - _up, king_location_col + _right).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row - _up, king_location_col + _right)
-                else:
+        # walk out from the king: left, right, down, up, left up, right up, left down, right down
+        for direction, ray in enumerate(GEOMETRY.rays[king_location_row][king_location_col]):
+            # pieces that attack the king along this line when nothing stands in between
+            sliders = ("r", "q") if direction < 4 else ("b", "q")
+            _possible_pin = ()
+            for distance, (row, col) in enumerate(ray):
+                evaluating_square = self.board[row][col]
+                if evaluating_square == Player.EMPTY:
+                    continue
+                if evaluating_square.is_player(player):
+                    if evaluating_square.get_name() == "k":
+                        continue
+                    if not _possible_pin:
+                        _possible_pin = (row, col)
+                        continue
                     break
-            elif self.is_valid_piece(king_location_row - _up, king_location_col + _right) and \
-                    not self.get_piece(king_location_row - _up, king_location_col + _right).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row - _up,
-                                                                                king_location_col + _right).get_valid_piece_takes(
-                            self):
+                name = evaluating_square.get_name()
+                if name in sliders:
+                    if _possible_pin:
                         _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row - _up, king_location_col + _right))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row - _up,
-                                                                                king_location_col + _right).get_valid_piece_takes(
-                        self):
-                        # self._is_check = True
-                        _checks.append((king_location_row - _up, king_location_col + _right))
-                break
-            _right += 1
-            _up += 1
-
-        # left down
-        _down = 1
-        _left = 1
-        _possible_pin = ()
-        while king_location_col - _left >= 0 and king_location_row + _down < 8 and \
-                self.get_piece(king_location_row + _down, king_location_col - _left) is not None:
-            if self.is_valid_piece(king_location_row + _down, king_location_col - _left) and \
-                    self.get_piece(king_location_row + _down, king_location_col - _left).is_player(player) and \
-                    self.get_piece(king_location_row + _down, king_location_col - _left).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row + _down, king_location_col - _left)
-                else:
-                    break
-            elif self.is_valid_piece(king_location_row + _down, king_location_col - _left) and \
-                    not self.get_piece(king_location_row + _down, king_location_col - _left).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row + _down,
-                                                                                king_location_col - _left).get_valid_piece_takes(
-                            self):
-                        _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row + _down, king_location_col - _left))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row + _down,
-                                                                                king_location_col - _left).get_valid_piece_takes(
-                        self):
-                        # self._is_check = True
-                        _checks.append((king_location_row + _down, king_location_col - _left))
-                break
-            _left += 1
-            _down += 1
-
-        # right down
-        _down = 1
-        _right = 1
-        _possible_pin = ()
-        while king_location_col + _right < 8 and king_location_row + _down < 8 and \
-                self.get_piece(king_location_row + _down, king_location_col + _right) is not None:
-            if self.is_valid_piece(king_location_row + _down, king_location_col + _right) and \
-                    self.get_piece(king_location_row + _down, king_location_col + _right).is_player(player) and \
-                    self.get_piece(king_location_row + _down, king_location_col + _right).get_name() is not "k":
-                if not _possible_pin:
-                    _possible_pin = (king_location_row + _down, king_location_col + _right)
-                else:
-                    break
-            elif self.is_valid_piece(king_location_row + _down, king_location_col + _right) and \
-                    not self.get_piece(king_location_row + _down, king_location_col + _right).is_player(player):
-                if _possible_pin:
-                    temp = self.board[_possible_pin[0]][_possible_pin[1]]
-                    self.board[_possible_pin[0]][_possible_pin[1]] = Player.EMPTY
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row + _down,
-                                                                                king_location_col + _right).get_valid_piece_takes(
-                            self):
-                        _pins.append(_possible_pin)
-                        _pins_check.append((king_location_row + _down, king_location_col + _right))
-                    self.board[_possible_pin[0]][_possible_pin[1]] = temp
-                else:
-                    if (king_location_row, king_location_col) in self.get_piece(king_location_row + _down,
-                                                                                king_location_col + _right).get_valid_piece_takes(
-                        self):
-                        # self._is_check = True
-                        _checks.append((king_location_row + _down, king_location_col + _right))
+                        _pins_check.append((row, col))
+                    else:
+                        _checks.append((row, col))
+                # kings and pawns only reach the squares next to them
+                elif distance == 0 and not _possible_pin and \
+                        (name == "k" or (name == "p" and (king_location_row, king_location_col) in
+                                         GEOMETRY.pawn_attacks[evaluating_square.get_player()][row][col])):
+                    _checks.append((row, col))
                 break
-            _right += 1
-            _down += 1
 
         # knights
-        row_change = [-2, -2, -1, -1, +1, +1, +2, +2]
-        col_change = [-1, +1, -2, +2, -2, +2, +1, -1]
-        for i in range(0, 8):
-            if self.is_valid_piece(king_location_row + row_change[i], king_location_col + col_change[i]) and \
-                    not self.get_piece(king_location_row + row_change[i], king_location_col + col_change[i]).is_player(
-                        player):
-                if (king_location_row, king_location_col) in self.get_piece(king_location_row + row_change[i],
-                                                                            king_location_col + col_change[
-                                                                                i]).get_valid_piece_takes(self):
-                    # self._is_check = True
-                    _checks.append((king_location_row + row_change[i], king_location_col + col_change[i]))
-        # print([_checks, _pins, _pins_check])
+        for row, col in GEOMETRY.knight[king_location_row][king_location_col]:
+            evaluating_square = self.board[row][col]
+            if evaluating_square != Player.EMPTY and not evaluating_square.is_player(player) and \
+                    evaluating_square.get_name() == "n":
+                _checks.append((row, col))
         return [_checks, _pins, _pins_check]
 
 
@@ -1035,6 +1235,10 @@ class chess_move():
         self.starting_square_col = starting_square[1]
         self.moving_piece = game_state.get_piece(self.starting_square_row, self.starting_square_col)
         self.in_check = in_check
+        self.previous_hash = game_state.hash()
+        self.previous_evaluation = game_state.evaluation_totals()
+        self.white_king_can_castle = tuple(game_state.white_king_can_castle)
+        self.black_king_can_castle = tuple(game_state.black_king_can_castle)
 
         self.ending_square_row = ending_square[0]
         self.ending_square_col = ending_square[1]
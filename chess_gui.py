@@ -155,16 +155,16 @@ def main():
                         running = False
                     if e.type == py.MOUSEBUTTONDOWN and not game_over:
                         if next_player == "w":
-                            ai_move = ai.get_move(game_state, Player.PLAYER_1)
+                            ai_move = ai.get_move(game_state, Player.PLAYER_1, ai_constants.TIME_LIMIT)
                             game_state.move_piece(ai_move[0], ai_move[1], True)
                             next_player = "b"
                         elif next_player == "b":
-                            ai_move = ai2.get_move(game_state, Player.PLAYER_2)
+                            ai_move = ai2.get_move(game_state, Player.PLAYER_2, ai_constants.TIME_LIMIT)
                             game_state.move_piece(ai_move[0], ai_move[1], True)
                             next_player = "w"
 
                 draw_game_state(screen, game_state, valid_moves, square_selected)
-                endgame = game_state.checkmate_stalemate_checker()
+                endgame = game_state.terminal_status()
                 if endgame == 0:
                     game_over = True
                     draw_text(screen, "Black wins.")
@@ -199,11 +199,11 @@ def main():
                     if not game_over:
                         #print("turn", turns, "player", next_player)
                         if next_player == "w":
-                            ai_move = ai.get_move(game_state, Player.PLAYER_1)
+                            ai_move = ai.get_move(game_state, Player.PLAYER_1, ai_constants.TIME_LIMIT)
                             game_state.move_piece(ai_move[0], ai_move[1], True)
                             next_player = "b"
                         elif next_player == "b":
-                            ai_move = ai2.get_move(game_state, Player.PLAYER_2)
+                            ai_move = ai2.get_move(game_state, Player.PLAYER_2, ai_constants.TIME_LIMIT)
                             game_state.move_piece(ai_move[0], ai_move[1], True)
                             next_player = "w"
                         turns = turns + 1
@@ -211,7 +211,7 @@ def main():
                     draw_game_state(screen, game_state, valid_moves, square_selected)
 
                     # calculating endgame
-                    endgame = game_state.checkmate_stalemate_checker()
+                    endgame = game_state.terminal_status()
                     if endgame == 0:
                         # white lost
                         game_over = True
@@ -251,7 +251,7 @@ def main():
     
     # run a game with human players
     if number_of_players == 1 and human_player is 'b':
-        ai_move = ai_move = ai.get_move(game_state, Player.PLAYER_1)
+        ai_move = ai_move = ai.get_move(game_state, Player.PLAYER_1, ai_constants.TIME_LIMIT)
         game_state.move_piece(ai_move[0], ai_move[1], True)
     while running:
         for e in py.event.get():
@@ -282,10 +282,10 @@ def main():
                             valid_moves = []
 
                             if 'w' in cpu_player:
-                                ai_move = ai_move = ai_move = ai.get_move(game_state, Player.PLAYER_1)
+                                ai_move = ai_move = ai_move = ai.get_move(game_state, Player.PLAYER_1, ai_constants.TIME_LIMIT)
                                 game_state.move_piece(ai_move[0], ai_move[1], True)
                             elif 'b' in cpu_player:
-                                ai_move = ai_move = ai_move = ai.get_move(game_state, Player.PLAYER_2)
+                                ai_move = ai_move = ai_move = ai.get_move(game_state, Player.PLAYER_2, ai_constants.TIME_LIMIT)
                                 game_state.move_piece(ai_move[0], ai_move[1], True)
                     else:
                         valid_moves = game_state.get_valid_moves((row, col))
@@ -306,7 +306,7 @@ def main():
 
         draw_game_state(screen, game_state, valid_moves, square_selected)
 
-        endgame = game_state.checkmate_stalemate_checker()
+        endgame = game_state.terminal_status()
         if endgame == 0:
             game_over = True
             draw_text(screen, "Black wins.")
@@ -1,8 +1,14 @@
+import ast
 import json
 import math
 import random
+import time
 from os.path import exists
-from chess_engine import game_state
+from chess_engine import game_state, EVALUATION, ZOBRIST
+from bitboard_engine import bitboard_game_state
+from transposition_table import transposition_table, position_key, EXACT, LOWER_BOUND, UPPER_BOUND
+import piece_square_tables
+from move_ordering import killer_history_orderer, staged_captures, capture_score, PIECE_VALUES
 
 from enums import Player
 import constants
@@ -24,11 +30,15 @@ def next_color(color):
         return "black"
 
 class heuristic():
+    # evaluate_board counts material as material_scale times PIECE_VALUES on top of smaller positional terms,
+    # None when it scores something else; quiescence search only delta prunes captures when it is known
+    material_scale = None
+
     def evaluate_board(self, game_state, max_color):
         raise Exception("evaluate_board not implemented")
 
 class agent():
-    def get_move(self, game_state, color):
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
         raise Exception("evaluate_board not implemented")
     def update(self, reward=0.0, file=None):
         pass
@@ -37,175 +47,115 @@ class agent():
     def restart(self):
         pass
 
-class piece_squares_tables():
-    def __init__(self):
-        self.pawn_table_8 = [
-        0,  0,  0,  0,  0,  0,  0,  0,
-        50, 50, 50, 50, 50, 50, 50, 50,
-        10, 10, 20, 30, 30, 20, 10, 10,
-        5,  5, 10, 25, 25, 10,  5,  5,
-        0,  0,  0, 20, 20,  0,  0,  0,
-        5, -5,-10,  0,  0,-10, -5,  5,
-        5, 10, 10,-20,-20, 10, 10,  5,
-        0,  0,  0,  0,  0,  0,  0,  0]
-
-        self.pawn_table_6x4 = [
-        [50, 50, 50, 50],
-        [30, 30, 25, 25],
-        [10, 10, 10, 10],
-        [5,  10, 10,  5],
-        [5,   5,  5,  5],
-        [0,   0,  0,  0]]
-    
-        self.knight_table_8 = [
-        -50,-40,-30,-30,-30,-30,-40,-50,
-        -40,-20,  0,  0,  0,  0,-20,-40,
-        -30,  0, 10, 15, 15, 10,  0,-30,
-        -30,  5, 15, 20, 20, 15,  5,-30,
-        -30,  0, 15, 20, 20, 15,  0,-30,
-        -30,  5, 10, 15, 15, 10,  5,-30,
-        -40,-20,  0,  5,  5,  0,-20,-40,
-        -50,-40,-30,-30,-30,-30,-40,-50]
-
-        self.knight_table_6x4 = [
-        [0, 0, 0, 0],
-        [0, 5, 5, 0],
-        [0, 15, 15, 0],
-        [0, 15, 15, 0],
-        [0, 5,  5, 0],
-        [-5,-5,-5,-5]]
-
-        self.bishop_table_8 = [
-        -20,-10,-10,-10,-10,-10,-10,-20,
-        -10,  0,  0,  0,  0,  0,  0,-10,
-        -10,  0,  5, 10, 10,  5,  0,-10,
-        -10,  5,  5, 10, 10,  5,  5,-10,
-        -10,  0, 10, 10, 10, 10,  0,-10,
-        -10, 10, 10, 10, 10, 10, 10,-10,
-        -10,  5,  0,  0,  0,  0,  5,-10,
-        -20,-10,-10,-10,-10,-10,-10,-20]
-    
-        self.bishop_table_6x4 = [
-        [5, 10, 10, 5],
-        [5, 10, 10, 5],
-        [10, 10, 10, 10],
-        [10, 10, 10, 10],
-        [5, 10, 10, 5],
-        [5, 10, 10, 5]]
-
-        self.rook_table_8 = [
-        0,  0,  0,  0,  0,  0,  0,  0,
-        5, 10, 10, 10, 10, 10, 10,  5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        0,  0,  0,  5,  5,  0,  0,  0]
-
-        self.rook_table_6x4 = [
-        [0,  0,  0,  0],
-        [5, 10, 10,  5],
-        [5,  0, 0, 5],
-        [5,  0, 0, 5],
-        [5,  0, 0, 5],
-        [0,  5,  5,  0]]
-
-        self.queen_table_8 = [
-        -20,-10,-10, -5, -5,-10,-10,-20,
-        -10,  0,  0,  0,  0,  0,  0,-10,
-        -10,  0,  5,  5,  5,  5,  0,-10,
-        -5,  0,  5,  5,  5,  5,  0, -5,
-        0,  0,  5,  5,  5,  5,  0, -5,
-        -10,  5,  5,  5,  5,  5,  0,-10,
-        -10,  0,  5,  0,  0,  0,  0,-10,
-        -20,-10,-10, -5, -5,-10,-10,-20]
-
-        self.queen_table_6x4 = [
-        [-20, -10, -10, -20],
-        [-10,  0,  0, -10],
-        [-10,  5,  5, -10],
-        [-10,  5,  5, -10],
-        [-10,  5,  5, -10],
-        [-20,-10, -10,-20]]
-
-        self.king_table_start_8 = [
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -20,-30,-30,-40,-40,-30,-30,-20,
-        -10,-20,-20,-20,-20,-20,-20,-10,
-        20, 20,  0,  0,  0,  0, 20, 20,
-        20, 30, 10,  0,  0, 10, 30, 20]
-
-
-        self.king_table_start_6x4 = [
-        [-30,-40,-40,-30],
-        [-30,-40,-40,-30],
-        [-30,-40,-40,-30],
-        [-10,-20,-20,-10],
-        [20, 10, 10, 20],
-        [20, 30, 30, 20]]
-
-        self.king_table_end_8 = [
-        -50,-40,-30,-20,-20,-30,-40,-50,
-        -30,-20,-10,  0,  0,-10,-20,-30,
-        -30,-10, 20, 30, 30, 20,-10,-30,
-        -30,-10, 30, 40, 40, 30,-10,-30,
-        -30,-10, 30, 40, 40, 30,-10,-30,
-        -30,-10, 20, 30, 30, 20,-10,-30,
-        -30,-30,  0,  0,  0,  0,-30,-30,
-        -50,-30,-30,-30,-30,-30,-30,-50]
-
-        self.king_table_end_6x4 = [
-        [-50,-30,-30,-50],
-        [-30,-10,-10,-30],
-        [-30,10,10,-30],
-        [-30,10,10,-30],
-        [-30,0,0,-30],
-        [-50,-30,-30,-50]]
-
-
+class search_timeout(Exception):
+    pass
+
+class search_budget():
+    '''
+    time (seconds) and node limits of one get_move call, None means unlimited
+    '''
+    def __init__(self, time_limit=None, node_limit=None):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.start = time.perf_counter()
+        self.nodes = 0
+        # nothing is cut off until the first iteration has finished, so there is always a move to play
+        self.armed = False
+
+    def is_limited(self):
+        return self.time_limit is not None or self.node_limit is not None
+
+    def exhausted(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+        return self.time_limit is not None and time.perf_counter() - self.start >= self.time_limit
+
+    def count_node(self):
+        self.nodes += 1
+        if self.armed and self.exhausted():
+            raise search_timeout()
+
+class iterative_deepening_agent(agent):
+    '''
+    get_move searches depth 1, 2, ... and plays the best move of the last depth that finished
+    without a budget it stops at self.depth, with a time_limit or node_limit it keeps deepening until the budget runs
+    out; subclasses implement search_root(game_state, color, depth, actions) -> (value, action, {action: value})
+    '''
+    max_depth = 64
+
+    def __init__(self, depth=3):
+        self.depth = depth
+        self.budget = search_budget()
+        self.completed_depth = 0
 
-    
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
+        self.budget = search_budget(time_limit, node_limit)
+        self.completed_depth = 0
+        actions = game_state.get_all_legal_moves(color)
+        if not actions:
+            return None
+        best_action = actions[0]
+        last_depth = self.max_depth if self.budget.is_limited() else self.depth
+        for depth in range(1, last_depth + 1):
+            try:
+                value, action, scores = self.search_root(game_state, color, depth, actions)
+            except search_timeout:
+                break
+            self.budget.armed = True
+            self.completed_depth = depth
+            if action is not None:
+                best_action = action
+            # the best line of this iteration is searched first in the next one
+            actions = sorted(actions, key=lambda a: scores.get(a, -math.inf), reverse=True)
+            if abs(value) >= 5000000 or self.budget.exhausted():
+                break
+        return best_action
 
-        
+class piece_squares_tables():
+    def __init__(self):
+        self.pawn_table_8 = piece_square_tables.PAWN_TABLE_8
+        self.pawn_table_6x4 = piece_square_tables.PAWN_TABLE_6X4
+        self.knight_table_8 = piece_square_tables.KNIGHT_TABLE_8
+        self.knight_table_6x4 = piece_square_tables.KNIGHT_TABLE_6X4
+        self.bishop_table_8 = piece_square_tables.BISHOP_TABLE_8
+        self.bishop_table_6x4 = piece_square_tables.BISHOP_TABLE_6X4
+        self.rook_table_8 = piece_square_tables.ROOK_TABLE_8
+        self.rook_table_6x4 = piece_square_tables.ROOK_TABLE_6X4
+        self.queen_table_8 = piece_square_tables.QUEEN_TABLE_8
+        self.queen_table_6x4 = piece_square_tables.QUEEN_TABLE_6X4
+        self.king_table_start_8 = piece_square_tables.KING_TABLE_START_8
+        self.king_table_start_6x4 = piece_square_tables.KING_TABLE_START_6X4
+        self.king_table_end_8 = piece_square_tables.KING_TABLE_END_8
+        self.king_table_end_6x4 = piece_square_tables.KING_TABLE_END_6X4
 
+    def get_piece_square_value(self, piece, max_color):
+        '''
+        the compiled table of the piece for the board in use, negative for the pieces of the other color
+        '''
+        value = EVALUATION.square_value(piece, piece.get_row_number(), piece.get_col_number())
+        return value if piece.get_player() == max_color else -value
 
 class moves_heuristic(heuristic):
     def evaluate_board(self, game_state, max_color):
-        evaluation_score = 0
-        for row in range(0, DIMENSION_ROW):
-            for col in range(0, DIMENSION_COL):
-                # print(row, col)
-                if game_state.is_valid_piece(row, col):
-                    evaluated_piece = game_state.get_piece(row, col)
-                    if evaluated_piece.get_player() == max_color:
-                        piece_moves = evaluated_piece.get_valid_piece_moves(game_state)
-                        evaluation_score += len(piece_moves)
-        return evaluation_score
+        return game_state.count_legal_moves(max_color)
 
 class capture_heuristic(heuristic):
     def evaluate_board(self, game_state, max_color):
         evaluation_score = 0
-        for row in range(0, DIMENSION_ROW):
-            for col in range(0, DIMENSION_COL):
-                # print(row, col)
-                if game_state.is_valid_piece(row, col):
-                    evaluated_piece = game_state.get_piece(row, col)
-                    piece_takes = evaluated_piece.get_valid_piece_takes(game_state)
+        for player in (Player.PLAYER_1, Player.PLAYER_2):
+            for _, _, evaluated_piece in game_state.player_pieces(player):
+                piece_takes = evaluated_piece.get_valid_piece_takes(game_state)
 
-                    for end in piece_takes:
-                        # add to eval score if we can threaten a capture, and subtract if opponent is threatening a capture
-                        target_piece = game_state.get_piece(end[0], end[1])
+                for end in piece_takes:
+                    # add to eval score if we can threaten a capture, and subtract if opponent is threatening a capture
+                    target_piece = game_state.get_piece(end[0], end[1])
 
-                        target_piece_value = self.get_capture_value(target_piece, max_color) 
+                    target_piece_value = self.get_capture_value(target_piece, max_color) 
 
-                        evaluation_score += target_piece_value
+                    evaluation_score += target_piece_value
 
-                    # piece evaluation as per normal, weighted by 2
-                    evaluation_score += self.get_piece_value(evaluated_piece, max_color) * 2
+                # piece evaluation as per normal, weighted by 2
+                evaluation_score += self.get_piece_value(evaluated_piece, max_color) * 2
 
         # print("evaluated board", evaluation_score)
         return evaluation_score
@@ -271,26 +221,21 @@ class capture_heuristic(heuristic):
 class spacial_heuristic(heuristic):
     def evaluate_board(self, game_state, max_color):
         evaluation_score = 0
-        for col in range(0, DIMENSION_COL):
-            white_best_val = 0
-            black_best_val = 0
-            for row in range(0, DIMENSION_ROW):
-                # print(row, col)
-                if game_state.is_valid_piece(row, col):
-                    piece_color = game_state.get_piece(row, col).get_player()
-                    evaluated_piece = game_state.get_piece(row, col)
-                    evaluation_score += self.get_piece_value(evaluated_piece, max_color)
-
-                    if (row + 1) * 10 > black_best_val and piece_color == "black":
-                        black_best_val = (row + 1) * 10
-                    if (DIMENSION_ROW - row) * 10 > white_best_val and piece_color == "white":
-                        white_best_val = (DIMENSION_ROW - row) * 10                    
-            
-            if max_color == "white":
-                evaluation_score += white_best_val - black_best_val
-            else:
-                evaluation_score += black_best_val - white_best_val
-            
+        # the most advanced piece of each color in every column
+        white_best_vals = [0] * DIMENSION_COL
+        black_best_vals = [0] * DIMENSION_COL
+        for row, col, evaluated_piece in game_state.player_pieces(Player.PLAYER_1):
+            evaluation_score += self.get_piece_value(evaluated_piece, max_color)
+            white_best_vals[col] = max(white_best_vals[col], (DIMENSION_ROW - row) * 10)
+        for row, col, evaluated_piece in game_state.player_pieces(Player.PLAYER_2):
+            evaluation_score += self.get_piece_value(evaluated_piece, max_color)
+            black_best_vals[col] = max(black_best_vals[col], (row + 1) * 10)
+
+        if max_color == "white":
+            evaluation_score += sum(white_best_vals) - sum(black_best_vals)
+        else:
+            evaluation_score += sum(black_best_vals) - sum(white_best_vals)
+
         # print("evaluated board", evaluation_score)
         return evaluation_score
 
@@ -328,59 +273,24 @@ class spacial_piece_squares_table_heuristic(heuristic, piece_squares_tables):
 
     def evaluate_board(self, game_state, max_color):
         evaluation_score = 0
-        for col in range(0, DIMENSION_COL):
-            white_best_val = 0
-            black_best_val = 0
-            for row in range(0, DIMENSION_ROW):
-                # print(row, col)
-                if game_state.is_valid_piece(row, col):
-                    evaluated_piece = game_state.get_piece(row, col)
-                    evaluation_score += self.get_piece_square_value(evaluated_piece, max_color) * 0.2 + self.get_piece_value(evaluated_piece, max_color)
-                    piece_color = game_state.get_piece(row, col).get_player()
-                    if (row + 1) * 10 > black_best_val and piece_color == "black":
-                        black_best_val = (row + 1) * 10
-                    if (DIMENSION_ROW - row) * 10 > white_best_val and piece_color == "white":
-                        white_best_val = (DIMENSION_ROW - row) * 10 
-            if max_color == "white":
-                evaluation_score += white_best_val - black_best_val
-            else:
-                evaluation_score += black_best_val - white_best_val 
-                    
+        # the most advanced piece of each color in every column
+        white_best_vals = [0] * DIMENSION_COL
+        black_best_vals = [0] * DIMENSION_COL
+        for row, col, evaluated_piece in game_state.player_pieces(Player.PLAYER_1):
+            evaluation_score += self.get_piece_square_value(evaluated_piece, max_color) * 0.2 + self.get_piece_value(evaluated_piece, max_color)
+            white_best_vals[col] = max(white_best_vals[col], (DIMENSION_ROW - row) * 10)
+        for row, col, evaluated_piece in game_state.player_pieces(Player.PLAYER_2):
+            evaluation_score += self.get_piece_square_value(evaluated_piece, max_color) * 0.2 + self.get_piece_value(evaluated_piece, max_color)
+            black_best_vals[col] = max(black_best_vals[col], (row + 1) * 10)
+
+        if max_color == "white":
+            evaluation_score += sum(white_best_vals) - sum(black_best_vals)
+        else:
+            evaluation_score += sum(black_best_vals) - sum(white_best_vals)
+
         # print("evaluated board", evaluation_score)
         return evaluation_score
 
-    def get_piece_square_value(self, piece, max_color):
-        if piece.get_player() == max_color:
-            # print("row " +  str(piece.get_row_number()))
-            # print("col " +  str(piece.get_col_number()))
-            if piece.get_name() is "k":
-                return self.king_table_end_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "q":
-                return self.queen_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "r":
-                return self.rook_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "b":
-                return self.bishop_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "n":
-                return self.knight_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "p":
-                return self.pawn_table_6x4[piece.get_row_number()][piece.get_col_number()]
-        else:
-            # print("row " +  str(DIMENSION_ROW - piece.get_row_number()))
-            # print("col " +  str(piece.get_col_number()))
-            if piece.get_name() is "k":
-                return -self.king_table_end_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "q":
-                return -self.queen_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "r":
-                return -self.rook_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "b":
-                return -self.bishop_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "n":
-                return -self.knight_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "p":
-                return -self.pawn_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-
     def get_piece_value(self, piece, max_color):
         # print("found piece", piece.get_name(), piece.get_player())
         if piece.get_player() == max_color:
@@ -411,49 +321,16 @@ class spacial_piece_squares_table_heuristic(heuristic, piece_squares_tables):
                 return -10
 
 class piece_squares_table_heuristic(heuristic, piece_squares_tables):
+    material_scale = 1
 
     def evaluate_board(self, game_state, max_color):
-        evaluation_score = 0
-        for row in range(0, DIMENSION_ROW):
-            for col in range(0, DIMENSION_COL):
-                # print(row, col)
-                if game_state.is_valid_piece(row, col):
-                    evaluated_piece = game_state.get_piece(row, col)
-                    evaluation_score += self.get_piece_square_value(evaluated_piece, max_color) * 0.2 + self.get_piece_value(evaluated_piece, max_color)
-        # print("evaluated board", evaluation_score)
-        return evaluation_score
-
-    def get_piece_square_value(self, piece, max_color):
-        if piece.get_player() == max_color:
-            # print("row " +  str(piece.get_row_number()))
-            # print("col " +  str(piece.get_col_number()))
-            if piece.get_name() is "k":
-                return self.king_table_end_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "q":
-                return self.queen_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "r":
-                return self.rook_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "b":
-                return self.bishop_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "n":
-                return self.knight_table_6x4[piece.get_row_number()][piece.get_col_number()]
-            elif piece.get_name() is "p":
-                return self.pawn_table_6x4[piece.get_row_number()][piece.get_col_number()]
-        else:
-            # print("row " +  str(DIMENSION_ROW - piece.get_row_number()))
-            # print("col " +  str(piece.get_col_number()))
-            if piece.get_name() is "k":
-                return -self.king_table_end_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "q":
-                return -self.queen_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "r":
-                return -self.rook_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "b":
-                return -self.bishop_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "n":
-                return -self.knight_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
-            elif piece.get_name() is "p":
-                return -self.pawn_table_6x4[DIMENSION_ROW - piece.get_row_number() - 1][piece.get_col_number()]
+        '''
+        reads the material and piece-square totals game_state keeps up to date instead of walking the board
+        each color's tables are read from its own side of the board
+        '''
+        min_color = Player.PLAYER_2 if max_color == Player.PLAYER_1 else Player.PLAYER_1
+        return (game_state.positional(max_color) - game_state.positional(min_color)) * 0.2 + \
+            game_state.material(max_color) - game_state.material(min_color)
 
     def get_piece_value(self, piece, max_color):
         # print("found piece", piece.get_name(), piece.get_player())
@@ -488,18 +365,13 @@ class piece_squares_table_heuristic(heuristic, piece_squares_tables):
 class suicide_heuristic(heuristic):
     def evaluate_board(self, game_state, max_color):
         evaluation_score = 0
-        for row in range(0, DIMENSION_ROW):
-            for col in range(0, DIMENSION_COL):
-                # print(row, col)
-                if game_state.is_valid_piece(row, col):
-                    piece_color = game_state.get_piece(row, col).get_player()
-                    if piece_color == max_color:
-                        if max_color == "white":
-                            evaluation_score += (DIMENSION_ROW-row)-25
-                        else:
-                            evaluation_score += row-25
-                    else:
-                        evaluation_score += 4
+        for row, _, _ in game_state.player_pieces(max_color):
+            if max_color == "white":
+                evaluation_score += (DIMENSION_ROW-row)-25
+            else:
+                evaluation_score += row-25
+        for _ in game_state.player_pieces(next_color(max_color)):
+            evaluation_score += 4
         # print("evaluated board", evaluation_score)
         return evaluation_score
 
@@ -535,16 +407,11 @@ class suicide_heuristic(heuristic):
 
 
 class piece_value_heuristic(heuristic):
+    material_scale = 1
+
     def evaluate_board(self, game_state, max_color):
-        evaluation_score = 0
-        for row in range(0, DIMENSION_ROW):
-            for col in range(0, DIMENSION_COL):
-                # print(row, col)
-                if game_state.is_valid_piece(row, col):
-                    evaluated_piece = game_state.get_piece(row, col)
-                    evaluation_score += self.get_piece_value(evaluated_piece, max_color)
-        # print("evaluated board", evaluation_score)
-        return evaluation_score
+        min_color = Player.PLAYER_2 if max_color == Player.PLAYER_1 else Player.PLAYER_1
+        return game_state.material(max_color) - game_state.material(min_color)
 
     def get_piece_value(self, piece, max_color):
         # print("found piece", piece.get_name(), piece.get_player())
@@ -576,232 +443,421 @@ class piece_value_heuristic(heuristic):
                 return -10 
 
 class random_agent(agent):
-    def get_move(self, game_state, color):
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
         actions = game_state.get_all_legal_moves(color)
         return random.choice(actions)
 
-class minimax_alpha_beta_agent(agent):
-    def __init__(self, depth=3, alpha=-100000, beta=100000, heuristic=piece_value_heuristic()):
-        self.depth = depth
+class negamax_agent(iterative_deepening_agent):
+    '''
+    fail-soft negamax alpha beta shared by the minimax agents
+    subclasses only supply the heuristic and terminal_value, scores below the root are from the side to move
+    with quiescence=True the leaves are not evaluated until the captures on the board have been played out
+    null_move=True lets the side to move pass, if the reduced search still fails high the node is cut off;
+    late_move_reductions=True searches the quiet moves late in the ordered list a ply shallower first
+    pvs=True searches every move after the first with a zero window and only searches it again if it beats alpha;
+    aspiration=True starts every iteration with a window around the score of the previous one
+    after get_move, pv holds the principal variation of the last completed iteration, the chosen move first
+    '''
+    # captures deeper than this below the leaves are not searched
+    quiescence_depth = 8
+    # a capture that cannot bring the score back up to alpha even with this much on top is skipped, in PIECE_VALUES
+    # units like the gain of the capture, both are multiplied by the material_scale of the heuristic
+    delta_margin = 20
+    # the search after a null move is this many plies shallower on top of the ply that was passed
+    null_move_reduction = 2
+    # moves from this index on in the ordered list are reduced, at depth late_move_depth or more
+    late_move_index = 3
+    late_move_depth = 3
+    # half the width of the first aspiration window, it doubles on every fail low or fail high
+    aspiration_window = 25
+
+    def __init__(self, depth=3, alpha=-10000000, beta=10000000, heuristic=piece_value_heuristic(), bitboard=False,
+                 tt_size_mb=16, orderer=None, quiescence=False, null_move=False, late_move_reductions=False,
+                 pvs=False, aspiration=False):
+        super().__init__(depth)
+        self.quiescence = quiescence
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.quiescence_nodes = 0
+        self.root_value = None
+        self.pv = []
         self.alpha = alpha
         self.beta = beta
         self.heuristic = heuristic
-        self.prev_game_states = []
-    
+        self.bitboard = bitboard
+        # the table is kept between moves of the same game, tt_size_mb=0 turns it off
+        self.tt = transposition_table(tt_size_mb) if tt_size_mb else None
+        # counted by terminal_value whenever it scores a position from the moves played so far instead of the board,
+        # nodes below which that happened are not stored, their score is only right for the current move
+        self.repetitions = 0
+        # orderer=move_ordering.move_orderer() searches the moves in board order
+        self.orderer = orderer if orderer is not None else killer_history_orderer()
+
     def restart(self):
-        self.prev_game_states = []
+        if self.tt is not None:
+            self.tt.clear()
+        self.orderer.clear()
 
-    def get_move(self, game_state, color):
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
         '''
         gets the best move according to the chess engine we implemented
 
         returns ((start row, start col)), (end row, end col))
         '''
-        val, action = self.val_ab(game_state, color, color, self.depth, self.alpha, self.beta)
-        # print("this turn is:", color)
-        # print("best val", val)
-        # print("white evaluation", self.heuristic.evaluate_board(game_state, "white"))
-        # print("black evaluation", self.heuristic.evaluate_board(game_state, "black"))
-        self.prev_game_states.append(game_state.get_board_str())
+        if self.bitboard:
+            # search on a bitboard copy of the position, the moves are the same tuples
+            game_state = bitboard_game_state.from_game_state(game_state)
+        if self.tt is not None:
+            self.tt.new_search()
+        self.orderer.new_search()
+        self.quiescence_nodes = 0
+        self.root_value = None
+        action = self.search(game_state, color, time_limit, node_limit)
+        self.pv = self.principal_variation(game_state, color, action)
         return action
-        
-    
-    def val_ab(self, game_state, color, max_color, depth, alpha, beta):
-        csc = game_state.checkmate_stalemate_checker()
+
+    def search(self, game_state, color, time_limit=None, node_limit=None):
+        return self.deepen(game_state, color, time_limit, node_limit)
+
+    def deepen(self, game_state, color, time_limit=None, node_limit=None):
+        '''
+        the iterative deepening of one move, lazy_smp_agent runs it in several processes at once
+        '''
+        return iterative_deepening_agent.get_move(self, game_state, color, time_limit, node_limit)
+
+    def terminal_value(self, game_state, color, max_color):
+        '''
+        returns the score of a finished game from max_color's point of view, None while the game goes on
+        '''
+        csc = game_state.terminal_status()
         if csc == 0: # white lost
-            if max_color == "white":
-                return -5000000, None
-            elif max_color == "black":
-                return 5000000, None
+            return -5000000 if max_color == "white" else 5000000
         elif csc == 1: # black lost
-            if max_color == "white":
-                return 5000000, None
-            elif max_color == "black":
-                return -5000000, None
+            return 5000000 if max_color == "white" else -5000000
         elif csc == 2: # tie
-            return 100, None
-
-        if game_state.get_board_str() in self.prev_game_states:
-            return -100000, random.choice(game_state.get_all_legal_moves(color))
-
-        if depth == 0:
-            return self.heuristic.evaluate_board(game_state, max_color), None
+            return 100
+        return None
 
-        if color == max_color:
-            return self.max_val(game_state, color, max_color, depth, alpha, beta)
+    def search_root(self, game_state, color, depth, actions):
+        if not self.aspiration or self.root_value is None or abs(self.root_value) >= 5000000:
+            result = self.search_window(game_state, color, depth, actions, self.alpha, self.beta)
         else:
-            return self.min_val(game_state, color, max_color, depth, alpha, beta)
-
-    # max val returns (value, action)
-    def max_val(self, game_state, color, max_color, depth, alpha, beta):
+            delta = self.aspiration_window
+            alpha = max(self.alpha, self.root_value - delta)
+            beta = min(self.beta, self.root_value + delta)
+            while True:
+                result = self.search_window(game_state, color, depth, actions, alpha, beta)
+                value = result[0]
+                if value <= alpha and alpha > self.alpha:
+                    alpha = max(self.alpha, value - delta)
+                elif value >= beta and beta < self.beta:
+                    beta = min(self.beta, value + delta)
+                else:
+                    break
+                delta *= 2
+        self.root_value = result[0]
+        return result
+
+    def search_window(self, game_state, color, depth, actions, alpha, beta):
         value = -math.inf
-        actions = game_state.get_all_legal_moves(color)
         action = None
-        alp = alpha
-        bet = beta
-        for a in actions:
-            game_state.move_piece(a[0], a[1], True)
-            v = self.val_ab(game_state, next_color(color), max_color, depth - 1, alpha, beta)[0]
-            game_state.undo_move()
+        scores = {}
+        original_alpha = alpha
+        repetitions = self.repetitions
+        for i, a in enumerate(actions):
+            game_state.make_move(game_state.pack_action(a))
+            try:
+                if self.pvs and i > 0:
+                    v = -self.negamax(game_state, next_color(color), color, depth - 1, -alpha - 1, -alpha, 1)[0]
+                    if alpha < v < beta:
+                        v = -self.negamax(game_state, next_color(color), color, depth - 1, -beta, -alpha, 1)[0]
+                else:
+                    v = -self.negamax(game_state, next_color(color), color, depth - 1, -beta, -alpha, 1)[0]
+            finally:
+                game_state.undo_move()
+            scores[a] = v
 
             if v > value:
                 value = v
                 action = a
+            alpha = max(alpha, value)
 
-            if value > bet:
-                return value, action
+            if value >= beta:
+                break
 
-            alp = max(alp, value)
+        if self.tt is not None and self.repetitions == repetitions:
+            self.tt.store(position_key(game_state, color), depth, self.bound(value, original_alpha, beta), value,
+                          None if action is None else game_state.pack_action(action))
+        return value, action, scores
 
-        return value, action
-    
-    def min_val(self, game_state, color, max_color, depth, alpha, beta):
-        value = math.inf
-        actions = game_state.get_all_legal_moves(color)
+    def principal_variation(self, game_state, color, action):
+        '''
+        follows the best moves stored in the transposition table from the position after action
+        '''
+        if action is None:
+            return []
+        pv = [action]
+        seen = {game_state.hash()}
+        game_state.move_piece(action[0], action[1], True)
+        try:
+            while self.tt is not None and len(pv) < max(self.completed_depth, 1) and game_state.hash() not in seen:
+                seen.add(game_state.hash())
+                entry = self.tt.probe(position_key(game_state, color))
+                turn = Player.PLAYER_1 if game_state.whose_turn() else Player.PLAYER_2
+                if entry is None or entry[4] is None or \
+                        game_state.unpack_action(entry[4]) not in game_state.get_all_legal_moves(turn):
+                    break
+                pv.append(game_state.unpack_action(entry[4]))
+                game_state.make_move(entry[4])
+        finally:
+            for _ in pv:
+                game_state.undo_move()
+        return pv
+
+    def bound(self, value, alpha, beta):
+        if value <= alpha:
+            return UPPER_BOUND
+        elif value >= beta:
+            return LOWER_BOUND
+        return EXACT
+
+    # negamax returns (value, action), value from the point of view of color
+    def negamax(self, game_state, color, max_color, depth, alpha, beta, ply, allow_null=True):
+        self.budget.count_node()
+        sign = 1 if color == max_color else -1
+        value = self.terminal_value(game_state, color, max_color)
+        if value is not None:
+            return sign * value, None
+
+        key = position_key(game_state, max_color)
+        hash_move = None
+        if self.tt is not None:
+            entry = self.tt.probe(key)
+            # entry = (key, depth, bound, score, move, generation)
+            if entry is not None:
+                if entry[1] >= depth and (entry[2] == EXACT or (entry[2] == LOWER_BOUND and entry[3] >= beta) or
+                                          (entry[2] == UPPER_BOUND and entry[3] <= alpha)):
+                    return entry[3], entry[4]
+                hash_move = entry[4]
+
+        if depth == 0:
+            if self.quiescence:
+                return self.quiesce(game_state, color, max_color, alpha, beta, 0), None
+            return sign * self.heuristic.evaluate_board(game_state, max_color), None
+
+        in_check = None
+        if self.null_move or self.late_move_reductions:
+            in_check = game_state.in_check(color)
+
+        # a side that is not in check and still fails high after passing would fail high with a real move too,
+        # except in zugzwang, which is why kings and pawns alone never pass
+        if (self.null_move and allow_null and not in_check and depth > self.null_move_reduction and
+                self.has_pieces(game_state, color)):
+            game_state.make_null_move()
+            try:
+                v = -self.negamax(game_state, next_color(color), max_color, depth - 1 - self.null_move_reduction,
+                                  -beta, -beta + 1, ply + 1, False)[0]
+            finally:
+                game_state.undo_null_move()
+            if v >= beta:
+                # a mate found after passing is not a mate with a real move
+                return (beta if v >= 5000000 else v), None
+
+        original_alpha = alpha
+        repetitions = self.repetitions
+        value = -math.inf
         action = None
-        alp = alpha
-        bet = beta
-        for a in actions:
-            game_state.move_piece(a[0], a[1], True)
-            v = self.val_ab(game_state, next_color(color), max_color, depth - 1, alpha, beta)[0]
-            game_state.undo_move()
+        actions = self.orderer.staged_moves(game_state, color, ply, hash_move)
+        for i, a in enumerate(actions):
+            reduce = (self.late_move_reductions and not in_check and i >= self.late_move_index and
+                      depth >= self.late_move_depth and capture_score(game_state, a) is None)
+            game_state.make_move(a)
+            try:
+                full = True
+                if reduce:
+                    # only a reduced move that beats alpha is searched again at the full depth
+                    v = -self.negamax(game_state, next_color(color), max_color, depth - 2, -alpha - 1, -alpha,
+                                      ply + 1)[0]
+                    full = v > alpha
+                if full and self.pvs and i > 0:
+                    # the first move is expected to be best, the others only have to be shown to be worse
+                    v = -self.negamax(game_state, next_color(color), max_color, depth - 1, -alpha - 1, -alpha,
+                                      ply + 1)[0]
+                    full = alpha < v < beta
+                if full:
+                    v = -self.negamax(game_state, next_color(color), max_color, depth - 1, -beta, -alpha, ply + 1)[0]
+            finally:
+                game_state.undo_move()
 
-            if v < value:
+            if v > value:
                 value = v
                 action = a
+            alpha = max(alpha, value)
 
-            if value < alp:
-                return value, action
-
-            bet = min(bet, value)
+            if alpha >= beta:
+                self.orderer.record_cutoff(game_state, a, ply, depth, i)
+                break
 
+        if self.tt is not None and self.repetitions == repetitions:
+            self.tt.store(key, depth, self.bound(value, original_alpha, beta), value, action)
         return value, action
 
-class suicide_minimax_alpha_beta_agent(agent):
-    def __init__(self, depth=3, alpha=-100000, beta=100000, heuristic=piece_value_heuristic()):
-        self.depth = depth
-        self.alpha = alpha
-        self.beta = beta
-        self.heuristic = heuristic
-
-    def get_move(self, game_state, color):
+    def quiesce(self, game_state, color, max_color, alpha, beta, qdepth):
         '''
-        gets the best move according to the chess engine we implemented
+        searches only captures and promotions, the side to move can also stand pat on the static evaluation
+        returns the value from the point of view of color, its nodes are counted in quiescence_nodes as well
+        '''
+        self.budget.count_node()
+        self.quiescence_nodes += 1
+        sign = 1 if color == max_color else -1
+        value = self.terminal_value(game_state, color, max_color)
+        if value is not None:
+            return sign * value
+
+        stand_pat = sign * self.heuristic.evaluate_board(game_state, max_color)
+        if stand_pat >= beta or qdepth >= self.quiescence_depth:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        value = stand_pat
+        scale = self.heuristic.material_scale
+        for a in staged_captures(game_state, color):
+            # promotions are never pruned, they gain more than the captured piece
+            if scale is not None and game_state.is_capture(a) and not self.is_promotion(game_state, a):
+                end = game_state.unpack_action(a)[1]
+                gain = PIECE_VALUES[game_state.get_piece(end[0], end[1]).get_name()]
+                if stand_pat + (gain + self.delta_margin) * scale < alpha:
+                    continue
+            game_state.make_move(a)
+            try:
+                v = -self.quiesce(game_state, next_color(color), max_color, -beta, -alpha, qdepth + 1)
+            finally:
+                game_state.undo_move()
+            if v > value:
+                value = v
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        return value
 
-        returns ((start row, start col)), (end row, end col))
+    def has_pieces(self, game_state, color):
+        '''
+        true if color has a piece other than its king and pawns
         '''
-        val, action = self.val_ab(game_state, color, color, self.depth, self.alpha, self.beta)
+        for _, _, piece in game_state.player_pieces(color):
+            if piece.get_name() not in ("k", "p"):
+                return True
+        return False
+
+    def is_promotion(self, game_state, move):
+        start, end = game_state.unpack_action(move)
+        return game_state.get_piece(start[0], start[1]).get_name() == "p" and end[0] in (0, DIMENSION_ROW - 1)
+
+class minimax_alpha_beta_agent(negamax_agent):
+    def __init__(self, depth=3, alpha=-10000000, beta=10000000, heuristic=piece_value_heuristic(), bitboard=False,
+                 tt_size_mb=16, orderer=None, tablebase=None, quiescence=False, null_move=False,
+                 late_move_reductions=False, pvs=False, aspiration=False):
+        super().__init__(depth, alpha, beta, heuristic, bitboard, tt_size_mb, orderer, quiescence, null_move,
+                         late_move_reductions, pvs, aspiration)
+        self.prev_game_states = set()
+        # a tablebase.tablebase, positions it knows are scored from it instead of searched
+        self.tablebase = tablebase
+    
+    def restart(self):
+        super().restart()
+        self.prev_game_states = set()
+
+    def search(self, game_state, color, time_limit=None, node_limit=None):
+        if game_state.hash() in self.prev_game_states and game_state.get_all_legal_moves(color):
+            action = random.choice(game_state.get_all_legal_moves(color))
+        else:
+            action = super().search(game_state, color, time_limit, node_limit)
         # print("this turn is:", color)
         # print("best val", val)
         # print("white evaluation", self.heuristic.evaluate_board(game_state, "white"))
         # print("black evaluation", self.heuristic.evaluate_board(game_state, "black"))
+        self.prev_game_states.add(game_state.hash())
         return action
-    
-    def val_ab(self, game_state, color, max_color, depth, alpha, beta):
-        csc = game_state.checkmate_stalemate_checker()
+
+    def terminal_value(self, game_state, color, max_color):
+        value = super().terminal_value(game_state, color, max_color)
+        if value is None and game_state.hash() in self.prev_game_states:
+            self.repetitions += 1
+            return -100000
+        if value is None and self.tablebase is not None:
+            result = self.tablebase.probe(game_state)
+            if result is not None:
+                wdl, dtm = result
+                if wdl == 0:
+                    return 100
+                # a quicker mate scores higher, so the search makes progress towards it
+                value = wdl * (5000000 - dtm)
+                return value if color == max_color else -value
+        return value
+
+class suicide_minimax_alpha_beta_agent(negamax_agent):
+    def __init__(self, depth=3, alpha=-10000000, beta=10000000, heuristic=piece_value_heuristic(), bitboard=False,
+                 tt_size_mb=16, orderer=None):
+        super().__init__(depth, alpha, beta, heuristic, bitboard, tt_size_mb, orderer)
+
+    def terminal_value(self, game_state, color, max_color):
+        # losing all the pieces is the goal, so a lost game is a win
+        csc = game_state.terminal_status()
         if csc == 0: # white lost
-            if max_color == "white":
-                return 5000000, None
-            elif max_color == "black":
-                return -5000000, None
+            return 5000000 if max_color == "white" else -5000000
         elif csc == 1: # black lost
-            if max_color == "white":
-                return -5000000, None
-            elif max_color == "black":
-                return 5000000, None
+            return -5000000 if max_color == "white" else 5000000
         elif csc == 2: # tie
-            return -10000, None
-
-        if depth == 0:
-            return self.heuristic.evaluate_board(game_state, max_color), None
+            return -10000
+        return None
 
-        if color == max_color:
-            return self.max_val(game_state, color, max_color, depth, alpha, beta)
-        else:
-            return self.min_val(game_state, color, max_color, depth, alpha, beta)
-
-    # max val returns (value, action)
-    def max_val(self, game_state, color, max_color, depth, alpha, beta):
-        value = -math.inf
-        actions = game_state.get_all_legal_moves(color)
-        action = None
-        alp = alpha
-        bet = beta
-        for a in actions:
-            game_state.move_piece(a[0], a[1], True)
-            v = self.val_ab(game_state, next_color(color), max_color, depth - 1, alpha, beta)[0]
-            game_state.undo_move()
-
-            if v > value:
-                value = v
-                action = a
-
-            if value > bet:
-                return value, action
-
-            alp = max(alp, value)
-
-        return value, action
-    
-    def min_val(self, game_state, color, max_color, depth, alpha, beta):
-        value = math.inf
-        actions = game_state.get_all_legal_moves(color)
-        action = None
-        alp = alpha
-        bet = beta
-        for a in actions:
-            game_state.move_piece(a[0], a[1], True)
-            v = self.val_ab(game_state, next_color(color), max_color, depth - 1, alpha, beta)[0]
-            game_state.undo_move()
-
-            if v < value:
-                value = v
-                action = a
-
-            if value < alp:
-                return value, action
-
-            bet = min(bet, value)
-
-        return value, action
-
-class expectimax_agent(agent):
+class expectimax_agent(iterative_deepening_agent):
     def __init__(self, depth=3, heuristic=piece_value_heuristic()):
-        self.depth = depth
+        super().__init__(depth)
         self.heuristic = heuristic
-        self.prev_game_states = []
+        self.prev_game_states = set()
     
     def restart(self):
-        self.prev_game_states = []
+        self.prev_game_states = set()
 
-    def get_move(self, game_state, color):
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
         '''
         gets the best move according to the chess engine we implemented
 
         returns ((start row, start col)), (end row, end col))
         '''
-        actions = game_state.get_all_legal_moves(color)
-        action = None
-        value = -math.inf
-
-        for a in actions:
-            game_state.move_piece(a[0], a[1], True)
-            v = self.val(game_state, next_color(color), color, self.depth)
-            game_state.undo_move()
+        action = super().get_move(game_state, color, time_limit, node_limit)
         # print("this turn is:", color)
         # print("best val", val)
         # print("white evaluation", self.heuristic.evaluate_board(game_state, "white"))
         # print("black evaluation", self.heuristic.evaluate_board(game_state, "black"))
+        self.prev_game_states.add(game_state.hash())
+        return action
+
+    def search_root(self, game_state, color, depth, actions):
+        action = None
+        value = -math.inf
+        scores = {}
+
+        for a in actions:
+            game_state.make_move(game_state.pack_action(a))
+            try:
+                # the root move is not counted, depth plies are searched below it
+                v = self.val(game_state, next_color(color), color, depth)
+            finally:
+                game_state.undo_move()
+            scores[a] = v
             if v > value:
                 value = v
                 action = a
-
-        self.prev_game_states.append(game_state.get_board_str())
-        return action
+        return value, action, scores
         
     
     def val(self, game_state, color, max_color, depth):
-        csc = game_state.checkmate_stalemate_checker()
+        self.budget.count_node()
+        csc = game_state.terminal_status()
         if csc == 0: # white lost
             if max_color == "white":
                 return -5000000
@@ -815,41 +871,228 @@ class expectimax_agent(agent):
         elif csc == 2: # tie
             return 100
 
-        if game_state.get_board_str() in self.prev_game_states:
+        if game_state.hash() in self.prev_game_states:
             return -100000#, random.choice(game_state.get_all_legal_moves(color))
 
         if depth == 0:
             return self.heuristic.evaluate_board(game_state, max_color)
 
-        if color == max_color:
-            return self.max_val(game_state, color, max_color, depth)
-        else:
-            return self.min_val(game_state, color, max_color, depth)
+        # both sides are scored as the sum over all their replies, so there is no window to prune with
+        total = 0
+        for a in game_state.staged_legal_moves(color):
+            game_state.make_move(a)
+            try:
+                total += self.val(game_state, next_color(color), max_color, depth - 1)
+            finally:
+                game_state.undo_move()
+        return total
+
+class mcts_node():
+    '''
+    one position of the mcts tree, wins are counted for mover, the side that played move to get here
+    move is in the form game_state.staged_legal_moves yields, a packed int on a bitboard
+    untried is None until the node is first selected, then it holds the moves that have no child yet
+    '''
+    __slots__ = ("parent", "move", "mover", "key", "children", "untried", "visits", "wins")
+
+    def __init__(self, parent, move, mover, key):
+        self.parent = parent
+        self.move = move
+        self.mover = mover
+        self.key = key
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+class mcts_agent(agent):
+    '''
+    monte carlo tree search with uct selection and capture biased random playouts
+    the tree holds at most max_nodes nodes, once it is full the leaves are played out without being expanded;
+    the subtree of the position after our move and the opponent's reply is kept for the next get_move
+    without a time_limit or node_limit every move runs iterations playouts, node_limit counts playouts too
+    '''
+    # scale of the heuristic when a playout is cut off, a rook up scores about 0.62 for its side
+    evaluation_scale = 100
+
+    def __init__(self, iterations=1000, exploration=1.4, max_nodes=200000, playout_depth=40, capture_bias=0.8,
+                 heuristic=piece_value_heuristic(), bitboard=False):
+        self.iterations = iterations
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.playout_depth = playout_depth
+        self.capture_bias = capture_bias
+        self.heuristic = heuristic
+        self.bitboard = bitboard
+        self.root = None
+        self.nodes = 0
+        self.budget = search_budget()
+        self.last_stats = {}
 
-    # max val returns (value, action)
-    def max_val(self, game_state, color, max_color, depth):
-        values = []
-        actions = game_state.get_all_legal_moves(color)
-        action = None
-        for a in actions:
-            game_state.move_piece(a[0], a[1], True)
-            v = self.val(game_state, next_color(color), max_color, depth - 1)
-            game_state.undo_move()
-            values.append(v)
+    def restart(self):
+        self.root = None
+        self.nodes = 0
 
-        return sum(values)
-    
-    def min_val(self, game_state, color, max_color, depth):
-        values = []
-        actions = game_state.get_all_legal_moves(color)
-        action = None
-        for a in actions:
-            game_state.move_piece(a[0], a[1], True)
-            v = self.val(game_state, next_color(color), max_color, depth - 1)
-            game_state.undo_move()
-            values.append(v)
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
+        '''
+        gets the most visited move after the playouts
 
-        return sum(values)
+        returns ((start row, start col)), (end row, end col))
+        '''
+        if self.bitboard:
+            game_state = bitboard_game_state.from_game_state(game_state)
+        if time_limit is None and node_limit is None:
+            node_limit = self.iterations
+        self.budget = search_budget(time_limit, node_limit)
+        root = self.reuse_root(game_state)
+        reused = root.visits
+        while not self.budget.exhausted():
+            self.iterate(game_state, root)
+            self.budget.nodes += 1
+            if root.untried == [] and not root.children:
+                # no legal move at the root
+                break
+
+        elapsed = time.perf_counter() - self.budget.start
+        self.last_stats = {
+            "playouts": self.budget.nodes,
+            "seconds": elapsed,
+            "playouts_per_second": self.budget.nodes / elapsed if elapsed > 0 else 0.0,
+            "tree_nodes": self.nodes,
+            "reused_visits": reused,
+        }
+        if not root.children:
+            return None
+        return game_state.unpack_action(max(root.children, key=lambda child: child.visits).move)
+
+    def stats(self):
+        '''
+        playouts, seconds, playouts_per_second, tree_nodes and reused_visits of the last get_move
+        '''
+        return dict(self.last_stats)
+
+    def reuse_root(self, game_state):
+        '''
+        returns the node of the current position from the last tree, a new root if it is not in there
+        '''
+        key = game_state.hash()
+        if self.root is not None:
+            # the position is the old root (nothing played), or one or two plies below it
+            level = [self.root]
+            for _ in range(3):
+                for node in level:
+                    if node.key == key:
+                        node.parent = None
+                        self.root = node
+                        self.nodes = self.count_nodes(node)
+                        return node
+                level = [child for node in level for child in node.children]
+        self.root = mcts_node(None, None, None, key)
+        self.nodes = 1
+        return self.root
+
+    def count_nodes(self, root):
+        count = 0
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
+
+    def select_child(self, node):
+        '''
+        uct, the win rate of the child for the side choosing it plus the exploration bonus
+        '''
+        log_visits = math.log(node.visits)
+        best = None
+        best_value = -math.inf
+        for child in node.children:
+            value = child.wins / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best = child
+                best_value = value
+        return best
+
+    def iterate(self, game_state, root):
+        '''
+        one selection, expansion, playout and backpropagation from root
+        '''
+        path = []
+        try:
+            node = self.select_leaf(game_state, root, path)
+            result = self.playout(game_state)
+        finally:
+            for _ in path:
+                game_state.undo_move()
+        self.backpropagate(node, result)
+
+    def select_leaf(self, game_state, root, path):
+        '''
+        walks down from root by uct and expands one child if the tree is not full
+        the moves to the returned node are played on game_state and appended to path, the caller undoes them
+        '''
+        node = root
+        while node.untried == [] and node.children:
+            node = self.select_child(node)
+            game_state.make_move(node.move)
+            path.append(node.move)
+
+        color = Player.PLAYER_1 if game_state.whose_turn() else Player.PLAYER_2
+        if node.untried is None:
+            node.untried = list(game_state.staged_legal_moves(color))
+            random.shuffle(node.untried)
+        if node.untried and self.nodes < self.max_nodes:
+            move = node.untried.pop()
+            game_state.make_move(move)
+            path.append(move)
+            child = mcts_node(node, move, color, game_state.hash())
+            node.children.append(child)
+            self.nodes += 1
+            node = child
+        return node
+
+    def backpropagate(self, node, result):
+        '''
+        result is for white, every node on the way up counts it for its mover
+        '''
+        while node is not None:
+            node.visits += 1
+            node.wins += result if node.mover == Player.PLAYER_1 else 1.0 - result
+            node = node.parent
+
+    def playout(self, game_state):
+        '''
+        plays random moves, captures with probability capture_bias, for at most playout_depth plies
+        returns the result for white: 1 win, 0 loss, 0.5 stalemate, the squashed heuristic if it was cut off
+        '''
+        played = 0
+        try:
+            while played < self.playout_depth:
+                color = Player.PLAYER_1 if game_state.whose_turn() else Player.PLAYER_2
+                moves = list(game_state.staged_legal_moves(color))
+                if not moves:
+                    break
+                captures = [m for m in moves if game_state.is_capture(m)]
+                if captures and random.random() < self.capture_bias:
+                    move = random.choice(captures)
+                else:
+                    move = random.choice(moves)
+                game_state.make_move(move)
+                played += 1
+
+            status = game_state.terminal_status()
+            if status == 0: # white lost
+                return 0.0
+            elif status == 1: # black lost
+                return 1.0
+            elif status == 2: # tie
+                return 0.5
+            value = self.heuristic.evaluate_board(game_state, Player.PLAYER_1)
+            return 1.0 / (1.0 + math.exp(-value / self.evaluation_scale))
+        finally:
+            for _ in range(played):
+                game_state.undo_move()
 
 class q_agent(agent):
     def __init__(self, explore_rate = 0.5, learn_rate = 0.2, discount_factor = 0.5, file="q_agent", heuristic = piece_squares_table_heuristic()):
@@ -866,12 +1109,69 @@ class q_agent(agent):
         self.learn_rate = learn_rate
         self.discount_factor = discount_factor
         self.file = file
-        self.q_values = json.loads(data)
+        self.q_values = self.load_q_values(json.loads(data))
         self.q_updates = []
         self.heuristic = heuristic
     
+    def load_q_values(self, saved):
+        '''
+        q values are keyed by (position hash, move), saved to disk as "hash:move"
+        '''
+        q_values = {}
+        legacy = {}
+        for key, value in saved.items():
+            position_hash, separator, move = key.partition(":")
+            if separator:
+                q_values[(int(position_hash), ast.literal_eval(move))] = value
+            else:
+                legacy[key] = value
+        # files written before the position hash were keyed by get_board_str() + str(move)
+        skipped = 0
+        for key, value in legacy.items():
+            new_key = self.legacy_key(key)
+            if new_key is None:
+                skipped += 1
+            elif new_key not in q_values:
+                q_values[new_key] = value
+        if legacy:
+            print('converted', len(legacy) - skipped, 'q values saved with board string keys, skipped', skipped)
+        return q_values
+
+    def legacy_key(self, key):
+        '''
+        (position hash, move) of a get_board_str() + str(move) key, None if it is not a position of this board size
+        the side to move owns the piece on the start square of the move; the board string has no castling flags,
+        on the 8 column board a flag is taken to be set while its king or rook is still on its starting square
+        '''
+        split = key.find("((")
+        if split < 0:
+            return None
+        squares = key[:split].split(",")[:-1]
+        move = ast.literal_eval(key[split:])
+        if len(squares) != DIMENSION_ROW * DIMENSION_COL:
+            return None
+        players = {"w": Player.PLAYER_1, "b": Player.PLAYER_2}
+        pieces = {}
+        h = 0
+        for square, piece in enumerate(squares):
+            if piece != str(Player.EMPTY):
+                pieces[square] = (players[piece[0]], piece[1])
+                h ^= ZOBRIST.pieces[pieces[square]][square]
+        start = move[0][0] * DIMENSION_COL + move[0][1]
+        if start not in pieces:
+            return None
+        if pieces[start][0] == Player.PLAYER_2:
+            h ^= ZOBRIST.black_to_move
+        if DIMENSION_COL == 8:
+            for player, row, keys in ((Player.PLAYER_1, DIMENSION_ROW - 1, ZOBRIST.white_castle),
+                                      (Player.PLAYER_2, 0, ZOBRIST.black_castle)):
+                for flag, (col, name) in enumerate(((3, "k"), (0, "r"), (7, "r"))):
+                    if pieces.get(row * DIMENSION_COL + col) == (player, name):
+                        h ^= keys[flag]
+        return h, move
+
     def get_q_val(self, game_state, move):
-        return self.q_values.get(game_state.get_board_str() + str(move), 0.0)
+        return self.q_values.get((game_state.hash(), move), 0.0)
     
     def get_best_move_and_val(self, game_state, color):
         moves = game_state.get_all_legal_moves(color)
@@ -884,7 +1184,7 @@ class q_agent(agent):
                 val = v
         return move, val
 
-    def get_move(self, game_state, color):
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
         #print(game_state.get_board_str())
         move = None
         next_val = 0
@@ -906,7 +1206,7 @@ class q_agent(agent):
         
         # save values for q update step
         #print(next_val)
-        #self.q_updates.append((game_state.get_board_str(), move, next_val))
+        #self.q_updates.append((game_state.hash(), move, next_val))
         self.update(game_state, move, next_val, color)
         return move
 
@@ -924,7 +1224,7 @@ class q_agent(agent):
             reward = -self.get_piece_value(piece1)*0.1 + self.get_piece_value(piece2)
         
         game_state.move_piece(move[0], move[1], True)
-        csc = game_state.checkmate_stalemate_checker()
+        csc = game_state.terminal_status()
         game_state.undo_move()
         if csc==0:
             # white lost
@@ -941,9 +1241,9 @@ class q_agent(agent):
 
         # print(reward)
 
-        game_state_str = game_state.get_board_str()
-        v = self.q_values.get(game_state_str + str(move), 0.0)
-        self.q_values[game_state_str + str(move)] = v + self.learn_rate * (reward + self.discount_factor * next_val - v)
+        key = (game_state.hash(), move)
+        v = self.q_values.get(key, 0.0)
+        self.q_values[key] = v + self.learn_rate * (reward + self.discount_factor * next_val - v)
 
     # reward function for evaluating a board based on a heuristic
     def update2(self, game_state, move, next_val, color):
@@ -952,15 +1252,15 @@ class q_agent(agent):
         reward += self.heuristic.evaluate_board(game_state, color)
         game_state.undo_move()
 
-        game_state_str = game_state.get_board_str()
-        v = self.q_values.get(game_state_str + str(move), 0.0)
-        self.q_values[game_state_str + str(move)] = v + self.learn_rate * (reward + self.discount_factor * next_val - v)
+        key = (game_state.hash(), move)
+        v = self.q_values.get(key, 0.0)
+        self.q_values[key] = v + self.learn_rate * (reward + self.discount_factor * next_val - v)
 
     def updateTwo(self, reward=0.0, file=None):
         #print(self.q_updates)
-        for game_state_str, move, best_val in self.q_updates:
-            v = self.q_values.get(game_state_str + str(move), 0.0)
-            self.q_values[game_state_str + str(move)] = v + self.learn_rate * (reward + self.discount_factor * best_val - v)
+        for position_hash, move, best_val in self.q_updates:
+            v = self.q_values.get((position_hash, move), 0.0)
+            self.q_values[(position_hash, move)] = v + self.learn_rate * (reward + self.discount_factor * best_val - v)
 
         self.save_in_file(file)
 
@@ -984,5 +1284,6 @@ class q_agent(agent):
         
         #print("writing file")
         with open(file, 'w') as f:
-            f.write(json.dumps(self.q_values))
+            f.write(json.dumps({str(position_hash) + ":" + str(move): value
+                                for (position_hash, move), value in self.q_values.items()}))
         f.close()
\ No newline at end of file
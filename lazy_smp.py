@@ -0,0 +1,152 @@
+#
+# Lazy SMP, the alpha beta search of minimax_alpha_beta_agent in several processes sharing one transposition table
+# Every worker runs the whole iterative deepening of the move on its own copy of the position. The odd workers search
+# one ply deeper than the even ones, so the workers spread over two depths and fill the shared table for each other.
+# The move of the deepest finished iteration of any worker is played.
+# python lazy_smp.py --workers 1 2 4 8 --depth 5 reports the time to depth on the board size in constants
+#
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import arena
+import constants
+from custom_ai_engines import minimax_alpha_beta_agent, piece_value_heuristic
+from transposition_table import shared_transposition_table
+from bitboard_engine import bitboard_game_state
+from enums import Player
+
+
+def search_worker(searcher, game_state, color, helper, time_limit, node_limit):
+    '''
+    runs in a worker process on an unpickled copy of the agent, whose table is attached to the shared one
+    returns (completed depth, move, nodes)
+    '''
+    searcher.helper = helper
+    searcher.depth_offset = helper % 2
+    searcher.depth = max(1, searcher.depth - searcher.depth_offset)
+    move = searcher.deepen(game_state, color, time_limit, node_limit)
+    depth = searcher.completed_depth + searcher.depth_offset if searcher.completed_depth else 0
+    return depth, move, searcher.budget.nodes
+
+
+class lazy_smp_agent(minimax_alpha_beta_agent):
+    '''
+    minimax_alpha_beta_agent searching with workers processes, workers=1 searches in this process
+    node_limit is split between the workers, a time_limit applies to each of them
+    '''
+    def __init__(self, workers=None, depth=3, alpha=-10000000, beta=10000000, heuristic=piece_value_heuristic(),
+                 bitboard=False, tt_size_mb=16, orderer=None, tablebase=None, quiescence=False, null_move=False,
+                 late_move_reductions=False, pvs=False, aspiration=False):
+        super().__init__(depth, alpha, beta, heuristic, bitboard, tt_size_mb, orderer, tablebase, quiescence,
+                         null_move, late_move_reductions, pvs, aspiration)
+        self.workers = workers or os.cpu_count() or 1
+        # the shared table stores the packed moves of bitboard_game_state, so every search runs on a bitboard copy
+        self.bitboard = True
+        if self.tt is not None:
+            self.tt = shared_transposition_table(tt_size_mb)
+        self.pool = None
+        # index of the worker process a copy of the agent runs in, None in the process that plays the moves
+        self.helper = None
+        self.depth_offset = 0
+        self.last_stats = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["pool"] = None
+        return state
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.tt is not None:
+            self.tt.close()
+
+    def start_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=arena.configure_board,
+                                            initargs=(constants.DIMENSION_ROW, constants.DIMENSION_COL))
+        return self.pool
+
+    def deepen(self, game_state, color, time_limit=None, node_limit=None):
+        if self.helper is not None or self.workers == 1:
+            start = time.perf_counter()
+            move = super().deepen(game_state, color, time_limit, node_limit)
+            if self.helper is None:
+                self.record_stats(self.completed_depth, self.budget.nodes, time.perf_counter() - start)
+            return move
+
+        start = time.perf_counter()
+        # a bitboard copy has no move log or status cache to pickle
+        game_state = bitboard_game_state.from_game_state(game_state)
+        share = None
+        if node_limit is not None:
+            share = max(1, -(-node_limit // self.workers))
+        self.start_pool()
+        futures = [self.pool.submit(search_worker, self, game_state, color, helper, time_limit, share)
+                   for helper in range(self.workers)]
+        results = [future.result() for future in futures]
+        # the deepest result, the lowest worker among equally deep ones
+        depth, move, _ = max(results, key=lambda result: result[0])
+        self.completed_depth = depth
+        self.record_stats(depth, sum(result[2] for result in results), time.perf_counter() - start)
+        return move
+
+    def record_stats(self, depth, nodes, seconds):
+        self.last_stats = {
+            "workers": self.workers,
+            "completed_depth": depth,
+            "nodes": nodes,
+            "seconds": seconds,
+            "nodes_per_second": nodes / seconds if seconds > 0 else 0.0,
+        }
+
+    def stats(self):
+        '''
+        workers, completed_depth, nodes (of all workers), seconds and nodes_per_second of the last get_move
+        '''
+        return dict(self.last_stats)
+
+    def search_root(self, game_state, color, depth, actions):
+        return super().search_root(game_state, color, depth + self.depth_offset, actions)
+
+
+def benchmark(worker_counts, depth, bitboard=True):
+    '''
+    seconds to finish depth from the start position, returns [(workers, seconds, nodes, speedup)]
+    '''
+    from chess_engine import game_state
+    rows = []
+    base = None
+    for workers in worker_counts:
+        searcher = lazy_smp_agent(workers, depth, bitboard=bitboard)
+        try:
+            if workers > 1:
+                # starts the processes before the clock runs
+                searcher.get_move(game_state(), Player.PLAYER_1, node_limit=workers)
+                searcher.restart()
+            searcher.get_move(game_state(), Player.PLAYER_1)
+        finally:
+            searcher.close()
+        stats = searcher.stats()
+        if base is None:
+            base = stats["seconds"]
+        rows.append((workers, stats["seconds"], stats["nodes"], base / stats["seconds"] if stats["seconds"] else 0.0))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="time to depth of the lazy smp search over the worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--depth", type=int, default=5)
+    args = parser.parse_args()
+
+    for workers, seconds, nodes, speedup in benchmark(args.workers, args.depth):
+        print("%3d workers  depth %d in %8.2fs  %10d nodes  speedup %.2fx" % (workers, args.depth, seconds, nodes,
+                                                                               speedup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#
+# Move ordering for the alpha beta agents
+# The earlier the best move is searched, the earlier alpha beta can cut off the rest of the node.
+#
+import constants
+
+DIMENSION_ROW = constants.DIMENSION_ROW
+
+PIECE_VALUES = {"p": 10, "n": 30, "b": 30, "r": 50, "q": 100, "k": 1000}
+
+
+def capture_score(game_state, move):
+    '''
+    returns the mvv-lva score of a capture or promotion, None for quiet moves
+    move is in the form game_state.staged_legal_moves yields
+    '''
+    start, end = game_state.unpack_action(move)
+    attacker = game_state.get_piece(start[0], start[1])
+    score = None
+    if game_state.is_valid_piece(end[0], end[1]):
+        score = PIECE_VALUES[game_state.get_piece(end[0], end[1]).get_name()] * 10 - \
+            PIECE_VALUES[attacker.get_name()]
+    if attacker.get_name() == "p" and end[0] in (0, DIMENSION_ROW - 1):
+        score = (score or 0) + PIECE_VALUES["q"] * 10
+    return score
+
+
+def staged_captures(game_state, color):
+    '''
+    the legal captures and promotions of color, best mvv-lva score first, without generating the quiet moves
+    '''
+    return game_state.staged_legal_moves(color, capture_key=lambda move: -capture_score(game_state, move),
+                                         quiets=False)
+
+
+class move_orderer():
+    '''
+    searches moves in the order get_all_legal_moves returns them and counts how often the first move cut off
+    orderers are given to an agent with minimax_alpha_beta_agent(orderer=...)
+    '''
+    def __init__(self):
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def clear(self):
+        self.reset_stats()
+
+    def new_search(self):
+        pass
+
+    def staged_moves(self, game_state, color, ply, hash_move=None):
+        '''
+        the moves of color in search order, an orderer that can sort stage by stage hands out a lazy iterator
+        '''
+        return [game_state.pack_action(action) for action in game_state.get_all_legal_moves(color)]
+
+    def record_cutoff(self, game_state, move, ply, depth, move_index):
+        '''
+        called after move caused a cutoff and has been undone, so game_state is the position the move was made in
+        '''
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+    def stats(self):
+        rate = self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+        return {"cutoffs": self.cutoffs, "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": rate}
+
+
+class killer_history_orderer(move_orderer):
+    '''
+    hash move first, then captures and promotions by most valuable victim / least valuable attacker,
+    then the killer moves of the ply, then the remaining quiet moves by history score
+    '''
+    def __init__(self, killers_per_ply=2):
+        super().__init__()
+        self.killers_per_ply = killers_per_ply
+        self.killers = {}
+        self.history = {}
+
+    def clear(self):
+        super().clear()
+        self.killers = {}
+        self.history = {}
+
+    def new_search(self):
+        # killers are tied to a ply from the root, which moves on every turn; history only fades
+        self.killers = {}
+        for move in self.history:
+            self.history[move] //= 2
+
+    def capture_score(self, game_state, move):
+        return capture_score(game_state, move)
+
+    def staged_moves(self, game_state, color, ply, hash_move=None):
+        '''
+        the hash move, then the captures, then the quiet moves with the killers first, each stage is only
+        generated after the one before it has been searched
+        '''
+        ply_killers = self.killers.get(ply, ())
+        history = self.history
+        return game_state.staged_legal_moves(
+            color, hash_move,
+            capture_key=lambda move: -self.capture_score(game_state, move),
+            quiet_key=lambda move: (move not in ply_killers, -history.get(move, 0)))
+
+    def record_cutoff(self, game_state, move, ply, depth, move_index):
+        super().record_cutoff(game_state, move, ply, depth, move_index)
+        # captures and promotions are already searched early, killers and history are for quiet moves
+        if self.capture_score(game_state, move) is not None:
+            return
+        ply_killers = self.killers.setdefault(ply, [])
+        if move not in ply_killers:
+            ply_killers.insert(0, move)
+            del ply_killers[self.killers_per_ply:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
@@ -0,0 +1,271 @@
+#
+# Monte Carlo tree search on a process pool
+# mode "root": every worker grows its own tree from the root, the root children are merged by visit counts
+# mode "leaf": one tree in this process, its leaves are played out in batches by the workers, virtual loss keeps
+# the leaves of a batch apart
+# python parallel_mcts.py --workers 1 2 4 8 --seconds 2 reports the speedup of both modes over mcts_agent on the
+# board size in constants
+#
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import arena
+import constants
+from custom_ai_engines import agent, mcts_agent, search_budget, piece_value_heuristic
+from bitboard_engine import bitboard_game_state
+from enums import Player
+
+MODES = ("root", "leaf")
+
+# the mcts_agents of a worker process by slot, kept between the tasks of one game so a root mode tree can be reused
+# on the next move when its slot lands on the same process again
+_worker_agents = {}
+_worker_key = None
+
+
+def init_worker(rows, cols, seed):
+    '''
+    forked workers start with the random state of the parent, without a new seed they play the same playouts
+    '''
+    arena.configure_board(rows, cols)
+    random.seed(seed * 100003 + os.getpid())
+
+
+def options_key(options):
+    '''
+    the options are unpickled into new objects for every task, the heuristic is compared by its class
+    '''
+    return tuple(sorted((name, type(value).__name__ if name == "heuristic" else value)
+                        for name, value in options.items()))
+
+
+def worker_agent(options, game, slot=0):
+    '''
+    returns the worker's mcts_agent of slot, the trees are dropped when the options change or the parent agent was
+    restarted
+    '''
+    global _worker_key
+    key = (options_key(options), game)
+    if _worker_key != key:
+        _worker_agents.clear()
+        _worker_key = key
+    if slot not in _worker_agents:
+        _worker_agents[slot] = mcts_agent(**options)
+    return _worker_agents[slot]
+
+
+def search_tree(game_state, color, options, game, slot, time_limit, node_limit):
+    '''
+    root mode task, returns ({move: (visits, wins)} of the root children, playouts)
+    every task of a move has its own slot, two tasks run by one process still search separate trees
+    '''
+    tree = worker_agent(options, game, slot)
+    tree.get_move(game_state, color, time_limit, node_limit)
+    children = {child.move: (child.visits, child.wins) for child in tree.root.children}
+    return children, tree.stats()["playouts"]
+
+
+def run_playouts(game_state, paths, options, game):
+    '''
+    leaf mode task, plays out the position at the end of every path of (packed) moves from game_state
+    returns the results for white in the order of paths
+    '''
+    player = worker_agent(options, game)
+    results = []
+    for path in paths:
+        for move in path:
+            game_state.make_move(move)
+        try:
+            results.append(player.playout(game_state))
+        finally:
+            for _ in path:
+                game_state.undo_move()
+    return results
+
+
+class parallel_mcts_agent(agent):
+    '''
+    mcts_agent spread over workers processes, see the top of the module for the two modes
+    the workers always play out on a bitboard copy of the position; iterations and node_limit count playouts of
+    all workers together, a time_limit is the wall time of the move
+    '''
+    def __init__(self, workers=None, mode="root", iterations=4000, exploration=1.4, max_nodes=200000,
+                 playout_depth=40, capture_bias=0.8, heuristic=piece_value_heuristic(), batch_size=8):
+        if mode not in MODES:
+            raise ValueError("mode has to be one of " + ", ".join(MODES))
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.iterations = iterations
+        self.batch_size = batch_size
+        self.options = {"exploration": exploration, "max_nodes": max_nodes, "playout_depth": playout_depth,
+                        "capture_bias": capture_bias, "heuristic": heuristic, "bitboard": False}
+        # leaf mode keeps its tree here, it selects and backpropagates like the single process agent
+        self.tree = mcts_agent(**self.options)
+        self.pool = None
+        self.game = 0
+        self.last_stats = {}
+
+    def restart(self):
+        self.tree.restart()
+        # the workers drop their trees on the next task of a new game
+        self.game += 1
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def start_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                            initargs=(constants.DIMENSION_ROW, constants.DIMENSION_COL,
+                                                      random.getrandbits(32)))
+        return self.pool
+
+    def get_move(self, game_state, color, time_limit=None, node_limit=None):
+        '''
+        gets the most visited move over all workers
+
+        returns ((start row, start col)), (end row, end col))
+        '''
+        game_state = bitboard_game_state.from_game_state(game_state)
+        if time_limit is None and node_limit is None:
+            node_limit = self.iterations
+        budget = search_budget(time_limit, node_limit)
+        self.start_pool()
+        if self.mode == "root":
+            visits, playouts = self.search_root_parallel(game_state, color, time_limit, node_limit)
+        else:
+            visits, playouts = self.search_leaf_parallel(game_state, budget)
+
+        elapsed = time.perf_counter() - budget.start
+        self.last_stats = {
+            "mode": self.mode,
+            "workers": self.workers,
+            "playouts": playouts,
+            "seconds": elapsed,
+            "playouts_per_second": playouts / elapsed if elapsed > 0 else 0.0,
+        }
+        if not visits:
+            return None
+        return game_state.unpack_action(max(visits, key=lambda move: visits[move]))
+
+    def stats(self):
+        '''
+        mode, workers, playouts, seconds and playouts_per_second of the last get_move
+        '''
+        return dict(self.last_stats)
+
+    def search_root_parallel(self, game_state, color, time_limit, node_limit):
+        '''
+        returns ({move: visits} summed over the worker trees, playouts)
+        '''
+        share = None
+        if node_limit is not None:
+            share = max(1, -(-node_limit // self.workers))
+        futures = [self.pool.submit(search_tree, game_state, color, self.options, self.game, slot, time_limit, share)
+                   for slot in range(self.workers)]
+        visits = {}
+        playouts = 0
+        for future in futures:
+            children, count = future.result()
+            playouts += count
+            for move, (count, _) in children.items():
+                visits[move] = visits.get(move, 0) + count
+        return visits, playouts
+
+    def search_leaf_parallel(self, game_state, budget):
+        '''
+        returns ({move: visits} of the root children, playouts)
+        at most two batches per worker are in flight, the budget is checked whenever a batch is handed out
+        '''
+        tree = self.tree
+        root = tree.reuse_root(game_state)
+        running = {}
+        playouts = 0
+        while running or not budget.exhausted():
+            while len(running) < 2 * self.workers and not budget.exhausted():
+                leaves = []
+                paths = []
+                for _ in range(self.batch_size):
+                    path = []
+                    try:
+                        node = tree.select_leaf(game_state, root, path)
+                    finally:
+                        for _ in path:
+                            game_state.undo_move()
+                    self.add_virtual_loss(node)
+                    leaves.append(node)
+                    paths.append(path)
+                budget.nodes += len(paths)
+                future = self.pool.submit(run_playouts, game_state, paths, self.options, self.game)
+                running[future] = leaves
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                leaves = running.pop(future)
+                for node, result in zip(leaves, future.result()):
+                    self.remove_virtual_loss(node)
+                    tree.backpropagate(node, result)
+                    playouts += 1
+            if root.untried == [] and not root.children:
+                break
+        return {child.move: child.visits for child in root.children}, playouts
+
+    def add_virtual_loss(self, node):
+        '''
+        a visit without a win, the path looks like a loss to the next selections until the playout is back
+        '''
+        while node is not None:
+            node.visits += 1
+            node = node.parent
+
+    def remove_virtual_loss(self, node):
+        while node is not None:
+            node.visits -= 1
+            node = node.parent
+
+
+def benchmark(worker_counts, seconds, modes=MODES):
+    '''
+    playouts per second from the start position, returns [(mode, workers, playouts/s, speedup)]
+    the speedup is against a single process mcts_agent on a bitboard
+    '''
+    from chess_engine import game_state
+    state = game_state()
+    serial = mcts_agent(bitboard=True)
+    serial.get_move(state, Player.PLAYER_1, seconds)
+    base = serial.stats()["playouts_per_second"]
+    rows = [("serial", 1, base, 1.0)]
+    for mode in modes:
+        for workers in worker_counts:
+            parallel = parallel_mcts_agent(workers, mode)
+            try:
+                # the first move pays for starting the processes
+                parallel.get_move(state, Player.PLAYER_1, node_limit=workers * parallel.batch_size)
+                parallel.restart()
+                parallel.get_move(state, Player.PLAYER_1, seconds)
+            finally:
+                parallel.close()
+            rate = parallel.stats()["playouts_per_second"]
+            rows.append((mode, workers, rate, rate / base if base else 0.0))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="speedup of root and leaf parallel mcts over the worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=2.0, help="search time of every measurement")
+    parser.add_argument("--mode", choices=MODES, nargs="+", default=list(MODES))
+    args = parser.parse_args()
+
+    for mode, workers, rate, speedup in benchmark(args.workers, args.seconds, args.mode):
+        print("%-6s %3d workers %10.1f playouts/s  speedup %.2fx" % (mode, workers, rate, speedup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#
+# Perft runner, counts the legal move tree of a start position and compares it with the known counts
+# python perft.py                      every board at its default depth
+# python perft.py --board 6x4 --depth 5 --divide --bitboard
+# The board size is read from constants when chess_engine is imported, so each board runs in its own process.
+#
+import argparse
+import subprocess
+import sys
+import time
+
+import constants
+
+# PERFT_REFERENCE[(rows, cols)][depth - 1], en passant is turned off in this engine so 8x8 stops at depth 4
+PERFT_REFERENCE = {
+    (4, 4): [7, 32, 188, 997, 6070, 35434],
+    (6, 4): [9, 74, 729, 6302, 64228, 603353],
+    (6, 6): [16, 244, 4060, 63140],
+    (8, 8): [20, 400, 8902, 197281],
+}
+
+DEFAULT_DEPTH = {(4, 4): 5, (6, 4): 4, (6, 6): 3, (8, 8): 3}
+
+
+def parse_board(text):
+    rows, cols = text.lower().split("x")
+    return int(rows), int(cols)
+
+
+def run_board(rows, cols, depth, divide=False, bitboard=False):
+    '''
+    runs perft on the start position of a rows x cols board, returns False if the count is not the reference count
+    '''
+    constants.DIMENSION_ROW = rows
+    constants.DIMENSION_COL = cols
+    from chess_engine import game_state
+    from bitboard_engine import bitboard_game_state
+
+    state = bitboard_game_state() if bitboard else game_state()
+    start = time.perf_counter()
+    if divide:
+        counts = state.perft_divide(depth)
+        nodes = sum(counts.values())
+    else:
+        nodes = state.perft(depth)
+    elapsed = time.perf_counter() - start
+
+    if divide:
+        for move, count in sorted(counts.items()):
+            print(move, count)
+    reference = PERFT_REFERENCE.get((rows, cols), [])
+    if depth > len(reference):
+        result = "no reference"
+    elif nodes == reference[depth - 1]:
+        result = "ok"
+    else:
+        result = "MISMATCH, expected " + str(reference[depth - 1])
+    print("%dx%d %s depth %d: %d nodes in %.3fs, %.0f nodes/s, %s" % (
+        rows, cols, "bitboard" if bitboard else "game_state", depth, nodes, elapsed,
+        nodes / elapsed if elapsed > 0 else 0, result))
+    return not result.startswith("MISMATCH")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="count and time legal move generation from the start position")
+    parser.add_argument("--board", help="rows x cols, e.g. 6x4, every board with reference counts if left out")
+    parser.add_argument("--depth", type=int, help="plies to search, a per board default if left out")
+    parser.add_argument("--divide", action="store_true", help="print the count below every first move")
+    parser.add_argument("--bitboard", action="store_true", help="use bitboard_game_state instead of game_state")
+    args = parser.parse_args()
+
+    if args.board:
+        rows, cols = parse_board(args.board)
+        depth = args.depth or DEFAULT_DEPTH.get((rows, cols), 3)
+        ok = run_board(rows, cols, depth, args.divide, args.bitboard)
+    else:
+        ok = True
+        for rows, cols in PERFT_REFERENCE:
+            command = [sys.executable, __file__, "--board", "%dx%d" % (rows, cols)]
+            if args.depth:
+                command += ["--depth", str(args.depth)]
+            if args.divide:
+                command.append("--divide")
+            if args.bitboard:
+                command.append("--bitboard")
+            ok = subprocess.run(command).returncode == 0 and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
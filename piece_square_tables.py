@@ -0,0 +1,176 @@
+#
+# Piece values and piece-square tables shared by the heuristics and the running evaluation kept by game_state
+# The tables are written from white's side, row 0 is the row white promotes on, black reads them upside down.
+# compile_tables turns them into one flat array per piece code for the board size in use: the 6x4 board has its own
+# tables, the 8x8 board uses the flat 8x8 ones and every other size (4x4) samples the 8x8 tables.
+#
+from enums import Player
+
+PIECE_VALUES = {"k": 1000, "q": 100, "r": 50, "b": 30, "n": 30, "p": 10}
+
+# piece code = color * 6 + piece type, the same codes bitboard_engine keeps on its squares
+COLORS = [Player.PLAYER_1, Player.PLAYER_2]
+PIECE_NAMES = ["p", "n", "b", "r", "q", "k"]
+PIECE_CODES = {(COLORS[code // 6], PIECE_NAMES[code % 6]): code for code in range(12)}
+
+PAWN_TABLE_8 = [
+    0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5,  5, 10, 25, 25, 10,  5,  5,
+    0,  0,  0, 20, 20,  0,  0,  0,
+    5, -5,-10,  0,  0,-10, -5,  5,
+    5, 10, 10,-20,-20, 10, 10,  5,
+    0,  0,  0,  0,  0,  0,  0,  0]
+
+PAWN_TABLE_6X4 = [
+    [50, 50, 50, 50],
+    [30, 30, 25, 25],
+    [10, 10, 10, 10],
+    [5,  10, 10,  5],
+    [5,   5,  5,  5],
+    [0,   0,  0,  0]]
+
+KNIGHT_TABLE_8 = [
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50]
+
+KNIGHT_TABLE_6X4 = [
+    [0, 0, 0, 0],
+    [0, 5, 5, 0],
+    [0, 15, 15, 0],
+    [0, 15, 15, 0],
+    [0, 5,  5, 0],
+    [-5,-5,-5,-5]]
+
+BISHOP_TABLE_8 = [
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5,  5, 10, 10,  5,  5,-10,
+    -10,  0, 10, 10, 10, 10,  0,-10,
+    -10, 10, 10, 10, 10, 10, 10,-10,
+    -10,  5,  0,  0,  0,  0,  5,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20]
+
+BISHOP_TABLE_6X4 = [
+    [5, 10, 10, 5],
+    [5, 10, 10, 5],
+    [10, 10, 10, 10],
+    [10, 10, 10, 10],
+    [5, 10, 10, 5],
+    [5, 10, 10, 5]]
+
+ROOK_TABLE_8 = [
+    0,  0,  0,  0,  0,  0,  0,  0,
+    5, 10, 10, 10, 10, 10, 10,  5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    0,  0,  0,  5,  5,  0,  0,  0]
+
+ROOK_TABLE_6X4 = [
+    [0,  0,  0,  0],
+    [5, 10, 10,  5],
+    [5,  0, 0, 5],
+    [5,  0, 0, 5],
+    [5,  0, 0, 5],
+    [0,  5,  5,  0]]
+
+QUEEN_TABLE_8 = [
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+    -5,  0,  5,  5,  5,  5,  0, -5,
+    0,  0,  5,  5,  5,  5,  0, -5,
+    -10,  5,  5,  5,  5,  5,  0,-10,
+    -10,  0,  5,  0,  0,  0,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20]
+
+QUEEN_TABLE_6X4 = [
+    [-20, -10, -10, -20],
+    [-10,  0,  0, -10],
+    [-10,  5,  5, -10],
+    [-10,  5,  5, -10],
+    [-10,  5,  5, -10],
+    [-20,-10, -10,-20]]
+
+KING_TABLE_START_8 = [
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -20,-30,-30,-40,-40,-30,-30,-20,
+    -10,-20,-20,-20,-20,-20,-20,-10,
+    20, 20,  0,  0,  0,  0, 20, 20,
+    20, 30, 10,  0,  0, 10, 30, 20]
+
+KING_TABLE_START_6X4 = [
+    [-30,-40,-40,-30],
+    [-30,-40,-40,-30],
+    [-30,-40,-40,-30],
+    [-10,-20,-20,-10],
+    [20, 10, 10, 20],
+    [20, 30, 30, 20]]
+
+KING_TABLE_END_8 = [
+    -50,-40,-30,-20,-20,-30,-40,-50,
+    -30,-20,-10,  0,  0,-10,-20,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-30,  0,  0,  0,  0,-30,-30,
+    -50,-30,-30,-30,-30,-30,-30,-50]
+
+KING_TABLE_END_6X4 = [
+    [-50,-30,-30,-50],
+    [-30,-10,-10,-30],
+    [-30,10,10,-30],
+    [-30,10,10,-30],
+    [-30,0,0,-30],
+    [-50,-30,-30,-50]]
+
+# the table of every piece on the 6x4 board, the king uses its endgame table
+TABLES_6X4 = {"p": PAWN_TABLE_6X4, "n": KNIGHT_TABLE_6X4, "b": BISHOP_TABLE_6X4, "r": ROOK_TABLE_6X4,
+              "q": QUEEN_TABLE_6X4, "k": KING_TABLE_END_6X4}
+
+# the full board starts with a middlegame, its king stays home behind the pawns
+TABLES_8X8 = {"p": PAWN_TABLE_8, "n": KNIGHT_TABLE_8, "b": BISHOP_TABLE_8, "r": ROOK_TABLE_8,
+              "q": QUEEN_TABLE_8, "k": KING_TABLE_START_8}
+
+
+def table_value(name, rows, cols, row, col):
+    '''
+    value of the table of piece name at (row, col) from white's side, on boards other than 6x4 and 8x8 it is the value
+    of the nearest 8x8 square, so the promotion row and the home row keep theirs
+    '''
+    if (rows, cols) == (6, 4):
+        return TABLES_6X4[name][row][col]
+    table_row = round(row * 7 / (rows - 1)) if rows > 1 else 0
+    table_col = round(col * 7 / (cols - 1)) if cols > 1 else 0
+    return TABLES_8X8[name][table_row * 8 + table_col]
+
+
+def compile_tables(rows, cols):
+    '''
+    returns one flat array per piece code, square = row * cols + col, read from the side of the piece's color
+    '''
+    tables = []
+    for code in range(12):
+        name = PIECE_NAMES[code % 6]
+        squares = []
+        for row in range(rows):
+            table_row = row if COLORS[code // 6] == Player.PLAYER_1 else rows - row - 1
+            for col in range(cols):
+                squares.append(table_value(name, rows, cols, table_row, col))
+        tables.append(squares)
+    return tables
@@ -0,0 +1,67 @@
+#
+# Search benchmark, plays the first moves of a game with every agent spec and reports how deep and how fast it searched
+# python search_bench.py "minimax_alpha_beta_agent()" "minimax_alpha_beta_agent(null_move=True, late_move_reductions=True)" --time-limit 1
+# python search_bench.py "minimax_alpha_beta_agent(depth=4)" "minimax_alpha_beta_agent(depth=4, pvs=True)" --board 8x8
+# Every spec plays the same moves (those of the first spec), so they are measured on the same positions.
+#
+import argparse
+import time
+
+import arena
+
+
+def run_spec(spec, moves, time_limit=None, node_limit=None, line=None):
+    '''
+    searches the positions after every prefix of line (or plays its own moves if line is None)
+    returns (the moves played, [(completed depth, nodes, seconds)] per position)
+    '''
+    from chess_engine import game_state
+    from enums import Player
+
+    searcher = arena.make_agent(spec)
+    state = game_state()
+    played = []
+    results = []
+    for ply in range(moves):
+        if state.terminal_status() != 3:
+            break
+        color = Player.PLAYER_1 if state.whose_turn() else Player.PLAYER_2
+        start = time.perf_counter()
+        move = searcher.get_move(state, color, time_limit, node_limit)
+        elapsed = time.perf_counter() - start
+        results.append((searcher.completed_depth, searcher.budget.nodes, elapsed))
+        if line is not None:
+            if ply >= len(line):
+                break
+            move = line[ply]
+        state.move_piece(move[0], move[1], True)
+        played.append(move)
+    return played, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare the search depth and speed of alpha beta agent specs")
+    parser.add_argument("specs", nargs="+", help='agent specs, e.g. "minimax_alpha_beta_agent(null_move=True)"')
+    parser.add_argument("--moves", type=int, default=8, help="positions searched, from the start of the game")
+    parser.add_argument("--time-limit", type=float, help="seconds per move, the agent's fixed depth if left out")
+    parser.add_argument("--node-limit", type=int, help="search nodes per move")
+    parser.add_argument("--board", help="rows x cols, e.g. 8x8, the size in constants if left out")
+    args = parser.parse_args()
+
+    if args.board:
+        rows, cols = args.board.lower().split("x")
+        arena.configure_board(int(rows), int(cols))
+    line = None
+    for spec in args.specs:
+        played, results = run_spec(spec, args.moves, args.time_limit, args.node_limit, line)
+        if line is None:
+            line = played
+        depth = sum(result[0] for result in results) / len(results) if results else 0.0
+        nodes = sum(result[1] for result in results)
+        seconds = sum(result[2] for result in results)
+        print("%s: average depth %.2f, %d nodes in %.2fs, %.0f nodes/s" % (
+            spec, depth, nodes, seconds, nodes / seconds if seconds > 0 else 0))
+
+
+if __name__ == "__main__":
+    main()
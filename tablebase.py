@@ -0,0 +1,390 @@
+#
+# Endgame tablebases for the small boards, built by retrograde analysis
+# python tablebase.py KQvK KRvK KPvK --workers 4       (the board in constants, --board 4x4 for another size)
+# A signature lists the white pieces, a "v", then the black pieces, e.g. KRvKN. The signatures reached by a capture or
+# promotion are generated first, and signatures of the same level are generated in parallel.
+# A table file has a 16 byte header and then one byte per position: 0 is a draw, 255 a position that can not happen,
+# anything else is the distance to mate in plies + 1. Odd distances are wins for the side to move, even ones losses.
+#
+import argparse
+import itertools
+import mmap
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from enums import Player
+import constants
+
+# order of the letters in a signature, the stronger side is stored as white
+PIECE_ORDER = "KQRBNP"
+# piece types of bitboard_engine
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_LETTERS = "PNBRQK"
+
+DEFAULT_DIRECTORY = "tablebases"
+DEFAULT_SIGNATURES = ["KQvK", "KRvK", "KBvK", "KNvK", "KPvK"]
+
+HEADER = b"CSTB"
+HEADER_BYTES = 16
+DRAW = 0
+IMPOSSIBLE = 255
+
+
+def sort_side(side):
+    return "".join(sorted(side, key=PIECE_ORDER.index))
+
+
+def side_key(side):
+    return len(side), [-PIECE_ORDER.index(letter) for letter in side]
+
+
+def canonical_signature(signature):
+    '''
+    returns (stored signature, True if the colors were swapped to get it)
+    '''
+    white, black = signature.split("v")
+    if side_key(white) >= side_key(black):
+        return signature, False
+    return black + "v" + white, True
+
+
+def child_signatures(signature):
+    '''
+    stored signatures one capture or promotion away, bare kings are always a draw and left out
+    '''
+    sides = signature.split("v")
+    children = set()
+    for color in (0, 1):
+        for i, letter in enumerate(sides[color]):
+            if letter == "K":
+                continue
+            changed = list(sides)
+            changed[color] = sides[color][:i] + sides[color][i + 1:]
+            children.add(canonical_signature("v".join(changed))[0])
+            if letter == "P":
+                changed[color] = sort_side(sides[color][:i] + "Q" + sides[color][i + 1:])
+                children.add(canonical_signature("v".join(changed))[0])
+    children.discard("KvK")
+    return children
+
+
+def sort_pieces(pieces):
+    return sorted(pieces, key=lambda piece: (piece[0], -piece[1], piece[2]))
+
+
+def signature_of(pieces):
+    '''
+    signature of sorted (color, piece type, square) triples
+    '''
+    sides = ["", ""]
+    for color, piece_type, _ in pieces:
+        sides[color] += PIECE_LETTERS[piece_type]
+    return sides[0] + "v" + sides[1]
+
+
+def flip_pieces(pieces, rows, cols):
+    '''
+    swaps the colors and mirrors the rows, so the pawns keep walking the right way
+    '''
+    return [(1 - color, piece_type, (rows - 1 - sq // cols) * cols + sq % cols) for color, piece_type, sq in pieces]
+
+
+def position_index(pieces, white_to_move, squares):
+    index = 0
+    for _, _, sq in pieces:
+        index = index * squares + sq
+    return index * 2 + (0 if white_to_move else 1)
+
+
+def table_path(directory, signature, rows, cols):
+    return os.path.join(directory, "%s.%dx%d.tb" % (signature, rows, cols))
+
+
+def decode(value):
+    '''
+    returns (wdl, dtm) for the side to move from a stored byte, wdl is 1 win, 0 draw, -1 loss
+    '''
+    if value is None or value == IMPOSSIBLE:
+        return None
+    if value == DRAW:
+        return 0, 0
+    dtm = value - 1
+    return (1 if dtm % 2 else -1), dtm
+
+
+class tablebase():
+    '''
+    probes the tables of a directory, a table is memory mapped the first time its signature is needed
+    '''
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.rows = constants.DIMENSION_ROW
+        self.cols = constants.DIMENSION_COL
+        self.squares = self.rows * self.cols
+        self.tables = {}
+        self.probes = 0
+        self.hits = 0
+        # positions with more pieces than the largest table are skipped before looking for their signature
+        self.max_pieces = 2
+        suffix = ".%dx%d.tb" % (self.rows, self.cols)
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(suffix):
+                    self.max_pieces = max(self.max_pieces, len(name) - len(suffix) - 1)
+
+    def __getstate__(self):
+        # memory maps cannot be pickled, a copy in another process maps the tables again
+        state = dict(self.__dict__)
+        state["tables"] = {}
+        return state
+
+    def table(self, signature):
+        if signature not in self.tables:
+            path = table_path(self.directory, signature, self.rows, self.cols)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    self.tables[signature] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.tables[signature] = None
+        return self.tables[signature]
+
+    def lookup(self, pieces, white_to_move):
+        '''
+        returns the stored byte of a position given as (color, piece type, square) triples, None without a table
+        '''
+        pieces = sort_pieces(pieces)
+        signature = signature_of(pieces)
+        if signature == "KvK":
+            return DRAW
+        signature, flipped = canonical_signature(signature)
+        if flipped:
+            pieces = sort_pieces(flip_pieces(pieces, self.rows, self.cols))
+            white_to_move = not white_to_move
+        table = self.table(signature)
+        if table is None:
+            return None
+        return table[HEADER_BYTES + position_index(pieces, white_to_move, self.squares)]
+
+    def probe(self, game_state):
+        '''
+        returns (wdl, dtm) for the side to move, wdl is 1 win, 0 draw, -1 loss and dtm the plies to mate
+        None if the position has more pieces than the tables or its table was not generated
+        '''
+        self.probes += 1
+        pieces = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if game_state.is_valid_piece(row, col):
+                    piece = game_state.get_piece(row, col)
+                    pieces.append((0 if piece.is_player(Player.PLAYER_1) else 1,
+                                   PIECE_LETTERS.index(piece.get_name().upper()), row * self.cols + col))
+                    if len(pieces) > self.max_pieces:
+                        return None
+        result = decode(self.lookup(pieces, game_state.whose_turn()))
+        if result is not None:
+            self.hits += 1
+        return result
+
+
+def generate_table(signature, directory=DEFAULT_DIRECTORY, rows=None, cols=None):
+    '''
+    builds and writes the table of a stored signature, the tables of its child signatures have to exist
+    returns {"signature", "positions", "wins", "draws", "losses", "longest", "seconds"}
+    '''
+    if rows is not None:
+        # worker processes set the board before the engine is imported
+        constants.DIMENSION_ROW = rows
+        constants.DIMENSION_COL = cols
+    from bitboard_engine import bitboard_game_state
+
+    start = time.perf_counter()
+    children = tablebase(directory)
+    rows, cols = children.rows, children.cols
+    squares = rows * cols
+    white, black = signature.split("v")
+    if white.count("K") != 1 or black.count("K") != 1:
+        raise ValueError("every side needs exactly one king: " + signature)
+    kinds = [(0, PIECE_LETTERS.index(letter)) for letter in white] + \
+            [(1, PIECE_LETTERS.index(letter)) for letter in black]
+    count = len(kinds)
+    size = squares ** count * 2
+    # how far each piece's square is shifted in the position number
+    place_values = [squares ** (count - 1 - i) for i in range(count)]
+
+    position = bitboard_game_state()
+    position.white_king_can_castle = [False, False, False]
+    position.black_king_can_castle = [False, False, False]
+
+    values = bytearray([IMPOSSIBLE]) * size
+    remaining = array("i", [0]) * size
+    child_start = array("I", [0]) * (size + 1)
+    child_list = array("I")
+    mates = []
+    # moves that leave the table, keyed by the distance to mate of the position they lead to
+    external_lost = {}
+    external_won = {}
+
+    for number, placement in enumerate(itertools.product(range(squares), repeat=count)):
+        valid = len(set(placement)) == count
+        for i, sq in enumerate(placement):
+            if kinds[i][1] == PAWN and sq // cols in (0, rows - 1):
+                valid = False
+        if valid:
+            pieces = [(color, piece_type, sq) for (color, piece_type), sq in zip(kinds, placement)]
+            position.set_bitboards(pieces, True)
+            at = {sq: i for i, sq in enumerate(placement)}
+        for color in (0, 1):
+            index = number * 2 + color
+            if valid and not position.is_in_check(1 - color):
+                values[index] = DRAW
+                moves = position.legal_move_squares(color)
+                if not moves and position.is_in_check(color):
+                    values[index] = 1
+                    mates.append(index)
+                remaining[index] = len(moves)
+                for from_sq, to_sq in moves:
+                    i = at[from_sq]
+                    captured = at.get(to_sq)
+                    promoted = kinds[i][1] == PAWN and to_sq // cols in (0, rows - 1)
+                    if captured is None and not promoted:
+                        child_list.append((number + (to_sq - from_sq) * place_values[i]) * 2 + 1 - color)
+                        continue
+                    child = [piece for k, piece in enumerate(pieces) if k != i and k != captured]
+                    child.append((color, QUEEN if promoted else kinds[i][1], to_sq))
+                    value = children.lookup(child, color == 1)
+                    if value is None:
+                        raise ValueError("the table of " + signature_of(sort_pieces(child)) + " is missing")
+                    if value != DRAW:
+                        if (value - 1) % 2 == 0:
+                            external_lost.setdefault(value - 1, []).append(index)
+                        else:
+                            external_won.setdefault(value - 1, []).append(index)
+            child_start[index + 1] = len(child_list)
+
+    # reverse the move lists so every position knows the positions that move into it
+    parent_start = array("I", [0]) * (size + 1)
+    for child in child_list:
+        parent_start[child + 1] += 1
+    for index in range(size):
+        parent_start[index + 1] += parent_start[index]
+    parent_list = array("I", [0]) * len(child_list)
+    fill = array("I", parent_start)
+    for index in range(size):
+        for k in range(child_start[index], child_start[index + 1]):
+            child = child_list[k]
+            parent_list[fill[child]] = index
+            fill[child] += 1
+
+    # positions are resolved in order of their distance to mate, a move into a lost position wins and a position
+    # loses once every move leads into a won one; whatever is never resolved is a draw
+    newly_lost = mates
+    newly_won = []
+    dtm = 0
+    last_external = max(list(external_lost) + list(external_won) + [-1])
+    while newly_lost or newly_won or dtm <= last_external:
+        if dtm + 2 >= IMPOSSIBLE:
+            raise ValueError("distance to mate does not fit in a byte: " + signature)
+        next_lost = []
+        next_won = []
+        winners = list(external_lost.get(dtm, []))
+        for lost in newly_lost:
+            winners.extend(parent_list[parent_start[lost]:parent_start[lost + 1]])
+        for index in winners:
+            if values[index] == DRAW:
+                values[index] = dtm + 2
+                next_won.append(index)
+        losers = list(external_won.get(dtm, []))
+        for won in newly_won:
+            losers.extend(parent_list[parent_start[won]:parent_start[won + 1]])
+        for index in losers:
+            if values[index] == DRAW:
+                remaining[index] -= 1
+                if remaining[index] == 0:
+                    values[index] = dtm + 2
+                    next_lost.append(index)
+        newly_lost = next_lost
+        newly_won = next_won
+        dtm += 1
+
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, signature, rows, cols)
+    header = HEADER + bytes([rows, cols, count])
+    with open(path + ".tmp", "wb") as f:
+        f.write(header + bytes(HEADER_BYTES - len(header)))
+        f.write(values)
+    os.replace(path + ".tmp", path)
+
+    stats = {"signature": signature, "positions": 0, "wins": 0, "draws": 0, "losses": 0, "longest": 0}
+    for value in values:
+        if value == IMPOSSIBLE:
+            continue
+        stats["positions"] += 1
+        if value == DRAW:
+            stats["draws"] += 1
+        elif (value - 1) % 2:
+            stats["wins"] += 1
+        else:
+            stats["losses"] += 1
+        stats["longest"] = max(stats["longest"], value - 1)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def generate(signatures, directory=DEFAULT_DIRECTORY, workers=None, force=False):
+    '''
+    generates the tables of signatures and of every signature they can turn into
+    signatures that do not depend on each other are generated in parallel, existing tables are kept unless force
+    returns the stats of the generated tables
+    '''
+    rows = constants.DIMENSION_ROW
+    cols = constants.DIMENSION_COL
+    needed = set()
+    pending = [canonical_signature(signature)[0] for signature in signatures]
+    while pending:
+        signature = pending.pop()
+        if signature in needed or signature == "KvK":
+            continue
+        needed.add(signature)
+        pending.extend(child_signatures(signature))
+
+    # a capture takes a piece away and a promotion a pawn, so the children of a level are in earlier levels
+    levels = {}
+    for signature in needed:
+        levels.setdefault((len(signature) - 1, signature.count("P")), []).append(signature)
+
+    results = []
+    with ProcessPoolExecutor(workers) as pool:
+        for level in sorted(levels):
+            todo = [signature for signature in sorted(levels[level])
+                    if force or not os.path.exists(table_path(directory, signature, rows, cols))]
+            results.extend(pool.map(generate_table, todo, [directory] * len(todo), [rows] * len(todo),
+                                    [cols] * len(todo)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate endgame tablebases by retrograde analysis")
+    parser.add_argument("signatures", nargs="*", default=DEFAULT_SIGNATURES, help="e.g. KQvK KRvKN")
+    parser.add_argument("--directory", default=DEFAULT_DIRECTORY)
+    parser.add_argument("--workers", type=int, help="processes, the number of cores if left out")
+    parser.add_argument("--board", help="rows x cols, e.g. 4x4, the size in constants if left out")
+    parser.add_argument("--force", action="store_true", help="generate tables that already exist again")
+    args = parser.parse_args()
+
+    if args.board:
+        rows, cols = args.board.lower().split("x")
+        constants.DIMENSION_ROW = int(rows)
+        constants.DIMENSION_COL = int(cols)
+    start = time.perf_counter()
+    results = generate(args.signatures, args.directory, args.workers, args.force)
+    for stats in results:
+        print("%-8s %9d positions, %7d wins, %7d draws, %7d losses, longest mate %3d plies, %.1fs" % (
+            stats["signature"], stats["positions"], stats["wins"], stats["draws"], stats["losses"],
+            stats["longest"], stats["seconds"]))
+    print("%d tables in %.1fs" % (len(results), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#
+# Parallel tournament runner, plays the arena games of every pairing on a process pool
+# python tournament.py "minimax_alpha_beta_agent(depth=2)" "minimax_alpha_beta_agent(depth=3)" --games 200 --sprt
+# Colors alternate between games, results are turned into Elo differences with 95% confidence intervals and with
+# --sprt a pairing stops as soon as the sequential probability ratio test accepts elo0 or elo1.
+#
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import arena
+
+# z value of a two sided 95% confidence interval
+Z_95 = 1.96
+# virtual wins and losses added to every pairing for the variance, without them a pairing with only one result
+# (all wins, all draws) has no variance, the sprt never decides it and its confidence interval has no width
+PRIOR_RESULTS = 0.5
+
+
+def play_one(white_spec, black_spec, max_plies, time_limit, node_limit, seed):
+    '''
+    runs in a worker process, every game builds fresh agents and seeds random so forked workers do not repeat games
+    '''
+    random.seed(seed)
+    white = arena.make_agent(white_spec)
+    black = arena.make_agent(black_spec)
+    return arena.play_game(white, black, max_plies, time_limit, node_limit)
+
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def score_from_elo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class pairing_result():
+    '''
+    wins, draws and losses of player a against player b, with the Elo difference and the sprt state
+    '''
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        # "H0" / "H1" once the sprt has accepted a hypothesis
+        self.decision = None
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, score):
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def score(self):
+        return (self.wins + 0.5 * self.draws) / self.games() if self.games() else 0.5
+
+    def variance(self):
+        '''
+        variance of the score of a single game, with PRIOR_RESULTS virtual wins and losses on top of the games
+        '''
+        if not self.games():
+            return 0.0
+        wins = self.wins + PRIOR_RESULTS
+        losses = self.losses + PRIOR_RESULTS
+        n = wins + self.draws + losses
+        s = (wins + 0.5 * self.draws) / n
+        return (wins * (1 - s) ** 2 + self.draws * (0.5 - s) ** 2 + losses * s ** 2) / n
+
+    def elo(self):
+        '''
+        returns (elo difference, lower bound, upper bound) of a against b
+        '''
+        n = self.games()
+        s = self.score()
+        margin = Z_95 * math.sqrt(self.variance() / n) if n else 0.5
+        return elo_from_score(s), elo_from_score(s - margin), elo_from_score(s + margin)
+
+    def llr(self, elo0, elo1):
+        '''
+        log likelihood ratio of elo1 against elo0, normal approximation of the game scores
+        '''
+        variance = self.variance()
+        if not self.games():
+            return 0.0
+        s0 = score_from_elo(elo0)
+        s1 = score_from_elo(elo1)
+        return self.games() * (s1 - s0) * (2 * self.score() - s0 - s1) / (2 * variance)
+
+    def sprt(self, elo0, elo1, alpha, beta):
+        '''
+        returns "H1" when a is elo1 stronger, "H0" when it is only elo0 stronger, None while undecided
+        '''
+        llr = self.llr(elo0, elo1)
+        if llr >= math.log((1 - beta) / alpha):
+            return "H1"
+        if llr <= math.log(beta / (1 - alpha)):
+            return "H0"
+        return None
+
+
+def fit_ratings(players, pairings, iterations=200):
+    '''
+    Bradley-Terry ratings of all players from their pairings, the first player is fixed at 0
+    every pairing gets one extra virtual draw so a player without a win still has a finite rating
+    '''
+    strength = {player: 1.0 for player in players}
+    for _ in range(iterations):
+        for player in players:
+            points = 0.0
+            weight = 0.0
+            for result in pairings:
+                if player not in (result.a, result.b):
+                    continue
+                other = result.b if player == result.a else result.a
+                points += (result.wins if player == result.a else result.losses) + 0.5 * result.draws + 0.5
+                weight += (result.games() + 1) / (strength[player] + strength[other])
+            if weight:
+                strength[player] = points / weight
+    anchor = strength[players[0]]
+    return {player: 400 * math.log10(strength[player] / anchor) for player in players}
+
+
+def run_tournament(specs, games, workers=None, max_plies=arena.MAX_PLIES, time_limit=None, node_limit=None,
+                   board=None, sprt=None, seed=4100, output=None):
+    '''
+    plays games games per pairing of specs, sprt is (elo0, elo1, alpha, beta) or None
+    returns the pairing_results
+    '''
+    pairings = [pairing_result(a, b) for a, b in itertools.combinations(specs, 2)]
+    # (pairing, game number) in the order they are handed to the pool, colors alternate inside a pairing
+    schedule = [(result, number) for number in range(games) for result in pairings]
+    workers = workers or os.cpu_count() or 1
+    initializer = arena.configure_board if board else None
+    out = open(output, "a") if output else None
+    try:
+        with ProcessPoolExecutor(workers, initializer=initializer, initargs=board or ()) as pool:
+            running = {}
+            position = 0
+            while position < len(schedule) or running:
+                while position < len(schedule) and len(running) < 2 * workers:
+                    result, number = schedule[position]
+                    position += 1
+                    if result.decision is not None:
+                        continue
+                    white, black = (result.a, result.b) if number % 2 == 0 else (result.b, result.a)
+                    future = pool.submit(play_one, white, black, max_plies, time_limit, node_limit,
+                                         seed + position)
+                    running[future] = (result, number, white, black)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result, number, white, black = running.pop(future)
+                    if future.cancelled() or result.decision is not None:
+                        continue
+                    record = future.result()
+                    if record["result"] == arena.RESULTS[2]:
+                        score = 0.5
+                    else:
+                        score = 1 if (record["result"] == arena.RESULTS[1]) == (white == result.a) else 0
+                    result.add(score)
+                    if out is not None:
+                        record = dict({"game": number, "white": white, "black": black}, **record)
+                        out.write(json.dumps(record) + "\n")
+                    if sprt is not None:
+                        result.decision = result.sprt(*sprt)
+                        if result.decision is not None:
+                            for other, (other_result, _, _, _) in running.items():
+                                if other_result is result:
+                                    other.cancel()
+    finally:
+        if out is not None:
+            out.close()
+    return pairings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="play every pairing of the agent specs on all cores")
+    parser.add_argument("specs", nargs="+", help='agent specs, e.g. "minimax_alpha_beta_agent(depth=3)"')
+    parser.add_argument("--games", type=int, default=100, help="games per pairing")
+    parser.add_argument("--workers", type=int, help="processes, the number of cores if left out")
+    parser.add_argument("--max-plies", type=int, default=arena.MAX_PLIES)
+    parser.add_argument("--time-limit", type=float, help="seconds per move")
+    parser.add_argument("--node-limit", type=int, help="search nodes per move")
+    parser.add_argument("--board", help="rows x cols, e.g. 8x8, the size in constants if left out")
+    parser.add_argument("--seed", type=int, default=4100)
+    parser.add_argument("--output", help="json lines file the game records are appended to")
+    parser.add_argument("--sprt", action="store_true", help="stop a pairing once elo0 or elo1 is accepted")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=50.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+    if len(args.specs) < 2:
+        parser.error("at least two agent specs are needed")
+
+    board = None
+    if args.board:
+        rows, cols = args.board.lower().split("x")
+        board = (int(rows), int(cols))
+    sprt = (args.elo0, args.elo1, args.alpha, args.beta) if args.sprt else None
+    start = time.perf_counter()
+    pairings = run_tournament(args.specs, args.games, args.workers, args.max_plies, args.time_limit,
+                              args.node_limit, board, sprt, args.seed, args.output)
+    elapsed = time.perf_counter() - start
+
+    played = sum(result.games() for result in pairings)
+    print("%d games in %.1fs, %.1f games/s" % (played, elapsed, played / elapsed if elapsed > 0 else 0))
+    for result in pairings:
+        elo, low, high = result.elo()
+        line = "%s vs %s: +%d =%d -%d, elo %+.1f [%+.1f, %+.1f]" % (
+            result.a, result.b, result.wins, result.draws, result.losses, elo, low, high)
+        if sprt is not None:
+            line += ", sprt %s (llr %.2f)" % (result.decision or "undecided", result.llr(args.elo0, args.elo1))
+        print(line)
+    if len(args.specs) > 2:
+        ratings = fit_ratings(args.specs, pairings)
+        for spec in sorted(args.specs, key=lambda spec: -ratings[spec]):
+            print("%+7.1f  %s" % (ratings[spec], spec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#
+# Transposition table for the alpha beta agents
+# Fixed number of buckets sized from a memory budget, each bucket has a depth preferred slot and an always replace slot.
+# shared_transposition_table is the same table in shared memory for the processes of lazy_smp_agent.
+#
+import struct
+import weakref
+from multiprocessing import shared_memory
+
+from enums import Player
+
+# what the stored score means for the window it was searched with
+EXACT = 0
+LOWER_BOUND = 1  # the search failed high, the real score is >= score
+UPPER_BOUND = 2  # the search failed low, the real score is <= score
+
+# rough size of one stored entry (tuple + key + score + move) in bytes, used to turn megabytes into buckets
+ENTRY_BYTES = 160
+
+# scores are stored from the point of view of the maximizing color, so each color gets its own keys
+PERSPECTIVE_KEYS = {Player.PLAYER_1: 0, Player.PLAYER_2: 0x9E3779B97F4A7C15}
+
+# shared_transposition_table keeps the score as the bits of a double, with a flag to give integer scores back as int
+KEY_MASK = (1 << 64) - 1
+# the move, depth, bound and generation fields of the data word of shared_transposition_table
+MOVE_BITS = 21
+DEPTH_SHIFT = 21
+BOUND_SHIFT = 29
+GENERATION_SHIFT = 31
+INTEGER_SCORE = 1 << 39
+# set in every written entry, so an all zero word is an empty slot
+OCCUPIED = 1 << 40
+SCORE = struct.Struct("d")
+SCORE_BITS = struct.Struct("Q")
+
+
+def position_key(game_state, max_color):
+    return game_state.hash() ^ PERSPECTIVE_KEYS[max_color]
+
+
+class transposition_table:
+    '''
+    entries are tuples (key, depth, bound, score, best move, generation)
+    slot 2 * i keeps the deepest entry of bucket i, slot 2 * i + 1 keeps the most recent one
+    '''
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        self.entries = [None] * (2 * self.buckets)
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def clear(self):
+        self.entries = [None] * (2 * self.buckets)
+        self.generation = 0
+        self.reset_stats()
+
+    def new_search(self):
+        '''
+        called once per get_move, entries of older searches lose their claim on the depth preferred slot
+        '''
+        self.generation += 1
+
+    def probe(self, key):
+        self.probes += 1
+        index = 2 * (key % self.buckets)
+        entry = self.entries[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.entries[index + 1]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        self.stores += 1
+        index = 2 * (key % self.buckets)
+        deepest = self.entries[index]
+        entry = (key, depth, bound, score, move, self.generation)
+        if deepest is None or deepest[0] == key or depth >= deepest[1] or deepest[5] != self.generation:
+            if deepest is not None and deepest[0] != key:
+                self.collisions += 1
+            self.entries[index] = entry
+        else:
+            recent = self.entries[index + 1]
+            if recent is not None and recent[0] != key:
+                self.collisions += 1
+            self.entries[index + 1] = entry
+
+    def stats(self):
+        return {"size_mb": self.size_mb, "probes": self.probes, "hits": self.hits, "stores": self.stores,
+                "collisions": self.collisions}
+
+
+class shared_transposition_table(transposition_table):
+    '''
+    the same table in multiprocessing.shared_memory, so the processes of a parallel search read each other's entries
+    an entry is three 64 bit words (check, data, score) with check = key ^ data ^ score; there are no locks, an entry
+    torn by two processes writing at once does not pass the check and is read as a miss
+    data packs the move (21 bits), depth (8), bound (2), the generation (8), an integer score flag and an occupied flag
+    the moves are the packed ints of bitboard_game_state, which is what lazy_smp_agent searches on
+    pickling the table (to hand it to a worker process) attaches the worker to the same memory
+    '''
+    def __init__(self, size_mb=16, name=None):
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * 3 * 8))
+        self.generation = 0
+        self.reset_stats()
+        self.memory = shared_memory.SharedMemory(name, create=name is None, size=2 * 3 * 8 * self.buckets)
+        self.words = self.memory.buf[:2 * 3 * 8 * self.buckets].cast("Q")
+        # only the process that made the table unlinks it, at the latest when the interpreter exits
+        self.finalizer = weakref.finalize(self, release_memory, self.memory, self.words, name is None)
+        if name is None:
+            self.clear()
+
+    def __getstate__(self):
+        return {"size_mb": self.size_mb, "name": self.memory.name, "generation": self.generation}
+
+    def __setstate__(self, state):
+        self.__init__(state["size_mb"], state["name"])
+        self.generation = state["generation"]
+
+    def clear(self):
+        self.memory.buf[:len(self.words) * 8] = bytes(len(self.words) * 8)
+        self.generation = 0
+        self.reset_stats()
+
+    def close(self):
+        self.finalizer()
+
+    def pack_move(self, move):
+        # 0 is no move
+        return 0 if move is None else move + 1
+
+    def unpack_move(self, packed):
+        return packed - 1 if packed else None
+
+    def read(self, slot, key):
+        words = self.words
+        offset = 3 * slot
+        check = words[offset]
+        data = words[offset + 1]
+        score_bits = words[offset + 2]
+        if not data or check ^ data ^ score_bits != key:
+            return None
+        score = SCORE.unpack(SCORE_BITS.pack(score_bits))[0]
+        if data & INTEGER_SCORE:
+            score = int(score)
+        return (key, (data >> DEPTH_SHIFT) & 0xFF, (data >> BOUND_SHIFT) & 0x3, score,
+                self.unpack_move(data & ((1 << MOVE_BITS) - 1)), (data >> GENERATION_SHIFT) & 0xFF)
+
+    def write(self, slot, key, depth, bound, score, move):
+        data = (OCCUPIED | self.pack_move(move) | min(depth, 0xFF) << DEPTH_SHIFT | bound << BOUND_SHIFT |
+                (self.generation & 0xFF) << GENERATION_SHIFT | (INTEGER_SCORE if isinstance(score, int) else 0))
+        score_bits = SCORE_BITS.unpack(SCORE.pack(score))[0]
+        offset = 3 * slot
+        self.words[offset + 1] = data
+        self.words[offset + 2] = score_bits
+        self.words[offset] = key ^ data ^ score_bits
+
+    def probe(self, key):
+        self.probes += 1
+        key &= KEY_MASK
+        index = 2 * (key % self.buckets)
+        entry = self.read(index, key)
+        if entry is None:
+            entry = self.read(index + 1, key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def store(self, key, depth, bound, score, move):
+        self.stores += 1
+        key &= KEY_MASK
+        index = 2 * (key % self.buckets)
+        offset = 3 * index
+        # the depth preferred slot is read without the check, a torn entry only makes a worse replacement choice
+        deepest_key = self.words[offset] ^ self.words[offset + 1] ^ self.words[offset + 2]
+        deepest_data = self.words[offset + 1]
+        if (not deepest_data or deepest_key == key or depth >= (deepest_data >> DEPTH_SHIFT) & 0xFF or
+                (deepest_data >> GENERATION_SHIFT) & 0xFF != self.generation & 0xFF):
+            if deepest_data and deepest_key != key:
+                self.collisions += 1
+            self.write(index, key, depth, bound, score, move)
+        else:
+            recent_data = self.words[offset + 4]
+            recent_key = self.words[offset + 3] ^ recent_data ^ self.words[offset + 5]
+            if recent_data and recent_key != key:
+                self.collisions += 1
+            self.write(index + 1, key, depth, bound, score, move)
+
+
+def release_memory(memory, words, unlink):
+    words.release()
+    memory.close()
+    if unlink:
+        memory.unlink()